@@ -0,0 +1,3 @@
+from task_manager.aio import create_asgi_app
+
+app = create_asgi_app()
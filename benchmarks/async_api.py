@@ -0,0 +1,195 @@
+"""Compares the WSGI and asyncio variants of the REST API side by side
+
+Both apps are served by Hypercorn on the same seeded database, the Flask app
+through Hypercorn's WSGI support and task_manager.aio natively, and driven by
+many concurrent keep-alive connections for a fixed time.
+
+    python -m benchmarks.async_api --connections 64 --seconds 5
+
+The read-heavy workload sends one write in ten requests, the mixed one every
+other request.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.sqlite_profile import profile_settings, seed
+from task_manager import create_app, db
+
+SERVERS = {
+    "wsgi": "task_manager:create_app()",
+    "asgi": "asgi:app",
+}
+WORKLOADS = {"read-heavy": 0.1, "mixed": 0.5}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Connection:
+    """Minimal HTTP/1.1 keep-alive client, enough for the API's responses"""
+
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+
+    @classmethod
+    async def open(cls, port):
+        return cls(*await asyncio.open_connection("127.0.0.1", port))
+
+    async def request(self, method, path, payload=None):
+        body = json.dumps(payload).encode() if payload is not None else b""
+        head = (
+            f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+        )
+        self._writer.write(head.encode() + body)
+        status = int((await self._reader.readline()).split()[1])
+        headers = {}
+        while line := (await self._reader.readline()).strip():
+            name, _, value = line.decode().partition(":")
+            headers[name.lower()] = value.strip()
+        if headers.get("transfer-encoding") == "chunked":
+            while size := int((await self._reader.readline()).strip(), 16):
+                await self._reader.readexactly(size + 2)
+            await self._reader.readline()
+        else:
+            await self._reader.readexactly(int(headers.get("content-length", 0)))
+        return status
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+
+
+async def _wait_until_up(port, process, timeout=30):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("server exited during startup")
+        try:
+            conn = await Connection.open(port)
+        except OSError:
+            await asyncio.sleep(0.1)
+            continue
+        await conn.close()
+        return
+    raise RuntimeError("server did not start")
+
+
+async def drive(port, seconds, connections, write_ratio, projects):
+    """Runs the workload and returns per-request latencies and error count"""
+    stop = time.perf_counter() + seconds
+    latencies, errors = [], 0
+
+    async def client(n):
+        nonlocal errors
+        rng = random.Random(n)
+        conn = await Connection.open(port)
+        try:
+            while time.perf_counter() < stop:
+                project_id = rng.randint(1, projects)
+                start = time.perf_counter()
+                if rng.random() < write_ratio:
+                    status = await conn.request(
+                        "POST", "/api/tasks", {"project_id": project_id, "task": "b"}
+                    )
+                    errors += status != 201
+                else:
+                    status = await conn.request(
+                        "GET", f"/api/tasks?project_id={project_id}&limit=50"
+                    )
+                    errors += status != 200
+                latencies.append(time.perf_counter() - start)
+        finally:
+            await conn.close()
+
+    await asyncio.gather(*(client(n) for n in range(connections)))
+    return latencies, errors
+
+
+def benchmark(server, workload, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        database = f"sqlite:///{Path(tmp) / 'bench.db'}"
+        settings = profile_settings(args.profile)
+        settings["SQLALCHEMY_DATABASE_URI"] = database
+        app = create_app(settings)
+        seed(app, args.tasks)
+        with app.app_context():
+            db.engine.dispose()
+
+        port = _free_port()
+        env = dict(
+            os.environ,
+            TASK_MANAGER_CONFIG=args.profile,
+            TASK_MANAGER_SQLALCHEMY_DATABASE_URI=database,
+        )
+        process = subprocess.Popen(
+            [sys.executable, "-m", "hypercorn", "-b", f"127.0.0.1:{port}"]
+            + ["--log-level", "warning", SERVERS[server]],
+            env=env,
+        )
+        try:
+            asyncio.run(_wait_until_up(port, process))
+            latencies, errors = asyncio.run(
+                drive(port, args.seconds, args.connections, WORKLOADS[workload], 10)
+            )
+        finally:
+            process.terminate()
+            process.wait()
+
+    latencies.sort()
+    return {
+        "server": server,
+        "workload": workload,
+        "requests_per_s": round(len(latencies) / args.seconds, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 2),
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=20000)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--profile", default="production")
+    parser.add_argument("--servers", nargs="+", default=list(SERVERS))
+    parser.add_argument("--workloads", nargs="+", default=list(WORKLOADS))
+    parser.add_argument("--json", action="store_true", help="print JSON results")
+    args = parser.parse_args()
+
+    results = [
+        benchmark(server, workload, args)
+        for workload in args.workloads
+        for server in args.servers
+    ]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(
+        f"{'server':<8}{'workload':<12}{'req/s':>10}"
+        f"{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}"
+    )
+    for r in results:
+        print(
+            f"{r['server']:<8}{r['workload']:<12}{r['requests_per_s']:>10}"
+            f"{r['p50_ms']:>9}{r['p99_ms']:>9}{r['errors']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
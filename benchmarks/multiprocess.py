@@ -0,0 +1,113 @@
+"""Measures how task_manager.server scales with its number of workers
+
+Starts the pre-forking server on a seeded database for each worker count
+and drives it for a fixed time with keep-alive connections, spread over
+several client processes so the load generator is not the bottleneck.
+Reports throughput, latency, errors and the speedup over one worker.
+
+    python -m benchmarks.multiprocess --workers 1 2 4 8 --seconds 10
+
+The default workload sends one write in ten requests. Every write goes
+through the single writer, so the errors column should stay at zero.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks.async_api import _free_port, _wait_until_up, drive
+from benchmarks.sqlite_profile import profile_settings, seed
+from task_manager import create_app, db
+
+
+def _drive(port, seconds, connections, write_ratio):
+    return asyncio.run(drive(port, seconds, connections, write_ratio, 10))
+
+
+def benchmark(workers, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        database = f"sqlite:///{Path(tmp) / 'bench.db'}"
+        settings = profile_settings("production")
+        settings["SQLALCHEMY_DATABASE_URI"] = database
+        app = create_app(settings)
+        seed(app, args.tasks)
+        with app.app_context():
+            db.engine.dispose()
+
+        port = _free_port()
+        env = dict(
+            os.environ,
+            TASK_MANAGER_CONFIG="production",
+            TASK_MANAGER_SQLALCHEMY_DATABASE_URI=database,
+        )
+        process = subprocess.Popen(
+            [sys.executable, "-m", "task_manager.server", "task_manager:create_app()"]
+            + ["--workers", str(workers), "--bind", f"127.0.0.1:{port}"],
+            env=env,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            asyncio.run(_wait_until_up(port, process))
+            per_client = max(1, args.connections // args.clients)
+            with multiprocessing.Pool(args.clients) as pool:
+                results = pool.starmap(
+                    _drive,
+                    [(port, args.seconds, per_client, args.write_ratio)] * args.clients,
+                )
+        finally:
+            process.terminate()
+            process.wait()
+
+    latencies = sorted(latency for result in results for latency in result[0])
+    return {
+        "workers": workers,
+        "requests_per_s": round(len(latencies) / args.seconds, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 2),
+        "errors": sum(result[1] for result in results),
+    }
+
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=20000)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--connections", type=int, default=64)
+    parser.add_argument("--clients", type=int, default=max(1, cores // 2))
+    parser.add_argument("--write-ratio", type=float, default=0.1)
+    parser.add_argument(
+        "--workers",
+        nargs="+",
+        type=int,
+        default=sorted({1, max(1, cores // 2), cores}),
+    )
+    parser.add_argument("--json", action="store_true", help="print JSON results")
+    args = parser.parse_args()
+
+    results = [benchmark(workers, args) for workers in args.workers]
+    baseline = results[0]["requests_per_s"] or 1
+    for r in results:
+        r["speedup"] = round(r["requests_per_s"] / baseline, 2)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(
+        f"{'workers':>8}{'req/s':>10}{'speedup':>9}"
+        f"{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}"
+    )
+    for r in results:
+        print(
+            f"{r['workers']:>8}{r['requests_per_s']:>10}{r['speedup']:>9}"
+            f"{r['p50_ms']:>9}{r['p99_ms']:>9}{r['errors']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,420 @@
+"""Benchmarks every route against databases of increasing size
+
+Seeds a SQLite database per size with the same pseudo-random data on every
+run, then drives each route through the Flask test client and reports
+latency percentiles, throughput, SQL statements per request and peak Python
+memory. Only the change feed is left out, as its stream never ends. The
+routes that delete get rows created for each request, outside the timings.
+Results can be saved as JSON and compared with an earlier run:
+
+    python -m benchmarks.routes --sizes 10000 100000 --output after.json
+    python -m benchmarks.routes --sizes 10000 100000 --compare before.json
+
+The comparison exits with status 1 when a route got slower than the
+threshold, so it can gate a CI job.
+"""
+
+import argparse
+import itertools
+import json
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from sqlalchemy import event, insert, update
+
+from benchmarks.sqlite_profile import profile_settings
+from task_manager import create_app, db
+from task_manager.models import Projects, Tasks, slugify
+
+PROJECTS = 100
+# bumped whenever seed() changes, so --cache-dir copies are seeded again
+SEED_FORMAT = 2
+SEED_CHUNK = 50000
+WORDS = (
+    "write read review deploy fix test build plan design refactor document "
+    "release migrate benchmark profile index cache query search export"
+).split()
+
+
+def seed(app, size, rng):
+    """Inserts PROJECTS projects and ``size`` tasks spread across them"""
+    with app.app_context():
+        db.session.execute(
+            insert(Projects),
+            [
+                {
+                    "project_name": f"Project {i}",
+                    "active": i == 0,
+                    "url_slug": slugify(f"Project {i}"),
+                }
+                for i in range(PROJECTS)
+            ],
+        )
+        for start in range(0, size, SEED_CHUNK):
+            db.session.execute(
+                insert(Tasks),
+                [
+                    {
+                        "project_id": rng.randint(1, PROJECTS),
+                        "task": " ".join(rng.sample(WORDS, 3)) + f" #{n}",
+                        "status": rng.random() < 0.7,
+                    }
+                    for n in range(start, min(start + SEED_CHUNK, size))
+                ],
+            )
+        db.session.commit()
+
+
+_fresh = itertools.count()
+
+
+def _new_task(engine, i):
+    with engine.begin() as conn:
+        return conn.execute(
+            insert(Tasks).values(
+                project_id=i % PROJECTS + 1, task=f"doomed #{i}", status=True
+            )
+        ).inserted_primary_key[0]
+
+
+def _new_project(engine, i, tasks=20):
+    n = next(_fresh)
+    with engine.begin() as conn:
+        project_id = conn.execute(
+            insert(Projects).values(
+                project_name=f"Fresh {n}", active=False, url_slug=slugify(f"Fresh {n}")
+            )
+        ).inserted_primary_key[0]
+        if tasks:
+            conn.execute(
+                insert(Tasks),
+                [
+                    {"project_id": project_id, "task": f"doomed #{k}", "status": True}
+                    for k in range(tasks)
+                ],
+            )
+    return project_id
+
+
+def _restore_projects(engine, i):
+    with engine.begin() as conn:
+        conn.execute(
+            update(Projects)
+            .where(Projects.project_id <= PROJECTS)
+            .values(deleted=False)
+        )
+    return i
+
+
+# Run before each request of their route, outside the timings, these return
+# the ``i`` the request is built with, the id of a row it can delete.
+SETUP = {
+    "delete_task": _new_task,
+    "clear_all": _new_project,
+    "remove_all": _new_project,
+    "rename_project": lambda engine, i: _new_project(engine, i, tasks=0),
+    "api_delete_project": _new_project,
+    "api_delete_task": _new_task,
+    "api_delete_all": _restore_projects,
+}
+
+# Each route builds the request of iteration ``i`` as (method, url, kwargs),
+# ``size`` being the number of seeded tasks. The routes run in this order,
+# api_delete_all last as it leaves every seeded project deleted.
+ROUTES = {
+    "index": lambda i, size: ("get", "/", {}),
+    "add_task": lambda i, size: (
+        "post",
+        "/add",
+        {"data": {"task": f"bench {i}", "project": "Project 0", "status": "1"}},
+    ),
+    "tab_nav": lambda i, size: ("get", f"/project/{slugify(f'Project {i % 2}')}", {}),
+    "close_task": lambda i, size: ("get", f"/close/{i % size + 1}", {}),
+    "delete_task": lambda i, size: ("get", f"/delete/{i}", {}),
+    "clear_all": lambda i, size: ("get", f"/clear/{i}", {}),
+    "remove_all": lambda i, size: ("get", f"/remove/{i}", {}),
+    "rename_project": lambda i, size: (
+        "post",
+        f"/rename_project/{i}",
+        {"json": {"new_name": f"Renamed {i}"}},
+    ),
+    "rename_task_desc": lambda i, size: (
+        "post",
+        f"/rename_task_desc/{i * 7919 % size + 1}",
+        {"json": {"new_desc": f"renamed #{i}"}},
+    ),
+    "api_get_tasks": lambda i, size: ("get", "/api/tasks?limit=100", {}),
+    "api_get_tasks_filtered": lambda i, size: (
+        "get",
+        f"/api/tasks?project_id={i % PROJECTS + 1}&status=open&limit=100",
+        {},
+    ),
+    "api_get_task": lambda i, size: ("get", f"/api/tasks/{i * 7919 % size + 1}", {}),
+    "api_search_tasks": lambda i, size: (
+        "get",
+        f"/api/tasks/search?q={WORDS[i % len(WORDS)]}+{WORDS[(i + 3) % len(WORDS)]}",
+        {},
+    ),
+    "api_project_stats": lambda i, size: (
+        "get",
+        f"/api/projects/{i % PROJECTS + 1}/stats",
+        {},
+    ),
+    "api_get_projects": lambda i, size: ("get", "/api/projects?counts=true", {}),
+    "api_get_project": lambda i, size: ("get", f"/api/projects/{i % PROJECTS + 1}", {}),
+    "api_export_tasks": lambda i, size: (
+        "get",
+        f"/api/tasks/export?project_id={i % PROJECTS + 1}",
+        # reads the whole stream, as a client would
+        {"buffered": True},
+    ),
+    "api_create_project": lambda i, size: (
+        "post",
+        "/api/projects",
+        {"json": {"name": f"Bench {i}"}},
+    ),
+    "api_create_task": lambda i, size: (
+        "post",
+        "/api/tasks",
+        {"json": {"project_id": i % PROJECTS + 1, "task": f"bench #{i}"}},
+    ),
+    "api_create_tasks_bulk": lambda i, size: (
+        "post",
+        "/api/tasks/bulk",
+        {
+            "json": {
+                "tasks": [
+                    {"project_id": (i + k) % PROJECTS + 1, "task": f"bulk #{i}.{k}"}
+                    for k in range(100)
+                ]
+            }
+        },
+    ),
+    "api_update_project": lambda i, size: (
+        "put",
+        f"/api/projects/{i % PROJECTS + 1}",
+        {"json": {"active": True}},
+    ),
+    "api_update_task": lambda i, size: (
+        "put",
+        f"/api/tasks/{i * 7919 % size + 1}",
+        {"json": {"status": i % 2 == 0}},
+    ),
+    "api_update_tasks_bulk": lambda i, size: (
+        "put",
+        "/api/tasks/bulk",
+        {
+            "json": {
+                "ids": [(i * 101 + k) % size + 1 for k in range(100)],
+                "status": i % 2 == 0,
+            }
+        },
+    ),
+    "api_delete_project": lambda i, size: ("delete", f"/api/projects/{i}", {}),
+    "api_delete_task": lambda i, size: ("delete", f"/api/tasks/{i}", {}),
+    "metrics": lambda i, size: ("get", "/metrics", {}),
+    "api_cache_stats": lambda i, size: ("get", "/api/cache", {}),
+    "api_delete_all": lambda i, size: ("delete", "/api/delete_all", {}),
+}
+
+
+def _percentile(sorted_values, fraction):
+    return sorted_values[
+        min(len(sorted_values) - 1, int(len(sorted_values) * fraction))
+    ]
+
+
+def measure(app, route, size, requests, memory_requests):
+    """Runs one route and returns its statistics"""
+    client = app.test_client()
+    build = ROUTES[route]
+    setup = SETUP.get(route)
+    statements = 0
+
+    def _count(*args):
+        nonlocal statements
+        statements += 1
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", _count)
+    try:
+        latencies = []
+        untimed = 0
+        started = time.perf_counter()
+        for i in range(requests):
+            if setup:
+                counted, start = statements, time.perf_counter()
+                i = setup(engine, i)
+                statements, untimed = counted, untimed + time.perf_counter() - start
+            method, url, kwargs = build(i, size)
+            start = time.perf_counter()
+            response = getattr(client, method)(url, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                raise RuntimeError(f"{route}: {url} returned {response.status_code}")
+        elapsed = time.perf_counter() - started - untimed
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+
+    # memory is traced in a separate, shorter pass as tracing slows every call
+    tracemalloc.start()
+    for i in range(requests, requests + memory_requests):
+        if setup:
+            i = setup(engine, i)
+        method, url, kwargs = build(i, size)
+        getattr(client, method)(url, **kwargs)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "size": size,
+        "route": route,
+        "requests": requests,
+        "p50_ms": round(_percentile(latencies, 0.5) * 1000, 3),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "throughput_per_s": round(requests / elapsed, 1),
+        "queries_per_request": round(statements / requests, 2),
+        "peak_memory_kb": round(peak / 1024, 1),
+    }
+
+
+def prepare_database(size, args, directory):
+    """Returns the path of a freshly seeded copy of the database for ``size``
+
+    With ``--cache-dir`` the seeded database is kept and copied for later
+    runs, as seeding a million tasks takes a while.
+    """
+    path = Path(directory) / f"bench-{size}.db"
+    template = None
+    if args.cache_dir:
+        template = (
+            Path(args.cache_dir) / f"tasks-{size}-seed{args.seed}-v{SEED_FORMAT}.db"
+        )
+    if template and template.exists():
+        shutil.copyfile(template, path)
+        return path
+
+    settings = profile_settings(args.profile)
+    settings["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{path}"
+    app = create_app(settings)
+    seed(app, size, random.Random(args.seed))
+    with app.app_context():
+        db.engine.dispose()
+    if template:
+        template.parent.mkdir(parents=True, exist_ok=True)
+        with sqlite3.connect(path) as conn:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        shutil.copyfile(path, template)
+    return path
+
+
+def benchmark(size, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = prepare_database(size, args, tmp)
+        settings = profile_settings(args.profile)
+        settings["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{path}"
+        # a purge would delete seeded rows while later routes run
+        settings["PURGE_IN_BACKGROUND"] = False
+        app = create_app(settings)
+        try:
+            return [
+                measure(app, route, size, args.requests, args.memory_requests)
+                for route in ROUTES
+                if route in args.routes
+            ]
+        finally:
+            with app.app_context():
+                db.engine.dispose()
+
+
+def compare(results, baseline, threshold):
+    """Prints the change against a baseline, returns the regressed routes"""
+    before = {(r["size"], r["route"]): r for r in baseline["results"]}
+    regressions = []
+    print(f"\n{'size':>8} {'route':<24}{'p50':>10}{'p95':>10}{'queries':>10}")
+    for r in results:
+        old = before.get((r["size"], r["route"]))
+        if old is None:
+            continue
+        p50 = (r["p50_ms"] - old["p50_ms"]) / old["p50_ms"] * 100
+        p95 = (r["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100
+        queries = r["queries_per_request"] - old["queries_per_request"]
+        flag = ""
+        if p50 > threshold or queries > 0:
+            regressions.append(r["route"])
+            flag = "  REGRESSION"
+        print(
+            f"{r['size']:>8} {r['route']:<24}{p50:>+9.1f}%{p95:>+9.1f}%"
+            f"{queries:>+10.2f}{flag}"
+        )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes", nargs="+", type=int, default=[10000, 100000, 1000000]
+    )
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--memory-requests", type=int, default=20)
+    parser.add_argument("--routes", nargs="+", default=list(ROUTES), choices=ROUTES)
+    parser.add_argument("--profile", default="production")
+    parser.add_argument("--seed", type=int, default=15)
+    parser.add_argument("--cache-dir", help="keep seeded databases here")
+    parser.add_argument("--output", help="save the results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of an earlier run")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=20,
+        help="p50 slowdown in percent reported as a regression",
+    )
+    args = parser.parse_args()
+
+    results = []
+    print(
+        f"{'size':>8} {'route':<24}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+        f"{'req/s':>9}{'queries':>9}{'peak KB':>10}"
+    )
+    for size in args.sizes:
+        for r in benchmark(size, args):
+            results.append(r)
+            print(
+                f"{r['size']:>8} {r['route']:<24}{r['p50_ms']:>9}{r['p95_ms']:>9}"
+                f"{r['p99_ms']:>9}{r['throughput_per_s']:>9}"
+                f"{r['queries_per_request']:>9}{r['peak_memory_kb']:>10}"
+            )
+
+    if args.output:
+        report = {
+            "meta": {
+                "python": platform.python_version(),
+                "sqlite": sqlite3.sqlite_version,
+                "profile": args.profile,
+                "requests": args.requests,
+                "seed": args.seed,
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            },
+            "results": results,
+        }
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        if compare(results, baseline, args.threshold):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Compares read/write throughput of the default and production profiles
+
+Seeds a fresh database for each profile, then runs reader and writer threads
+against the REST API through the Flask test client for a fixed time.
+
+    python -m benchmarks.sqlite_profile --tasks 20000 --seconds 5
+"""
+
+import argparse
+import json
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from sqlalchemy import insert
+
+from task_manager import create_app, db
+from task_manager.config import PROFILES
+from task_manager.models import Projects, Tasks
+
+
+def profile_settings(name):
+    """Returns the settings of a profile as a mapping create_app accepts"""
+    cls = PROFILES[name]
+    return {key: getattr(cls, key) for key in dir(cls) if key.isupper()}
+
+
+def seed(app, tasks, projects=10):
+    with app.app_context():
+        db.session.execute(
+            insert(Projects),
+            [
+                {"project_name": f"P{i}", "active": i == 0, "url_slug": f"p{i}"}
+                for i in range(projects)
+            ],
+        )
+        db.session.execute(
+            insert(Tasks),
+            [
+                {"project_id": i % projects + 1, "task": f"Task {i}", "status": True}
+                for i in range(tasks)
+            ],
+        )
+        db.session.commit()
+
+
+def run(app, seconds, readers, writers):
+    """Runs the workload and returns the number of completed operations"""
+    stop = time.perf_counter() + seconds
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+
+    def reader(n):
+        client = app.test_client()
+        done = errors = 0
+        while time.perf_counter() < stop:
+            response = client.get(f"/api/tasks?project_id={n % 10 + 1}&limit=50")
+            done += 1
+            errors += response.status_code != 200
+        with lock:
+            counts["reads"] += done
+            counts["errors"] += errors
+
+    def writer(n):
+        client = app.test_client()
+        done = errors = 0
+        while time.perf_counter() < stop:
+            response = client.post(
+                "/api/tasks", json={"project_id": n % 10 + 1, "task": "bench"}
+            )
+            done += 1
+            errors += response.status_code != 201
+        with lock:
+            counts["writes"] += done
+            counts["errors"] += errors
+
+    threads = [threading.Thread(target=reader, args=(n,)) for n in range(readers)]
+    threads += [threading.Thread(target=writer, args=(n,)) for n in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return counts
+
+
+def benchmark(profile, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        settings = profile_settings(profile)
+        settings["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{Path(tmp) / 'bench.db'}"
+        app = create_app(settings)
+        seed(app, args.tasks)
+        counts = run(app, args.seconds, args.readers, args.writers)
+        with app.app_context():
+            db.engine.dispose()
+
+    return {
+        "profile": profile,
+        "reads_per_s": round(counts["reads"] / args.seconds, 1),
+        "writes_per_s": round(counts["writes"] / args.seconds, 1),
+        "errors": counts["errors"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=20000)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--profiles", nargs="+", default=["default", "production"])
+    parser.add_argument("--json", action="store_true", help="print JSON results")
+    args = parser.parse_args()
+
+    results = [benchmark(profile, args) for profile in args.profiles]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'profile':<12}{'reads/s':>10}{'writes/s':>10}{'errors':>8}")
+    for r in results:
+        print(
+            f"{r['profile']:<12}{r['reads_per_s']:>10}"
+            f"{r['writes_per_s']:>10}{r['errors']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
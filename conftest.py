@@ -1,7 +1,9 @@
 import os
 import tempfile
+from contextlib import contextmanager
 
 import pytest
+from sqlalchemy import event
 
 from task_manager import create_app, db
 from task_manager.models import Projects, Tasks
@@ -10,10 +12,11 @@ from task_manager.models import Projects, Tasks
 @pytest.fixture(scope="function")
 def app():
     db_fd, db_path = tempfile.mkstemp(suffix=".sqlite3")
-    app = create_app()
-    app.config.update(
+    app = create_app(
         {
             "TESTING": True,
+            "QUERY_BUDGET": "raise",
+            "PURGE_IN_BACKGROUND": False,
             "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}",
         }
     )
@@ -62,3 +65,23 @@ def create_task(create_project):
         return task
 
     return _create_task
+
+
+@pytest.fixture
+def capture_queries(app):
+    """Records every SQL statement executed while the returned context is open"""
+
+    @contextmanager
+    def _capture_queries():
+        statements = []
+
+        def _record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", _record)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, "before_cursor_execute", _record)
+
+    return _capture_queries
@@ -1,19 +1,52 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 
-db = SQLAlchemy()
+from task_manager.routing import RoutingSession
 
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+
+def create_app(config=None):
+    """Creates the app
+
+    ``config`` is a profile name from task_manager.config.PROFILES, a config
+    object or a mapping of settings. It defaults to the TASK_MANAGER_CONFIG
+    environment variable, then to the development profile.
+    """
+    from . import config as app_config
+    from . import routing
 
-def create_app():
     app = Flask(__name__)
-    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///ctm.db"
-    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = True
+    app_config.load_config(app, config)
+    routing.configure(app)
     db.init_app(app)
+    routing.init_app(app)
 
     with app.app_context():
-        from . import routes
+        from . import (
+            budget,
+            cache,
+            changes,
+            commands,
+            events,
+            metrics,
+            migrations,
+            purge,
+            routes,
+        )
 
+        app_config.init_engine(app, db.engine)
+        if routing.READ_BIND in db.engines:
+            app_config.init_engine(app, db.engines[routing.READ_BIND], read_only=True)
         db.create_all()
+        migrations.upgrade()
+        changes.init_app(app)
+        cache.init_app(app)
+        events.init_app(app)
+        metrics.init_app(app)
+        budget.init_app(app)
+        purge.init_app(app)
         app.register_blueprint(routes.routes)
+        app.cli.add_command(commands.tasks_cli)
 
     return app
@@ -0,0 +1,439 @@
+"""Asyncio variant of the REST API
+
+Serves the ``/api`` routes of task_manager.routes, with the same JSON shapes,
+on Quart and SQLAlchemy's asyncio extension over the aiosqlite driver. Idle
+keep-alive connections then cost a coroutine rather than a worker thread.
+It reads the same configuration profiles and database as the Flask app:
+
+    hypercorn asgi:app
+
+The write routes do not feed the Flask app's data version or response cache,
+which live in the Flask process.
+"""
+
+import os
+
+from quart import Blueprint, Quart, Response, current_app, jsonify, request
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from task_manager import api, db, migrations, serializers
+from task_manager.config import init_engine, load_config
+from task_manager.models import Projects, Tasks, slugify
+
+aio = Blueprint("aio", __name__)
+
+COUNT_COLUMNS = (Projects.open_tasks, Projects.closed_tasks)
+
+
+def _engine():
+    return current_app.extensions["async_engine"]
+
+
+def _json_response(payload, status=200):
+    return Response(
+        serializers.dumps(payload), status=status, mimetype="application/json"
+    )
+
+
+def _page_response(rows, limit, record):
+    """JSON page of records, with a Link header when another page exists
+
+    ``rows`` holds up to ``limit + 1`` rows, the extra one only tells that
+    there is more to fetch.
+    """
+    response = _json_response(serializers.records(record, rows[:limit]))
+    if len(rows) > limit:
+        response.headers["Link"] = api.next_link(
+            request.path, request.args.to_dict(), rows[limit - 1][0], limit
+        )
+    return response
+
+
+@aio.get("/api/projects")
+async def api_get_projects():
+    try:
+        limit, after = api.page_args(request.args)
+        counts = api.parse_flag(request.args, "counts")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    record = serializers.ProjectCountsRecord if counts else serializers.ProjectRecord
+    async with _engine().connect() as conn:
+        rows = (
+            await conn.execute(
+                select(*record.columns)
+                .where(Projects.project_id > after, api.live_projects)
+                .order_by(Projects.project_id)
+                .limit(limit + 1)
+            )
+        ).all()
+    return _page_response(rows, limit, record)
+
+
+@aio.get("/api/projects/<int:id>")
+async def api_get_project(id):
+    async with _engine().connect() as conn:
+        row = (
+            await conn.execute(
+                select(*serializers.ProjectRecord.columns).where(
+                    Projects.project_id == id, api.live_projects
+                )
+            )
+        ).first()
+    if not row:
+        return jsonify({"error": "Project not found"}), 404
+    return _json_response(serializers.ProjectRecord(*row))
+
+
+@aio.get("/api/projects/<int:id>/stats")
+async def api_get_project_stats(id):
+    async with _engine().connect() as conn:
+        row = (
+            await conn.execute(
+                select(*COUNT_COLUMNS).where(
+                    Projects.project_id == id, api.live_projects
+                )
+            )
+        ).first()
+    if not row:
+        return jsonify({"error": "Project not found"}), 404
+    return jsonify({"id": id, **api.task_counts(*row)})
+
+
+@aio.get("/api/tasks")
+async def api_get_tasks():
+    try:
+        limit, after = api.page_args(request.args)
+        criteria = api.task_filters(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    async with _engine().connect() as conn:
+        rows = (
+            await conn.execute(
+                select(*serializers.TaskRecord.columns)
+                .where(Tasks.task_id > after, *criteria)
+                .order_by(Tasks.task_id)
+                .limit(limit + 1)
+            )
+        ).all()
+    return _page_response(rows, limit, serializers.TaskRecord)
+
+
+@aio.get("/api/tasks/search")
+async def api_search_tasks():
+    try:
+        text, limit = api.search_args(request.args)
+        criteria = api.task_filters(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    async with _engine().connect() as conn:
+        rows = await conn.execute(
+            api.search_tasks(text, criteria, limit, serializers.TaskRecord.columns)
+        )
+        return _json_response(serializers.records(serializers.TaskRecord, rows))
+
+
+async def _iter_task_rows(engine, criteria):
+    """Yields task rows in keyset batches, one short read per batch"""
+    after = 0
+    while True:
+        async with engine.connect() as conn:
+            rows = (
+                await conn.execute(
+                    select(*serializers.TaskRecord.columns)
+                    .where(Tasks.task_id > after, *criteria)
+                    .order_by(Tasks.task_id)
+                    .limit(api.EXPORT_BATCH_SIZE)
+                )
+            ).all()
+        if not rows:
+            return
+        yield rows
+        after = rows[-1].task_id
+
+
+async def _ndjson_lines(engine, criteria):
+    async for rows in _iter_task_rows(engine, criteria):
+        yield api.encode_ndjson(rows).encode()
+
+
+async def _csv_lines(engine, criteria):
+    encoder = api.CsvEncoder()
+    yield encoder.header().encode()
+    async for rows in _iter_task_rows(engine, criteria):
+        yield encoder.encode(rows).encode()
+
+
+EXPORT_FORMATS = {
+    "ndjson": (_ndjson_lines, "application/x-ndjson"),
+    "csv": (_csv_lines, "text/csv"),
+}
+
+
+@aio.get("/api/tasks/export")
+async def api_export_tasks():
+    export_format = request.args.get("format", "ndjson")
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unknown format: {export_format}"}), 400
+    try:
+        criteria = api.task_filters(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    generate, mimetype = EXPORT_FORMATS[export_format]
+    return Response(
+        generate(_engine(), criteria),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=tasks.{export_format}"},
+    )
+
+
+@aio.get("/api/tasks/<int:id>")
+async def api_get_task(id):
+    async with _engine().connect() as conn:
+        row = (
+            await conn.execute(
+                select(*serializers.TaskRecord.columns).where(
+                    Tasks.task_id == id, api.live_tasks
+                )
+            )
+        ).first()
+    if not row:
+        return jsonify({"error": "Task not found"}), 404
+    return _json_response(serializers.TaskRecord(*row))
+
+
+@aio.post("/api/projects")
+async def api_create_project():
+    data = await request.get_json(silent=True)
+    if not data or "name" not in data:
+        return jsonify({"error": "Project name is required"}), 400
+
+    async with _engine().begin() as conn:
+        project_id = (
+            await conn.execute(
+                insert(Projects).values(
+                    project_name=data["name"],
+                    active=False,
+                    url_slug=slugify(data["name"]),
+                )
+            )
+        ).inserted_primary_key[0]
+        if data.get("active", False):
+            await conn.execute(api.activate_project(project_id))
+    return jsonify({"message": "Project created", "id": project_id}), 201
+
+
+@aio.post("/api/tasks")
+async def api_create_task():
+    data = await request.get_json(silent=True)
+    if not data or "task" not in data or "project_id" not in data:
+        return jsonify({"error": "Missing task or project_id"}), 400
+    if not isinstance(data["project_id"], int) or isinstance(data["project_id"], bool):
+        return jsonify({"error": "project_id must be an integer"}), 400
+
+    async with _engine().begin() as conn:
+        project_id = await conn.scalar(
+            select(Projects.project_id).where(
+                Projects.project_id == data["project_id"], api.live_projects
+            )
+        )
+        if project_id is None:
+            return jsonify({"error": "Project not found"}), 404
+        task_id = (
+            await conn.execute(
+                insert(Tasks).values(
+                    project_id=project_id,
+                    task=data["task"],
+                    status=data.get("status", True),
+                )
+            )
+        ).inserted_primary_key[0]
+    return jsonify({"message": "Task created", "id": task_id}), 201
+
+
+@aio.post("/api/tasks/bulk")
+async def api_create_tasks_bulk():
+    data = await request.get_json(silent=True)
+    items = data.get("tasks") if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "A non-empty list of tasks is required"}), 400
+    if len(items) > api.MAX_BULK_TASKS:
+        return (
+            jsonify({"error": f"At most {api.MAX_BULK_TASKS} tasks per request"}),
+            400,
+        )
+    atomic = data.get("atomic", True)
+    if not isinstance(atomic, bool):
+        return jsonify({"error": "atomic must be a boolean"}), 400
+
+    rows, errors = api.parse_bulk_tasks(items)
+    async with _engine().begin() as conn:
+        wanted = {row["project_id"] for _, row in rows}
+        existing = set(
+            (
+                await conn.scalars(
+                    select(Projects.project_id).where(
+                        Projects.project_id.in_(wanted), api.live_projects
+                    )
+                )
+            ).all()
+        )
+        rows, errors = api.drop_missing_projects(rows, errors, existing)
+        if not rows or (errors and atomic):
+            return jsonify({"error": "Invalid tasks", "errors": errors}), 400
+        # see routes.api_create_tasks_bulk for why sorting restores the order
+        new_ids = sorted(
+            (
+                await conn.scalars(
+                    insert(Tasks).returning(Tasks.task_id), [row for _, row in rows]
+                )
+            ).all()
+        )
+
+    ids = [None] * len(items)
+    for (index, _), task_id in zip(rows, new_ids):
+        ids[index] = task_id
+    return jsonify({"message": "Tasks created", "ids": ids, "errors": errors}), 201
+
+
+@aio.put("/api/tasks/bulk")
+async def api_update_tasks_bulk():
+    try:
+        criteria, values, _, _ = api.parse_bulk_update(
+            await request.get_json(silent=True)
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    async with _engine().begin() as conn:
+        result = await conn.execute(api.update_tasks(criteria, values))
+    return jsonify({"message": "Tasks updated", "updated": result.rowcount}), 200
+
+
+@aio.put("/api/projects/<int:id>")
+async def api_update_project(id):
+    data = await request.get_json(silent=True) or {}
+
+    async with _engine().begin() as conn:
+        found = await conn.scalar(
+            select(Projects.project_id).where(
+                Projects.project_id == id, api.live_projects
+            )
+        )
+        if not found:
+            return jsonify({"error": "Project not found"}), 404
+        if "name" in data:
+            await conn.execute(
+                update(Projects)
+                .where(Projects.project_id == id)
+                .values(project_name=data["name"], url_slug=slugify(data["name"]))
+            )
+        if data.get("active"):
+            await conn.execute(api.activate_project(id))
+        elif "active" in data:
+            await conn.execute(
+                update(Projects)
+                .where(Projects.project_id == id)
+                .values(active=data["active"])
+            )
+    return jsonify({"message": "Project updated"}), 200
+
+
+@aio.put("/api/tasks/<int:id>")
+async def api_update_task(id):
+    data = await request.get_json(silent=True) or {}
+    values = {key: data[key] for key in ("task", "status") if key in data}
+
+    async with _engine().begin() as conn:
+        found = await conn.scalar(
+            select(Tasks.task_id).where(Tasks.task_id == id, api.live_tasks)
+        )
+        if not found:
+            return jsonify({"error": "Task not found"}), 404
+        if values:
+            await conn.execute(
+                update(Tasks).where(Tasks.task_id == id).values(**values)
+            )
+    return jsonify({"message": "Task updated"}), 200
+
+
+@aio.delete("/api/projects/<int:id>")
+async def api_delete_project(id):
+    async with _engine().begin() as conn:
+        result = await conn.execute(
+            api.delete_projects(Projects.project_id == id, api.live_projects)
+        )
+    if not result.rowcount:
+        return jsonify({"error": "Project not found"}), 404
+    return jsonify({"message": "Project deleted"}), 200
+
+
+@aio.delete("/api/tasks/<int:id>")
+async def api_delete_task(id):
+    async with _engine().begin() as conn:
+        result = await conn.execute(
+            delete(Tasks).where(Tasks.task_id == id, api.live_tasks)
+        )
+    if not result.rowcount:
+        return jsonify({"error": "Task not found"}), 404
+    return jsonify({"message": "Task deleted"}), 200
+
+
+@aio.delete("/api/delete_all")
+async def api_delete_all():
+    try:
+        async with _engine().begin() as conn:
+            # tombstones, purged by the Flask app or `flask tasks purge`
+            await conn.execute(api.delete_projects(api.live_projects))
+        return jsonify({"message": "All projects and tasks deleted"}), 200
+    except Exception as e:
+        return (
+            jsonify({"error": "Failed to delete all records", "details": str(e)}),
+            500,
+        )
+
+
+def async_database_url(app):
+    """The configured database URL, on the aiosqlite driver
+
+    Relative SQLite paths are resolved against the instance folder, as
+    Flask-SQLAlchemy does for the Flask app, so both open the same file.
+    """
+    url = make_url(app.config["SQLALCHEMY_DATABASE_URI"])
+    if url.get_backend_name() != "sqlite":
+        return url
+    database = url.database
+    if database and database != ":memory:" and not os.path.isabs(database):
+        os.makedirs(app.instance_path, exist_ok=True)
+        database = os.path.join(app.instance_path, database)
+    return url.set(drivername="sqlite+aiosqlite", database=database)
+
+
+def create_asgi_app(config=None):
+    """Creates the ASGI app, ``config`` works as in create_app"""
+    app = Quart(__name__)
+    load_config(app, config)
+    app.register_blueprint(aio)
+
+    @app.before_serving
+    async def _start_engine():
+        engine = create_async_engine(
+            async_database_url(app), **app.config["SQLALCHEMY_ENGINE_OPTIONS"]
+        )
+        init_engine(app, engine.sync_engine)
+        async with engine.begin() as conn:
+            await conn.run_sync(db.metadata.create_all)
+        async with engine.connect() as conn:
+            await conn.run_sync(migrations.migrate)
+        app.extensions["async_engine"] = engine
+
+    @app.after_serving
+    async def _stop_engine():
+        await app.extensions.pop("async_engine").dispose()
+
+    return app
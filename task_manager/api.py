@@ -0,0 +1,341 @@
+"""Framework independent parts of the REST API
+
+Argument parsing, payload validation, statements and row encoding shared by
+the Flask routes and the asyncio variant in task_manager.aio, so both serve
+the same routes with the same JSON shapes.
+"""
+
+import csv
+import io
+import json
+from urllib.parse import urlencode
+
+from sqlalchemy import column, func, or_, select, table, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from task_manager import db
+from task_manager.models import Projects, Tasks, slugify
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FIELDS = ("id", "project_id", "task", "status")
+MAX_BULK_TASKS = 10000
+DEFAULT_SEARCH_LIMIT = 20
+
+# FTS5 index over Tasks.task, created and kept in sync by migrations.
+# Not part of the models so create_all() never makes it an ordinary table.
+tasks_fts = table("tasks_fts", column("rowid"), column("rank"), column("tasks_fts"))
+
+# Tombstones: deleting a project or clearing its tasks only updates the
+# project's row, every read and write of the API then skips what it hides
+# and the purger deletes the rows later, see task_manager.purge.
+live_projects = Projects.deleted == db.false()
+live_tasks = ~(
+    select(Projects.project_id)
+    .where(
+        Projects.project_id == Tasks.project_id,
+        or_(Projects.deleted == db.true(), Tasks.task_id <= Projects.cleared_through),
+    )
+    .exists()
+)
+
+
+def parse_status(value):
+    """Converts a status query argument into the stored boolean"""
+    value = value.strip().lower()
+    if value in ("1", "true", "open"):
+        return True
+    if value in ("0", "false", "closed"):
+        return False
+    raise ValueError(f"Invalid status: {value}")
+
+
+def parse_flag(args, name):
+    """Reads an optional boolean query argument, absent meaning False"""
+    value = args.get(name, "").strip().lower()
+    if value in ("", "0", "false", "no"):
+        return False
+    if value in ("1", "true", "yes"):
+        return True
+    raise ValueError(f"Invalid {name}: {value}")
+
+
+def task_counts(open_tasks, closed_tasks):
+    """The task counts of a project as served by the API"""
+    return {
+        "open_tasks": open_tasks,
+        "closed_tasks": closed_tasks,
+        "total_tasks": open_tasks + closed_tasks,
+    }
+
+
+def task_filters(args):
+    """Builds the criteria for the ``project_id`` and ``status`` arguments
+
+    The criteria always skip tombstoned tasks. Raises ValueError on malformed
+    values.
+    """
+    criteria = [live_tasks]
+    if "project_id" in args:
+        criteria.append(Tasks.project_id == int(args["project_id"]))
+    if "status" in args:
+        criteria.append(Tasks.status == parse_status(args["status"]))
+    return criteria
+
+
+def page_args(args):
+    """Parses the keyset pagination arguments of a list request
+
+    ``after`` is the last primary key the client has already seen and
+    ``limit`` the maximum number of rows to return, capped at MAX_PAGE_SIZE.
+    Raises ValueError on malformed values.
+    """
+    limit = int(args.get("limit", DEFAULT_PAGE_SIZE))
+    after = int(args.get("after", 0))
+    if limit < 1 or after < 0:
+        raise ValueError("limit must be positive and after not negative")
+    return min(limit, MAX_PAGE_SIZE), after
+
+
+def next_link(path, args, next_after, limit):
+    """Link header value pointing to the page after ``next_after``"""
+    args = dict(args)
+    args.update(after=next_after, limit=limit)
+    return f'<{path}?{urlencode(args)}>; rel="next"'
+
+
+def match_expression(text):
+    """Turns a search string into an FTS5 MATCH expression
+
+    Every word must appear in the task, a word ending in ``*`` matches as a
+    prefix. Words are quoted so FTS5 operators in the input are taken
+    literally. Raises ValueError when there is nothing to search for.
+    """
+    terms = []
+    for word in text.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*").replace('"', "")
+        if word:
+            terms.append(f'"{word}"*' if prefix else f'"{word}"')
+    if not terms:
+        raise ValueError("A search query is required")
+    return " ".join(terms)
+
+
+def search_args(args):
+    """Parses the ``q`` and ``limit`` arguments of a search request
+
+    Raises ValueError on malformed values.
+    """
+    text = args.get("q", "")
+    limit = int(args.get("limit", DEFAULT_SEARCH_LIMIT))
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    match_expression(text)
+    return text, min(limit, MAX_PAGE_SIZE)
+
+
+def search_tasks(text, criteria, limit, columns=(Tasks,)):
+    """SELECT of the tasks matching ``text``, best match first
+
+    ``criteria`` are extra filters on Tasks such as those of task_filters.
+    The ranking is FTS5's bm25, ties keep the task order.
+    """
+    return (
+        select(*columns)
+        .join(tasks_fts, tasks_fts.c.rowid == Tasks.task_id)
+        .where(tasks_fts.c.tasks_fts.op("MATCH")(match_expression(text)), *criteria)
+        .order_by(tasks_fts.c.rank, Tasks.task_id)
+        .limit(limit)
+    )
+
+
+def parse_bulk_tasks(items):
+    """Splits bulk task payloads into insertable rows and per-item errors
+
+    Returns a list of ``(index, row)`` pairs and a list of
+    ``{"index", "error"}`` dicts. Whether the projects exist is checked
+    separately by ``drop_missing_projects``.
+    """
+    rows, errors = [], []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({"index": index, "error": "Task must be an object"})
+        elif "task" not in item or "project_id" not in item:
+            errors.append({"index": index, "error": "Missing task or project_id"})
+        elif not isinstance(item["project_id"], int) or isinstance(
+            item["project_id"], bool
+        ):
+            errors.append({"index": index, "error": "project_id must be an integer"})
+        elif not isinstance(item["task"], str) or not item["task"].strip():
+            errors.append({"index": index, "error": "task must be a non-empty string"})
+        elif not isinstance(item.get("status", True), bool):
+            errors.append({"index": index, "error": "status must be a boolean"})
+        else:
+            rows.append(
+                (
+                    index,
+                    {
+                        "project_id": item["project_id"],
+                        "task": item["task"],
+                        "status": item.get("status", True),
+                    },
+                )
+            )
+    return rows, errors
+
+
+def parse_bulk_update(data):
+    """Parses a bulk update payload into task criteria and new values
+
+    The tasks are picked either by ``ids`` or by a ``filter`` on project_id
+    and status, the new values are the ``task`` and ``status`` keys as in a
+    single task update. Returns the criteria, the values, and the ids and
+    project_id the update is limited to, None when it is not. Raises
+    ValueError on invalid payloads.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("A JSON object is required")
+
+    ids = project_id = None
+    if "ids" in data and "filter" in data:
+        raise ValueError("Send either ids or filter, not both")
+    if "ids" in data:
+        ids = data["ids"]
+        if (
+            not isinstance(ids, list)
+            or not ids
+            or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids)
+        ):
+            raise ValueError("ids must be a non-empty list of integers")
+        if len(ids) > MAX_BULK_TASKS:
+            raise ValueError(f"At most {MAX_BULK_TASKS} ids per request")
+        criteria = [Tasks.task_id.in_(ids), live_tasks]
+    elif "filter" in data:
+        task_filter = data["filter"]
+        if not isinstance(task_filter, dict) or not task_filter:
+            raise ValueError("filter must be an object with project_id or status")
+        unknown = set(task_filter) - {"project_id", "status"}
+        if unknown:
+            raise ValueError(f"Unknown filter: {', '.join(sorted(unknown))}")
+        criteria = task_filters({k: str(v) for k, v in task_filter.items()})
+        if "project_id" in task_filter:
+            project_id = int(task_filter["project_id"])
+    else:
+        raise ValueError("Either ids or filter is required")
+
+    values = {}
+    if "task" in data:
+        if not isinstance(data["task"], str) or not data["task"].strip():
+            raise ValueError("task must be a non-empty string")
+        values["task"] = data["task"].strip()
+    if "status" in data:
+        if not isinstance(data["status"], bool):
+            raise ValueError("status must be a boolean")
+        values["status"] = data["status"]
+    if not values:
+        raise ValueError("Nothing to update, set task or status")
+    return criteria, values, ids, project_id
+
+
+def update_tasks(criteria, values):
+    """Single UPDATE applying ``values`` to every task matching ``criteria``"""
+    return update(Tasks).where(*criteria).values(**values)
+
+
+def drop_missing_projects(rows, errors, existing):
+    """Moves rows whose project is not in ``existing`` to the errors"""
+    valid = []
+    for index, row in rows:
+        if row["project_id"] in existing:
+            valid.append((index, row))
+        else:
+            errors.append({"index": index, "error": "Project not found"})
+    errors.sort(key=lambda error: error["index"])
+    return valid, errors
+
+
+def activate_project(project_id):
+    """UPDATE making the project the only active one, or none when None
+
+    Only the currently active project and the new one match the WHERE clause,
+    both through an index, so switching costs a single small UPDATE however
+    many projects there are.
+    """
+    return (
+        update(Projects)
+        .where(or_(Projects.active == db.true(), Projects.project_id == project_id))
+        .values(active=Projects.project_id == project_id)
+    )
+
+
+def clear_tasks(*criteria):
+    """UPDATE tombstoning every current task of the matching projects
+
+    The tasks with ids up to the newest one are hidden and their counters
+    zeroed. Task ids are never reused, so later tasks stay visible. Costs one
+    row per project however many tasks it has.
+    """
+    newest = select(func.coalesce(func.max(Tasks.task_id), 0)).scalar_subquery()
+    return (
+        update(Projects)
+        .where(*criteria)
+        .values(cleared_through=newest, open_tasks=0, closed_tasks=0)
+    )
+
+
+def delete_projects(*criteria):
+    """UPDATE tombstoning the matching projects along with their tasks
+
+    The slug is released so a new project can take the name right away.
+    """
+    return clear_tasks(*criteria).values(deleted=True, active=False, url_slug=None)
+
+
+def upsert_project(name):
+    """INSERT returning the id and active flag of the named project
+
+    The project is created, inactive, if it is missing. A single INSERT ...
+    ON CONFLICT statement against the unique url_slug index, so concurrent
+    requests for the same new name cannot both create it. The no-op DO
+    UPDATE makes RETURNING yield the existing row too.
+    """
+    stmt = sqlite_insert(Projects).values(
+        project_name=name, active=False, url_slug=slugify(name)
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Projects.url_slug],
+        set_={"url_slug": stmt.excluded.url_slug},
+    )
+    return stmt.returning(Projects.project_id, Projects.active)
+
+
+def encode_ndjson(rows):
+    """Encodes export rows as NDJSON lines"""
+    return "".join(
+        json.dumps(dict(zip(EXPORT_FIELDS, row)), separators=(",", ":")) + "\n"
+        for row in rows
+    )
+
+
+class CsvEncoder:
+    """Encodes export rows as CSV, one batch at a time"""
+
+    def __init__(self):
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer)
+
+    def _flush(self):
+        value = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return value
+
+    def header(self):
+        self._writer.writerow(EXPORT_FIELDS)
+        return self._flush()
+
+    def encode(self, rows):
+        self._writer.writerows(rows)
+        return self._flush()
@@ -0,0 +1,69 @@
+"""Per-view budgets of SQL statements, to catch N+1 queries as they creep in
+
+A view decorated with ``query_budget(n)`` may run at most n statements per
+request. Every statement the view runs is recorded, and a view going over its
+budget is reported with the statements it ran. ``QUERY_BUDGET`` picks what
+happens then: "warn" logs the report, "raise" raises QueryBudgetExceeded so
+the tests fail, and None turns the check off. Statements run while a
+streamed response body is sent are not counted.
+"""
+
+from functools import wraps
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+from task_manager import db
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """A view ran more SQL statements than its budget allows"""
+
+
+def report(endpoint, limit, statements):
+    """Describes an overrun, listing the statements one per line"""
+    lines = [f"{endpoint} ran {len(statements)} SQL statements, budget is {limit}"]
+    for number, statement in enumerate(statements, 1):
+        lines.append(f"  {number}. {' '.join(statement.split())}")
+    return "\n".join(lines)
+
+
+def query_budget(limit):
+    """Declares the most SQL statements a view may run per request"""
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            mode = current_app.config["QUERY_BUDGET"]
+            if not mode:
+                return view(*args, **kwargs)
+
+            statements = g.query_log = []
+            try:
+                response = view(*args, **kwargs)
+            finally:
+                g.pop("query_log", None)
+            if len(statements) > limit:
+                message = report(request.endpoint, limit, statements)
+                if mode == "raise":
+                    raise QueryBudgetExceeded(message)
+                current_app.logger.warning(message)
+            return response
+
+        wrapper.query_budget = limit
+        return wrapper
+
+    return decorator
+
+
+def init_app(app):
+    app.config.setdefault("QUERY_BUDGET", "warn")
+    if app.config["QUERY_BUDGET"] not in (None, "warn", "raise"):
+        raise ValueError(f"Unknown QUERY_BUDGET mode: {app.config['QUERY_BUDGET']}")
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and "query_log" in g:
+            g.query_log.append(statement)
+
+    for engine in db.engines.values():
+        event.listen(engine, "before_cursor_execute", _record)
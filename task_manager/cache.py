@@ -0,0 +1,171 @@
+"""In-process cache of rendered responses for hot read endpoints
+
+The cache is opt-in: it stays disabled until ``RESPONSE_CACHE_SIZE`` is set to
+the maximum number of responses to keep. Entries are tagged with the data
+they were built from and dropped when a committed write touches that data.
+"""
+
+import threading
+from collections import OrderedDict, defaultdict
+from functools import wraps
+
+from flask import Response, current_app, g, request
+
+from task_manager.changes import data_changed, data_version
+
+# headers that belong to a single response rather than to the cached content
+_UNCACHED_HEADERS = {"etag", "set-cookie", "content-length"}
+
+
+class ResponseCache:
+    """Size-bounded LRU of response bodies, invalidated by tag
+
+    A tag such as ``tasks:3`` also registers its family ``tasks``, so a whole
+    family can be dropped when the change does not say which member it
+    touched.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._tagged = defaultdict(set)
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, tags, version, maxsize):
+        """Stores a value built while the data version was ``version``
+
+        Nothing is stored when a write was committed in the meantime, as the
+        value may already be stale and its invalidation may have been missed.
+        """
+        with self._lock:
+            if data_version().value != version:
+                return
+            tags = set(tags) | {tag.split(":", 1)[0] for tag in tags}
+            self._discard(key)
+            self._entries[key] = (value, tags)
+            for tag in tags:
+                self._tagged[tag].add(key)
+            while len(self._entries) > maxsize:
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, *tags):
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tagged.pop(tag, ())):
+                    self._discard(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tagged.clear()
+
+    def stats(self):
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            for tag in entry[1]:
+                keys = self._tagged.get(tag)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._tagged[tag]
+
+
+def init_app(app):
+    app.config.setdefault("RESPONSE_CACHE_SIZE", 0)
+    app.extensions["response_cache"] = ResponseCache()
+
+
+def response_cache():
+    """Returns the ResponseCache of the current app"""
+    return current_app.extensions["response_cache"]
+
+
+def cache_tag(*tags):
+    """Adds tags to the response being cached, for tags only the view knows"""
+    g.setdefault("cache_tags", []).extend(tags)
+
+
+def cached(*tags):
+    """Caches the response of a read view when the cache is enabled
+
+    ``tags`` may reference the view arguments, as in ``"project:{id}"``. Only
+    200 responses are stored, keyed by their full path.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            maxsize = current_app.config["RESPONSE_CACHE_SIZE"]
+            if not maxsize:
+                return view(*args, **kwargs)
+
+            cache = response_cache()
+            key = (request.endpoint, request.full_path)
+            entry = cache.get(key)
+            if entry is not None:
+                body, status, headers = entry
+                return Response(body, status=status, headers=headers)
+
+            version = data_version().value
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                headers = [
+                    (name, value)
+                    for name, value in response.headers.items()
+                    if name.lower() not in _UNCACHED_HEADERS
+                ]
+                cache.set(
+                    key,
+                    (response.get_data(), response.status_code, headers),
+                    [tag.format(**kwargs) for tag in tags] + g.get("cache_tags", []),
+                    version,
+                    maxsize,
+                )
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def _tags_for(change):
+    """Cache tags made stale by a committed change"""
+    if change.entity == "task":
+        # every task write moves the counters of some project
+        if change.project_id is None:
+            return ["tasks", "task-counts"]
+        return [f"tasks:{change.project_id}", "task-counts"]
+
+    # switching the active project also flips the previously active one
+    if change.ids is None or "active" in change.fields:
+        return ["projects", "project"]
+    return ["projects"] + [f"project:{project_id}" for project_id in change.ids]
+
+
+@data_changed.connect
+def _invalidate(app, change):
+    app.extensions["response_cache"].invalidate(*_tags_for(change))
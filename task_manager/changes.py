@@ -0,0 +1,95 @@
+"""Change tracking for the data served by the app
+
+Every route that writes to the database describes what it changed with
+Change objects and commits through ``commit_changes``. Once the transaction
+is committed that bumps the app's data version, which read endpoints turn
+into ETags, and sends the ``data_changed`` signal so other components can
+react to each change.
+
+The version lives in the memory of the serving process and only moves with
+its own commits. Writes made anywhere else, ``flask tasks import``, ``flask
+tasks rebuild-counts``, the ASGI app or another server process on the same
+database, leave it as it was: clients keep getting 304 for their old ETags
+and the response cache keeps its old bodies until the server is restarted.
+The workers of ``task_manager.server`` stay in step, as their writes all go
+through one writer that broadcasts its changes.
+"""
+
+import threading
+import uuid
+
+from blinker import Namespace
+from flask import current_app
+
+from task_manager import db
+
+_signals = Namespace()
+
+#: Sent after every committed write, with the Change as ``change``
+data_changed = _signals.signal("data-changed")
+
+
+class Change:
+    """Describes one committed write
+
+    ``entity`` is "project" or "task" and ``action`` one of "created",
+    "updated" or "deleted". ``ids`` lists the affected rows, None meaning all
+    rows matching ``project_id`` (or the whole table when that is None too).
+    ``fields`` holds the new values of updated columns.
+    """
+
+    __slots__ = ("entity", "action", "ids", "project_id", "fields")
+
+    def __init__(self, entity, action, ids=None, project_id=None, fields=None):
+        self.entity = entity
+        self.action = action
+        self.ids = ids
+        self.project_id = project_id
+        self.fields = fields or {}
+
+    def __repr__(self):
+        return f"<Change {self.entity} {self.action} {self.ids}>"
+
+
+class DataVersion:
+    """Monotonically increasing counter of the writes committed by this app
+
+    The random epoch keeps ETags handed out by a previous run of the app from
+    matching the counter of this one.
+    """
+
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:12]
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def bump(self):
+        with self._lock:
+            self.value += 1
+            return self.value
+
+    @property
+    def etag(self):
+        return f"{self.epoch}-{self.value}"
+
+
+def init_app(app):
+    app.extensions["data_version"] = DataVersion()
+
+
+def data_version():
+    """Returns the DataVersion of the current app"""
+    return current_app.extensions["data_version"]
+
+
+def commit_changes(*changes):
+    """Commits the session, then records the changes it made
+
+    The changes are built before the commit, while the objects they describe
+    are still loaded, so recording them never triggers a refresh query.
+    """
+    db.session.commit()
+    app = current_app._get_current_object()
+    data_version().bump()
+    for change in changes:
+        data_changed.send(app, change=change)
@@ -0,0 +1,238 @@
+"""Command line tools registered on the ``flask`` command by create_app"""
+
+import csv
+import json
+import os
+import time
+from itertools import islice
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import insert, select
+
+from task_manager import api, db
+from task_manager.migrations import rebuild_task_counts
+from task_manager.models import Projects, Tasks, slugify
+from task_manager.purge import purger
+
+tasks_cli = AppGroup("tasks", help="Bulk task management commands.")
+
+# connection pragmas trading durability for speed while an import runs
+FAST_LOAD_PRAGMAS = {
+    "synchronous": "OFF",
+    "temp_store": "MEMORY",
+    "cache_size": "-262144",
+}
+# running servers only track their own writes, see task_manager.changes
+RESTART_NOTE = (
+    "Restart any running server, its ETags and cached responses "
+    "do not see changes made by this command."
+)
+
+
+def _parse_status(value):
+    """Converts a status read from a file, missing values mean open"""
+    if value is None or value == "":
+        return True
+    if isinstance(value, bool):
+        return value
+    return api.parse_status(str(value))
+
+
+def _read_csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        yield from csv.DictReader(f)
+
+
+def _read_ndjson(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+READERS = {"csv": _read_csv, "ndjson": _read_ndjson}
+
+
+class ProjectResolver:
+    """Resolves project names to ids, creating missing projects
+
+    Every name is looked up at most once, after that its id is served from an
+    in-memory cache.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.cache = {}
+        self.created = 0
+
+    def __call__(self, name):
+        project_id = self.cache.get(name)
+        if project_id is None:
+            slug = slugify(name)
+            project_id = self.conn.scalar(
+                select(Projects.project_id).where(Projects.url_slug == slug)
+            )
+            if project_id is None:
+                project_id = self.conn.execute(
+                    insert(Projects).values(
+                        project_name=name, active=False, url_slug=slug
+                    )
+                ).inserted_primary_key[0]
+                self.created += 1
+            self.cache[name] = project_id
+        return project_id
+
+
+def _apply_pragmas(conn, pragmas):
+    """Sets connection pragmas and returns their previous values"""
+    previous = {}
+    for name, value in pragmas.items():
+        previous[name] = conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+        conn.exec_driver_sql(f"PRAGMA {name} = {value}")
+    return previous
+
+
+def import_tasks(conn, records, chunk_size, resolve):
+    """Bulk inserts task records, committing once per chunk
+
+    Returns the number of tasks inserted and the number of records skipped
+    because they had no task description.
+    """
+    imported = skipped = 0
+    records = iter(records)
+
+    while chunk := list(islice(records, chunk_size)):
+        rows = []
+        for record in chunk:
+            if not record.get("task"):
+                skipped += 1
+                continue
+            rows.append(
+                {
+                    "project_id": resolve(record.get("project") or "Tasks"),
+                    "task": record["task"],
+                    "status": _parse_status(record.get("status")),
+                }
+            )
+        if rows:
+            conn.execute(insert(Tasks), rows)
+            imported += len(rows)
+        conn.commit()
+
+    return imported, skipped
+
+
+@tasks_cli.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--format",
+    "file_format",
+    type=click.Choice(sorted(READERS)),
+    help="File format, guessed from the extension when omitted.",
+)
+@click.option(
+    "--chunk-size",
+    default=5000,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of tasks inserted per transaction.",
+)
+@click.option(
+    "--fast/--safe",
+    default=False,
+    help="Relax SQLite durability pragmas for the duration of the import.",
+)
+def import_command(path, file_format, chunk_size, fast):
+    """Imports tasks from a CSV or NDJSON file.
+
+    Each record has a task, an optional project name (defaults to Tasks) and
+    an optional status (open/closed, true/false or 1/0, defaults to open).
+    Missing projects are created.
+    """
+    if file_format is None:
+        file_format = os.path.splitext(path)[1].lstrip(".").lower()
+        if file_format not in READERS:
+            raise click.UsageError("Cannot guess the file format, use --format.")
+
+    start = time.perf_counter()
+    with db.engine.connect() as conn:
+        previous = _apply_pragmas(conn, FAST_LOAD_PRAGMAS) if fast else {}
+        conn.commit()
+        resolve = ProjectResolver(conn)
+        try:
+            imported, skipped = import_tasks(
+                conn, READERS[file_format](path), chunk_size, resolve
+            )
+        except ValueError as e:
+            conn.rollback()
+            raise click.ClickException(str(e))
+        finally:
+            _apply_pragmas(conn, previous)
+            conn.commit()
+    elapsed = time.perf_counter() - start
+
+    click.echo(
+        f"Imported {imported} tasks ({skipped} skipped, "
+        f"{resolve.created} new projects) in {elapsed:.2f}s, "
+        f"{imported / elapsed if elapsed else 0:.0f} rows/s"
+    )
+    click.echo(RESTART_NOTE)
+
+
+@tasks_cli.command("rebuild-counts")
+def rebuild_counts_command():
+    """Recomputes the open and closed task counters of every project."""
+    start = time.perf_counter()
+    with db.engine.begin() as conn:
+        updated = rebuild_task_counts(conn)
+    click.echo(
+        f"Rebuilt task counts of {updated} projects "
+        f"in {time.perf_counter() - start:.2f}s"
+    )
+    click.echo(RESTART_NOTE)
+
+
+@tasks_cli.command("purge")
+@click.option(
+    "--chunk-size",
+    type=click.IntRange(min=1),
+    help="Tasks deleted per transaction, PURGE_CHUNK_SIZE by default.",
+)
+@click.option(
+    "--pause",
+    type=click.FloatRange(min=0),
+    help="Seconds to wait between transactions, PURGE_PAUSE by default.",
+)
+def purge_command(chunk_size, pause):
+    """Deletes the rows of deleted projects and cleared tasks."""
+    start = time.perf_counter()
+    source = purger()
+    projects = source.projects
+    purged = source.run(chunk_size, pause)
+    click.echo(
+        f"Purged {purged} tasks and {source.projects - projects} projects "
+        f"in {time.perf_counter() - start:.2f}s"
+    )
+
+
+@tasks_cli.command("purge-orphans")
+@click.option(
+    "--chunk-size",
+    type=click.IntRange(min=1),
+    help="Tasks deleted per transaction, PURGE_CHUNK_SIZE by default.",
+)
+@click.option(
+    "--pause",
+    type=click.FloatRange(min=0),
+    help="Seconds to wait between transactions, PURGE_PAUSE by default.",
+)
+@click.option("--dry-run", is_flag=True, help="Only count the orphaned tasks.")
+def purge_orphans_command(chunk_size, pause, dry_run):
+    """Deletes tasks whose project no longer exists."""
+    if dry_run:
+        click.echo(f"Found {purger().count_orphans()} orphaned tasks")
+        return
+    start = time.perf_counter()
+    purged = purger().purge_orphans(chunk_size, pause)
+    click.echo(f"Purged {purged} orphaned tasks in {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,170 @@
+"""Change feed pushed to clients as Server-Sent Events
+
+Every Change sent on ``data_changed`` is published to an in-process
+Broadcaster, which hands it to each subscriber's bounded queue. Writers never
+wait on readers: a subscriber whose queue is full is dropped and its stream
+ends, and the client reconnects with the id of the last event it received
+to pick up where it left off from the recent history.
+"""
+
+import itertools
+import json
+import queue
+import threading
+import uuid
+from collections import deque
+
+from flask import current_app
+
+from task_manager.changes import data_changed
+
+# ends the stream of a subscriber that was dropped
+_DROPPED = object()
+# milliseconds browsers wait before reconnecting a closed stream
+RETRY_MS = 3000
+
+
+class Subscription:
+    """Events waiting to be sent to one client"""
+
+    def __init__(self, maxsize):
+        self.queue = queue.Queue(maxsize)
+        self.dropped = False
+
+    def get(self, timeout):
+        """Next ``(id, payload)`` event, None on timeout or once dropped"""
+        try:
+            event = self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if event is _DROPPED:
+            self.dropped = True
+            return None
+        return event
+
+
+class Broadcaster:
+    """Fans published events out to subscribers, keeping a short history
+
+    Event ids are ``<epoch>-<n>``: the random epoch keeps ids handed out by a
+    previous run from being mistaken for ids of this one.
+    """
+
+    def __init__(self, queue_size=100, history=1000):
+        self.queue_size = queue_size
+        self.epoch = uuid.uuid4().hex[:12]
+        self._counter = itertools.count(1)
+        self._history = deque(maxlen=history)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def publish(self, payload):
+        """Queues an event for every subscriber, dropping those that lag"""
+        with self._lock:
+            number = next(self._counter)
+            self._history.append((number, payload))
+            event = (f"{self.epoch}-{number}", payload)
+            for subscription in list(self._subscribers):
+                try:
+                    subscription.queue.put_nowait(event)
+                except queue.Full:
+                    self._drop(subscription)
+        return event[0]
+
+    def subscribe(self, last_event_id=None):
+        """Registers a subscriber, replaying the events after last_event_id
+
+        Returns the Subscription and whether the replay is complete. It is not
+        when the id is unknown or older than the history, so the client has
+        to reload its data instead.
+        """
+        subscription = Subscription(self.queue_size)
+        with self._lock:
+            complete = True
+            if last_event_id:
+                missed, complete = self._since(last_event_id)
+                if len(missed) >= self.queue_size:
+                    missed, complete = [], False
+                for number, payload in missed:
+                    subscription.queue.put_nowait((f"{self.epoch}-{number}", payload))
+            self._subscribers.add(subscription)
+        return subscription, complete
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def _since(self, last_event_id):
+        """History events after last_event_id and whether none were evicted"""
+        epoch, _, number = last_event_id.partition("-")
+        if epoch != self.epoch or not number.isdigit():
+            return [], False
+        number = int(number)
+        oldest = self._history[0][0] if self._history else 1
+        return [e for e in self._history if e[0] > number], number >= oldest - 1
+
+    def _drop(self, subscription):
+        self._subscribers.discard(subscription)
+        self.dropped += 1
+        # make room so the subscriber sees the end of its stream
+        try:
+            while True:
+                subscription.queue.get_nowait()
+        except queue.Empty:
+            pass
+        subscription.queue.put_nowait(_DROPPED)
+
+
+def init_app(app):
+    app.config.setdefault("EVENTS_QUEUE_SIZE", 100)
+    app.config.setdefault("EVENTS_HISTORY", 1000)
+    app.config.setdefault("EVENTS_HEARTBEAT", 15)
+    app.extensions["event_broadcaster"] = Broadcaster(
+        app.config["EVENTS_QUEUE_SIZE"], app.config["EVENTS_HISTORY"]
+    )
+
+
+def broadcaster():
+    """Returns the Broadcaster of the current app"""
+    return current_app.extensions["event_broadcaster"]
+
+
+def change_payload(change):
+    """Compact JSON description of a Change, without empty members"""
+    payload = {"entity": change.entity, "action": change.action}
+    if change.ids is not None:
+        payload["ids"] = change.ids
+    if change.project_id is not None:
+        payload["project_id"] = change.project_id
+    if change.fields:
+        payload["fields"] = change.fields
+    return json.dumps(payload, separators=(",", ":"))
+
+
+def stream(source, subscription, complete, heartbeat):
+    """Yields the SSE stream of a subscription until it is dropped or closed"""
+    try:
+        yield f"retry: {RETRY_MS}\n\n"
+        if not complete:
+            yield "event: reset\ndata: {}\n\n"
+        while True:
+            event = subscription.get(heartbeat)
+            if subscription.dropped:
+                return
+            if event is None:
+                # comment line, lets the server notice a closed connection
+                yield ": keep-alive\n\n"
+                continue
+            event_id, payload = event
+            yield f"id: {event_id}\ndata: {payload}\n\n"
+    finally:
+        source.unsubscribe(subscription)
+
+
+@data_changed.connect
+def _publish(app, change):
+    app.extensions["event_broadcaster"].publish(change_payload(change))
@@ -0,0 +1,263 @@
+"""Request, SQL and rendering metrics in the Prometheus text format
+
+Hooks into the request cycle, the engine's cursor events, the session's
+commits and Jinja's render signals, and keeps the numbers in memory for the
+``/metrics`` endpoint to scrape. Every observation is a few additions under
+a lock, so it can stay on in production. Set ``METRICS_ENABLED`` to False to
+turn it off.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+
+from flask import (
+    before_render_template,
+    current_app,
+    g,
+    has_app_context,
+    has_request_context,
+    request,
+    template_rendered,
+)
+from sqlalchemy import event
+
+from task_manager import db
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _escape(value):
+    return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter, one value per combination of label values"""
+
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] += amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Histogram:
+    """Cumulative histogram over fixed buckets, one per label combination"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # per label combination: observations per bucket (+Inf last), sum
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def count(self, *labels):
+        entry = self._values.get(labels)
+        return sum(entry[0]) if entry else 0
+
+    def samples(self):
+        with self._lock:
+            values = {k: (list(v[0]), v[1]) for k, v in self._values.items()}
+        for labels, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = f'le="{bound}"'
+                yield (
+                    f"{self.name}_bucket{_labels(self.labelnames, labels, le)} "
+                    f"{cumulative}"
+                )
+            label_text = _labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_text} {_number(total)}"
+            yield f"{self.name}_count{label_text} {cumulative}"
+
+
+class Registry:
+    """The app's metrics, rendered together for a scrape"""
+
+    def __init__(self):
+        self.enabled = True
+        self.requests = Counter(
+            "task_manager_requests_total",
+            "Requests handled, by endpoint, method and status code.",
+            ("endpoint", "method", "status"),
+        )
+        self.request_duration = Histogram(
+            "task_manager_request_duration_seconds",
+            "Time spent handling a request.",
+            ("endpoint",),
+        )
+        self.request_statements = Histogram(
+            "task_manager_request_sql_statements",
+            "SQL statements executed per request.",
+            ("endpoint",),
+            STATEMENT_BUCKETS,
+        )
+        self.request_sql_duration = Histogram(
+            "task_manager_request_sql_duration_seconds",
+            "Time spent in SQL statements per request.",
+            ("endpoint",),
+        )
+        self.statements = Counter(
+            "task_manager_sql_statements_total",
+            "SQL statements executed, by endpoint.",
+            ("endpoint",),
+        )
+        self.commit_duration = Histogram(
+            "task_manager_commit_duration_seconds",
+            "Time spent committing a session, flush included.",
+        )
+        self.render_duration = Histogram(
+            "task_manager_template_render_seconds",
+            "Time spent rendering a template.",
+            ("template",),
+        )
+        self.purged_tasks = Counter(
+            "task_manager_purged_tasks_total",
+            "Tombstoned tasks deleted by the purger.",
+        )
+        self.purged_projects = Counter(
+            "task_manager_purged_projects_total",
+            "Tombstoned projects deleted by the purger.",
+        )
+        self.purge_chunk_duration = Histogram(
+            "task_manager_purge_chunk_seconds",
+            "Time spent in one purge transaction.",
+        )
+
+    def metrics(self):
+        return [value for value in vars(self).values() if hasattr(value, "samples")]
+
+    def render(self):
+        lines = []
+        for metric in self.metrics():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+def registry():
+    """Returns the metrics Registry of the current app"""
+    return current_app.extensions["metrics"]
+
+
+def _enabled_registry(app):
+    metrics = app.extensions.get("metrics")
+    return metrics if metrics is not None and metrics.enabled else None
+
+
+def _endpoint():
+    return request.endpoint or "unmatched"
+
+
+def init_app(app):
+    """Registers the hooks feeding the metrics, unless METRICS_ENABLED is off"""
+    app.config.setdefault("METRICS_ENABLED", True)
+    metrics = app.extensions["metrics"] = Registry()
+    metrics.enabled = app.config["METRICS_ENABLED"]
+    if not metrics.enabled:
+        return
+
+    @app.before_request
+    def _start_request():
+        g.metrics = [time.perf_counter(), 0, 0.0]
+
+    @app.after_request
+    def _end_request(response):
+        started, statements, sql_time = g.pop("metrics", (None, 0, 0.0))
+        if started is not None:
+            endpoint = _endpoint()
+            metrics.request_duration.observe(time.perf_counter() - started, endpoint)
+            metrics.request_statements.observe(statements, endpoint)
+            metrics.request_sql_duration.observe(sql_time, endpoint)
+            metrics.requests.inc(endpoint, request.method, response.status_code)
+        return response
+
+    def _start_statement(conn, cursor, statement, parameters, context, executemany):
+        conn.info["metrics_started"] = time.perf_counter()
+
+    def _end_statement(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_started"]
+        if has_request_context() and "metrics" in g:
+            g.metrics[1] += 1
+            g.metrics[2] += elapsed
+            metrics.statements.inc(_endpoint())
+
+    # the read bind's statements count too, see routing.py
+    for engine in db.engines.values():
+        event.listen(engine, "before_cursor_execute", _start_statement)
+        event.listen(engine, "after_cursor_execute", _end_statement)
+
+
+# The session and the template signals are shared by every app, so these
+# hooks are registered once and report to the app they run in.
+
+
+@event.listens_for(db.session, "before_commit")
+def _start_commit(session):
+    session.info["metrics_commit"] = time.perf_counter()
+
+
+@event.listens_for(db.session, "after_commit")
+def _end_commit(session):
+    started = session.info.pop("metrics_commit", None)
+    if started is not None and has_app_context():
+        metrics = _enabled_registry(current_app)
+        if metrics is not None:
+            metrics.commit_duration.observe(time.perf_counter() - started)
+
+
+@before_render_template.connect
+def _start_render(app, template, context, **extra):
+    context["_metrics_render"] = time.perf_counter()
+
+
+@template_rendered.connect
+def _end_render(app, template, context, **extra):
+    started = context.pop("_metrics_render", None)
+    metrics = _enabled_registry(app)
+    if started is not None and metrics is not None:
+        metrics.render_duration.observe(time.perf_counter() - started, template.name)
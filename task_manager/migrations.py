@@ -0,0 +1,289 @@
+"""Lightweight schema migrations
+
+``db.create_all()`` only creates tables that are missing, it never alters the
+ones already in an existing ``ctm.db``. Every migration listed in
+``MIGRATIONS`` is idempotent and brings an older database up to date with the
+models. The number of applied migrations is kept in SQLite's ``user_version``
+pragma so each one only runs once per database.
+"""
+
+from task_manager import db
+from task_manager.models import slugify
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.exec_driver_sql(f"PRAGMA table_info({table})")}
+
+
+def _add_secondary_indexes(conn):
+    """Indexes for the project and status filters and project name lookups"""
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_tasks_project_id_status "
+        "ON tasks (project_id, status)"
+    )
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_projects_project_name "
+        "ON projects (project_name)"
+    )
+
+
+def _add_active_project_index(conn):
+    """Partial index covering the one active project"""
+    conn.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_projects_active "
+        "ON projects (active) WHERE active = 1"
+    )
+
+
+def _add_task_search(conn):
+    """FTS5 index of the task descriptions, kept in sync by triggers
+
+    The index is an external content table over tasks, so the text is not
+    stored twice, and the prefix indexes keep short prefix queries fast.
+    Existing tasks are indexed by the final rebuild.
+    """
+    conn.exec_driver_sql(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS tasks_fts USING fts5("
+        "task, content='tasks', content_rowid='task_id', prefix='2 3')"
+    )
+    _create_search_triggers(conn)
+    conn.exec_driver_sql("INSERT INTO tasks_fts (tasks_fts) VALUES ('rebuild')")
+
+
+def _create_search_triggers(conn):
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS tasks_fts_insert AFTER INSERT ON tasks BEGIN "
+        "INSERT INTO tasks_fts (rowid, task) VALUES (new.task_id, new.task); END"
+    )
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS tasks_fts_delete AFTER DELETE ON tasks BEGIN "
+        "INSERT INTO tasks_fts (tasks_fts, rowid, task) "
+        "VALUES ('delete', old.task_id, old.task); END"
+    )
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS tasks_fts_update AFTER UPDATE OF task ON tasks "
+        "BEGIN "
+        "INSERT INTO tasks_fts (tasks_fts, rowid, task) "
+        "VALUES ('delete', old.task_id, old.task); "
+        "INSERT INTO tasks_fts (rowid, task) VALUES (new.task_id, new.task); END"
+    )
+
+
+def rebuild_task_counts(conn):
+    """Recomputes the task counters of every project with one GROUP BY
+
+    Repairs counters that drifted, for example after tasks were written with
+    the triggers dropped. Cleared tasks waiting for the purger are not
+    counted. Returns the number of projects.
+    """
+    live = ""
+    if "cleared_through" in _columns(conn, "projects"):
+        live = (
+            "JOIN projects AS p ON p.project_id = t.project_id "
+            "AND t.task_id > p.cleared_through "
+        )
+    projects = conn.exec_driver_sql(
+        "UPDATE projects SET open_tasks = 0, closed_tasks = 0"
+    ).rowcount
+    conn.exec_driver_sql(
+        "UPDATE projects SET open_tasks = counts.open, closed_tasks = counts.closed "
+        "FROM (SELECT t.project_id, "
+        "sum(t.status IS 1) AS open, sum(t.status IS 0) AS closed "
+        f"FROM tasks AS t {live}GROUP BY t.project_id) AS counts "
+        "WHERE projects.project_id = counts.project_id"
+    )
+    return projects
+
+
+_ADD_COUNTS = (
+    "UPDATE projects SET open_tasks = open_tasks + (new.status IS 1), "
+    "closed_tasks = closed_tasks + (new.status IS 0) "
+    "WHERE project_id = new.project_id;"
+)
+_REMOVE_COUNTS = (
+    "UPDATE projects SET open_tasks = open_tasks - (old.status IS 1), "
+    "closed_tasks = closed_tasks - (old.status IS 0) "
+    "WHERE project_id = old.project_id"
+)
+
+
+def _create_counter_triggers(conn, remove):
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS tasks_counts_insert AFTER INSERT ON tasks "
+        f"BEGIN {_ADD_COUNTS} END"
+    )
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS tasks_counts_delete AFTER DELETE ON tasks "
+        f"BEGIN {remove} END"
+    )
+    conn.exec_driver_sql(
+        "CREATE TRIGGER IF NOT EXISTS tasks_counts_update "
+        "AFTER UPDATE OF status, project_id ON tasks "
+        f"BEGIN {remove} {_ADD_COUNTS} END"
+    )
+
+
+def _add_task_counters(conn):
+    """Open and closed task counters on projects, kept in sync by triggers
+
+    Every insert, delete and status or project change of a task adjusts the
+    counters in the same transaction, so reading the counts of a project
+    costs one row whatever its number of tasks.
+    """
+    columns = _columns(conn, "projects")
+    for name in ("open_tasks", "closed_tasks"):
+        if name not in columns:
+            conn.exec_driver_sql(
+                f"ALTER TABLE projects ADD COLUMN {name} INTEGER NOT NULL DEFAULT 0"
+            )
+    _create_counter_triggers(conn, _REMOVE_COUNTS + ";")
+    rebuild_task_counts(conn)
+
+
+def _tasks_sql(conn):
+    return conn.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'tasks'"
+    ).scalar()
+
+
+def _rebuild_tasks(conn):
+    """Copies tasks into a table with the current definition of the model
+
+    Dropping the old table drops its index and triggers, which are created
+    again on the new one. The ids are kept, so the search index stays valid.
+    """
+    conn.exec_driver_sql(
+        "CREATE TABLE tasks_rebuilt ("
+        "task_id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT, "
+        "project_id INTEGER REFERENCES projects (project_id) ON DELETE CASCADE, "
+        "task TEXT, status BOOLEAN)"
+    )
+    conn.exec_driver_sql(
+        "INSERT INTO tasks_rebuilt (task_id, project_id, task, status) "
+        "SELECT task_id, project_id, task, status FROM tasks"
+    )
+    conn.exec_driver_sql("DROP TABLE tasks")
+    conn.exec_driver_sql("ALTER TABLE tasks_rebuilt RENAME TO tasks")
+    conn.exec_driver_sql(
+        "CREATE INDEX ix_tasks_project_id_status ON tasks (project_id, status)"
+    )
+    _create_search_triggers(conn)
+
+
+def _recreate_counter_triggers(conn):
+    """Counter triggers that skip the tasks already uncounted by a clear"""
+    for name in ("insert", "delete", "update"):
+        conn.exec_driver_sql(f"DROP TRIGGER IF EXISTS tasks_counts_{name}")
+    _create_counter_triggers(
+        conn, _REMOVE_COUNTS + " AND old.task_id > cleared_through;"
+    )
+
+
+def _add_tombstones(conn):
+    """Tombstone columns on projects, and task ids that are never reused
+
+    A cleared project hides its tasks with ids up to ``cleared_through``,
+    which only holds if no later task can get one of those ids back. The
+    counter triggers skip the hidden tasks, already uncounted, when the
+    purger deletes them.
+    """
+    columns = _columns(conn, "projects")
+    if "deleted" not in columns:
+        conn.exec_driver_sql(
+            "ALTER TABLE projects ADD COLUMN deleted BOOLEAN NOT NULL DEFAULT 0"
+        )
+    if "cleared_through" not in columns:
+        conn.exec_driver_sql(
+            "ALTER TABLE projects ADD COLUMN cleared_through INTEGER NOT NULL DEFAULT 0"
+        )
+
+    if "AUTOINCREMENT" not in _tasks_sql(conn).upper():
+        _rebuild_tasks(conn)
+    _recreate_counter_triggers(conn)
+
+
+def _cascade_project_deletes(conn):
+    """Tasks are deleted with their project
+
+    Older tables declare the foreign key without ``ON DELETE CASCADE`` and
+    are rebuilt. Tasks left behind by projects deleted before then are kept,
+    ``flask tasks purge-orphans`` removes them.
+    """
+    if "ON DELETE CASCADE" not in _tasks_sql(conn).upper():
+        _rebuild_tasks(conn)
+        _recreate_counter_triggers(conn)
+
+
+def _unique_non_ascii_slugs(conn):
+    """Slugs of the names that lost letters to ASCII, see models.slugify
+
+    Only names with non-ASCII characters can get a different slug.
+    """
+    rows = conn.exec_driver_sql(
+        "SELECT project_id, project_name, url_slug FROM projects"
+    ).all()
+    for project_id, name, slug in rows:
+        if name is None or name.isascii() or slugify(name) == slug:
+            continue
+        conn.exec_driver_sql(
+            "UPDATE projects SET url_slug = ? WHERE project_id = ?",
+            (slugify(name), project_id),
+        )
+
+
+MIGRATIONS = [
+    _add_secondary_indexes,
+    _add_active_project_index,
+    _add_task_search,
+    _add_task_counters,
+    _add_tombstones,
+    _cascade_project_deletes,
+    _unique_non_ascii_slugs,
+]
+
+
+def schema_version(conn):
+    """Returns the number of migrations applied to the database"""
+    return conn.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def apply(conn):
+    """Applies any pending migrations on a connection, returns the version"""
+    version = schema_version(conn)
+    for migration in MIGRATIONS[version:]:
+        migration(conn)
+        version += 1
+        conn.exec_driver_sql(f"PRAGMA user_version = {version}")
+    return version
+
+
+def migrate(conn):
+    """Applies any pending migrations in one transaction of ``conn``
+
+    Foreign keys are not enforced meanwhile, as SQLite asks when a table is
+    rebuilt, so tasks orphaned before the cascade do not stop the copy. The
+    transaction is begun explicitly: the sqlite3 driver only begins one
+    before DML, and would otherwise commit each CREATE or DROP on its own.
+    """
+    enforced = conn.exec_driver_sql("PRAGMA foreign_keys").scalar()
+    conn.exec_driver_sql("PRAGMA foreign_keys = OFF")
+    conn.commit()
+    try:
+        conn.exec_driver_sql("BEGIN")
+        version = apply(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.exec_driver_sql(f"PRAGMA foreign_keys = {enforced}")
+        conn.commit()
+    return version
+
+
+def upgrade(engine=None):
+    """Applies any pending migrations and returns the resulting version"""
+    engine = engine or db.engine
+
+    with engine.connect() as conn:
+        return migrate(conn)
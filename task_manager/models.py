@@ -1,16 +1,50 @@
+import hashlib
+import unicodedata
+
 from sqlalchemy.orm import validates
 from werkzeug.utils import secure_filename
 
 from task_manager import db
 
 
+def slugify(name):
+    """Returns the url slug that identifies a project name
+
+    secure_filename drops the letters it cannot spell in ASCII, which would
+    give "Работа" and "仕事" the same empty slug, so names with such letters
+    get a digest of the name appended.
+    """
+    name = name.lower()
+    slug = secure_filename(name)
+    if any(
+        c.isalnum() and not c.isascii() for c in unicodedata.normalize("NFKD", name)
+    ):
+        digest = hashlib.sha1(name.encode()).hexdigest()[:10]
+        slug = f"{slug}-{digest}" if slug else digest
+    return slug
+
+
 class Projects(db.Model):
     """Projects schema"""
 
+    __table_args__ = (
+        db.Index("ix_projects_project_name", "project_name"),
+        db.Index("ix_projects_active", "active", sqlite_where=db.text("active = 1")),
+    )
+
     project_id = db.Column(db.Integer, primary_key=True)
     project_name = db.Column(db.String(20))
     active = db.Column(db.Boolean)
     url_slug = db.Column(db.String, unique=True)
+    # maintained by triggers on tasks, see migrations._add_task_counters
+    open_tasks = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    closed_tasks = db.Column(db.Integer, nullable=False, default=0, server_default="0")
+    # tombstones, see api.live_projects and api.live_tasks: a deleted project
+    # and the tasks with ids up to cleared_through are hidden until purged
+    deleted = db.Column(db.Boolean, nullable=False, default=False, server_default="0")
+    cleared_through = db.Column(
+        db.Integer, nullable=False, default=0, server_default="0"
+    )
 
     def __init__(self, project_name, active):
         self.project_name = project_name
@@ -18,7 +52,7 @@ class Projects(db.Model):
 
     @validates("project_name")
     def _generate_slug(self, _, name):
-        self.url_slug = secure_filename(name.lower())
+        self.url_slug = slugify(name)
         return name
 
     def __repr__(self):
@@ -28,8 +62,18 @@ class Projects(db.Model):
 class Tasks(db.Model):
     """Tasks schema"""
 
+    # ids are never reused, so a task created after a clear is never taken
+    # for one of the cleared tasks, see Projects.cleared_through
+    __table_args__ = (
+        db.Index("ix_tasks_project_id_status", "project_id", "status"),
+        {"sqlite_autoincrement": True},
+    )
+
     task_id = db.Column(db.Integer, primary_key=True)
-    project_id = db.Column(db.Integer, db.ForeignKey("projects.project_id"))
+    # deleting a project deletes its tasks, see config.init_engine
+    project_id = db.Column(
+        db.Integer, db.ForeignKey("projects.project_id", ondelete="CASCADE")
+    )
     task = db.Column(db.Text)
     status = db.Column(db.Boolean, default=False)
 
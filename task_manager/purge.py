@@ -0,0 +1,194 @@
+"""Chunked removal of tombstoned projects and tasks
+
+Deleting a project or clearing its tasks only marks the project's row (see
+api.delete_projects and api.clear_tasks), so the request never holds
+SQLite's write lock for long. The Purger removes the hidden rows afterwards,
+``PURGE_CHUNK_SIZE`` tasks per short transaction with a ``PURGE_PAUSE``
+between them for the other writers. Once a project has no hidden task left,
+its row is deleted too, or its watermark reset. Orphaned tasks, left in
+databases from before tasks were deleted with their project, are removed
+the same way by ``flask tasks purge-orphans``.
+
+A background thread is started when a tombstoning change is committed and
+ends when nothing is left to purge. Set ``PURGE_IN_BACKGROUND`` to False to
+only purge with ``flask tasks purge``, which also picks up rows tombstoned by
+another process.
+"""
+
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy import delete, func, or_, select, update
+
+from task_manager import db
+from task_manager.changes import data_changed
+from task_manager.models import Projects, Tasks
+
+# tasks whose project row no longer exists
+orphaned_tasks = (
+    Tasks.project_id.is_not(None),
+    ~select(Projects.project_id)
+    .where(Projects.project_id == Tasks.project_id)
+    .exists(),
+)
+
+
+class Purger:
+    """Deletes tombstoned rows chunk by chunk, keeping progress counters"""
+
+    def __init__(self, app):
+        self.app = app
+        self.tasks = 0
+        self.projects = 0
+        self.chunks = 0
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def purge_chunk(self, chunk_size):
+        """Deletes up to ``chunk_size`` hidden tasks of one project
+
+        Returns the number of deleted tasks, or None when nothing is left to
+        purge. The project is finished off in the same transaction as its
+        last chunk, so no task can be created in between.
+        """
+        started = time.perf_counter()
+        with db.engine.begin() as conn:
+            project = conn.execute(
+                select(Projects.project_id, Projects.deleted, Projects.cleared_through)
+                .where(or_(Projects.deleted == db.true(), Projects.cleared_through > 0))
+                .limit(1)
+            ).first()
+            if project is None:
+                return None
+
+            project_id, deleted, cleared_through = project
+            hidden = select(Tasks.task_id).where(Tasks.project_id == project_id)
+            if not deleted:
+                hidden = hidden.where(Tasks.task_id <= cleared_through)
+            purged = conn.execute(
+                delete(Tasks).where(Tasks.task_id.in_(hidden.limit(chunk_size)))
+            ).rowcount
+            finished = 0
+            if purged < chunk_size:
+                if deleted:
+                    conn.execute(
+                        delete(Projects).where(Projects.project_id == project_id)
+                    )
+                    finished = 1
+                else:
+                    conn.execute(
+                        update(Projects)
+                        .where(
+                            Projects.project_id == project_id,
+                            Projects.cleared_through == cleared_through,
+                        )
+                        .values(cleared_through=0)
+                    )
+
+        self._record(started, purged, finished)
+        return purged
+
+    def purge_orphans(self, chunk_size=None, pause=None):
+        """Deletes the orphaned tasks, returns their number"""
+        chunk_size, pause = self._settings(chunk_size, pause)
+        orphans = select(Tasks.task_id).where(*orphaned_tasks).limit(chunk_size)
+        total = 0
+        while True:
+            started = time.perf_counter()
+            with db.engine.begin() as conn:
+                purged = conn.execute(
+                    delete(Tasks).where(Tasks.task_id.in_(orphans))
+                ).rowcount
+            self._record(started, purged)
+            total += purged
+            if purged < chunk_size:
+                return total
+            if pause:
+                time.sleep(pause)
+
+    def count_orphans(self):
+        """Returns the number of orphaned tasks"""
+        with db.engine.connect() as conn:
+            return conn.scalar(
+                select(func.count()).select_from(Tasks).where(*orphaned_tasks)
+            )
+
+    def run(self, chunk_size=None, pause=None):
+        """Purges until nothing is left, returns the number of deleted tasks"""
+        chunk_size, pause = self._settings(chunk_size, pause)
+        total = 0
+        while True:
+            purged = self.purge_chunk(chunk_size)
+            if purged is None:
+                return total
+            total += purged
+            if pause:
+                time.sleep(pause)
+
+    def _settings(self, chunk_size, pause):
+        config = self.app.config
+        chunk_size = chunk_size or config["PURGE_CHUNK_SIZE"]
+        pause = config["PURGE_PAUSE"] if pause is None else pause
+        return chunk_size, pause
+
+    def _record(self, started, purged, finished=0):
+        self.tasks += purged
+        self.projects += finished
+        self.chunks += 1
+        metrics = self.app.extensions.get("metrics")
+        if metrics is not None and metrics.enabled:
+            metrics.purged_tasks.inc(amount=purged)
+            metrics.purged_projects.inc(amount=finished)
+            metrics.purge_chunk_duration.observe(time.perf_counter() - started)
+
+    def wake(self):
+        """Starts the background thread, or makes it look again for work"""
+        with self._lock:
+            self._wakeup.set()
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._work, name="task-purger", daemon=True
+                )
+                self._thread.start()
+
+    def join(self, timeout=None):
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _work(self):
+        with self.app.app_context():
+            while True:
+                self._wakeup.clear()
+                try:
+                    self.run()
+                except Exception:
+                    self.app.logger.exception("Purging tombstoned rows failed")
+                finally:
+                    db.session.remove()
+                with self._lock:
+                    if not self._wakeup.is_set():
+                        self._thread = None
+                        return
+
+
+def init_app(app):
+    app.config.setdefault("PURGE_IN_BACKGROUND", True)
+    app.config.setdefault("PURGE_CHUNK_SIZE", 500)
+    app.config.setdefault("PURGE_PAUSE", 0.05)
+    app.extensions["purger"] = Purger(app)
+
+
+def purger():
+    """Returns the Purger of the current app"""
+    return current_app.extensions["purger"]
+
+
+@data_changed.connect
+def _wake(app, change):
+    # only bulk deletes are tombstones, single tasks are deleted right away
+    if change.action == "deleted" and (change.entity == "project" or not change.ids):
+        if app.config["PURGE_IN_BACKGROUND"]:
+            app.extensions["purger"].wake()
@@ -1,12 +1,77 @@
-from flask import Blueprint, jsonify, redirect, render_template, request
-
-from task_manager import db
+from functools import wraps
+
+from flask import (
+    Blueprint,
+    Response,
+    current_app,
+    jsonify,
+    make_response,
+    redirect,
+    render_template,
+    request,
+    stream_with_context,
+)
+from sqlalchemy import insert, select
+
+from task_manager import api, db, events, metrics, serializers
+from task_manager.budget import query_budget
+from task_manager.cache import cache_tag, cached, response_cache
+from task_manager.changes import Change, commit_changes, data_version
 from task_manager.models import Projects, Tasks
+from task_manager.routing import writes
 
 routes = Blueprint("routes", __name__)
 
 
+def _as_id(value):
+    """Converts an id taken from the url as a string, None if it is not one"""
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def _wants_fragment():
+    """Whether the page's script sent the request and patches the DOM itself
+
+    Such requests get the changed row, or no content, instead of a redirect
+    to the re-rendered home page.
+    """
+    return "X-Requested-With" in request.headers
+
+
+def _live_project(project_id):
+    """The project with this id, None if it is missing or tombstoned"""
+    project = db.session.get(Projects, project_id)
+    return None if project is None or project.deleted else project
+
+
+def _live_task(task_id):
+    """The task with this id, None if it is missing or tombstoned"""
+    return db.session.scalars(
+        select(Tasks).where(Tasks.task_id == task_id, api.live_tasks)
+    ).first()
+
+
+def _tombstone(statement):
+    """Runs a tombstoning UPDATE, refreshing the projects it changed"""
+    return db.session.execute(
+        statement, execution_options={"synchronize_session": "fetch"}
+    )
+
+
+def _activate_project(project_id):
+    """Makes the project the only active one, or none when it is None"""
+    db.session.execute(
+        api.activate_project(project_id),
+        execution_options={"synchronize_session": "fetch"},
+    )
+
+
 @routes.route("/")
+@writes
+@query_budget(4)
+@cached("projects")
 def index():
     """Home page of the app
 
@@ -16,34 +81,34 @@ def index():
     that one as the active one.
     """
     active = None
-    projects = Projects.query.all()
-    tasks = Tasks.query.all()
+    projects = (
+        Projects.query.filter(api.live_projects).order_by(Projects.project_id).all()
+    )
 
-    if len(projects) == 1:
+    for project in projects:
+        if project.active:
+            active = project.project_id
+
+    if projects and not active:
         projects[0].active = True
         active = projects[0].project_id
-        db.session.commit()
-
-    if projects:
-        for project in projects:
-            if project.active:
-                active = project.project_id
-        if not active:
-            projects[0].active = True
-            active = projects[0].project_id
-            db.session.commit()
-    else:
-        projects = None
-
-    if projects:
-        return render_template(
-            "index.html", tasks=tasks, projects=projects, active=active
+        commit_changes(Change("project", "updated", [active], fields={"active": True}))
+        # the commit expired every project, reload them in a single query
+        projects = (
+            Projects.query.filter(api.live_projects).order_by(Projects.project_id).all()
         )
-    else:
-        return render_template("index.html", tasks=tasks, active=active)
+
+    # only the active tab is rendered, so only its tasks are loaded
+    cache_tag(f"tasks:{active}")
+    tasks = []
+    if active:
+        tasks = Tasks.query.filter(Tasks.project_id == active, api.live_tasks).all()
+
+    return render_template("index.html", tasks=tasks, projects=projects, active=active)
 
 
 @routes.route("/add", methods=["POST"])
+@query_budget(3)
 def add_task():
     """Adds a new task
 
@@ -51,8 +116,6 @@ def add_task():
     Tasks if none was entered. If the entered project does not exists, it is
     added to the database and sets the active tab.
     """
-    found = False
-    project_id = None
     task = request.form.get("task")
     project = request.form.get("project")
 
@@ -62,131 +125,169 @@ def add_task():
     if not project:
         project = "Tasks"
 
-    projects = Projects.query.all()
-
-    for proj in projects:
-        if proj.project_name == project:
-            found = True
-
-    # add the project if not in database already
-    if not found:
-        add_project = Projects(project, True)
-        db.session.add(add_project)
-        db.session.commit()
-        projects = Projects.query.all()
-
-    # set the active tab
-    for proj in projects:
-        if proj.project_name == project:
-            project_id = proj.project_id
-            proj.active = True
-        else:
-            proj.active = False
-
     status = bool(int(request.form.get("status")))
 
+    # add the project if not in database already and set the active tab
+    project_id, was_active = db.session.execute(api.upsert_project(project)).one()
+    changes = []
+    if not was_active:
+        _activate_project(project_id)
+        changes.append(
+            Change("project", "updated", [project_id], fields={"active": True})
+        )
+
     # add the new task
     new_task = Tasks(project_id, task, status)
     db.session.add(new_task)
-    db.session.commit()
-    return redirect("/")
-
-
-@routes.route("/close/<int:task_id>")
+    db.session.flush()
+    changes.append(
+        Change(
+            "task",
+            "created",
+            [new_task.task_id],
+            project_id,
+            {"task": task, "status": status},
+        )
+    )
+    # the row only fits the page as it is when its tab was already active,
+    # it is rendered before the commit expires the task
+    row = None
+    if was_active and _wants_fragment():
+        row = render_template("_task_row.html", task=new_task)
+    commit_changes(*changes)
+    return (row, 201) if row else redirect("/")
+
+
+@routes.route("/close/<int:task_id>", methods=["GET", "POST"])
+@writes
+@query_budget(2)
 def close_task(task_id):
     """Changes the state of a task
 
     If the task is open, it closes it. If it's close, it opens it.
     Redirects to home page if the task does not exists.
     """
-    task = db.session.get(Tasks, task_id)
+    task = _live_task(task_id)
 
     if not task:
-        return redirect("/")
+        return ("Task not found", 404) if _wants_fragment() else redirect("/")
 
     if task.status:
         task.status = False
     else:
         task.status = True
 
-    db.session.commit()
-    return redirect("/")
+    # rendered before the commit expires the task
+    row = render_template("_task_row.html", task=task) if _wants_fragment() else None
+    commit_changes(
+        Change("task", "updated", [task_id], task.project_id, {"status": task.status})
+    )
+    return row or redirect("/")
 
 
-@routes.route("/delete/<int:task_id>")
+@routes.route("/delete/<int:task_id>", methods=["GET", "POST"])
+@writes
+@query_budget(2)
 def delete_task(task_id):
     """Deletes task by its ID
 
     If the task does not exist, redirects to home page.
     """
-    task = db.session.get(Tasks, task_id)
+    task = _live_task(task_id)
 
     if not task:
-        return redirect("/")
+        return ("Task not found", 404) if _wants_fragment() else redirect("/")
 
     db.session.delete(task)
-    db.session.commit()
-    return redirect("/")
+    commit_changes(Change("task", "deleted", [task_id], task.project_id))
+    return ("", 204) if _wants_fragment() else redirect("/")
 
 
 @routes.route("/clear/<delete_id>")
+@writes
+@query_budget(1)
 def clear_all(delete_id):
-    """Dumps all tasks from the active tab and removes the project tab"""
-    Tasks.query.filter(Tasks.project_id == delete_id).delete()
-    Projects.query.filter(Projects.project_id == delete_id).delete()
-    db.session.commit()
+    """Dumps all tasks from the active tab and removes the project tab
+
+    Only the project row is marked deleted, the purger removes the rows.
+    """
+    _tombstone(api.delete_projects(Projects.project_id == delete_id, api.live_projects))
+    commit_changes(
+        Change("task", "deleted", project_id=_as_id(delete_id)),
+        Change("project", "deleted", [_as_id(delete_id)]),
+    )
 
     return redirect("/")
 
 
-@routes.route("/remove/<lists_id>")
+@routes.route("/remove/<lists_id>", methods=["GET", "POST"])
+@writes
+@query_budget(1)
 def remove_all(lists_id):
-    """Dumps all tasks from the active tab"""
-    Tasks.query.filter(Tasks.project_id == lists_id).delete()
-    db.session.commit()
+    """Dumps all tasks from the active tab
 
-    return redirect("/")
+    The tasks are only hidden behind the project's watermark, the purger
+    removes them.
+    """
+    _tombstone(api.clear_tasks(Projects.project_id == lists_id, api.live_projects))
+    commit_changes(Change("task", "deleted", project_id=_as_id(lists_id)))
+
+    return ("", 204) if _wants_fragment() else redirect("/")
 
 
 @routes.route("/project/<slug>")
+@writes
+@query_budget(2)
 def tab_nav(slug):
     """Switches between active tabs"""
-    projects = Projects.query.all()
-
-    for project in projects:
-        if project.url_slug == slug:
-            project.active = True
-        else:
-            project.active = False
+    project = Projects.query.filter_by(url_slug=slug).first()
+
+    # an unknown slug leaves no project active
+    if not project or not project.active:
+        project_id = project.project_id if project else None
+        _activate_project(project_id)
+        commit_changes(
+            Change(
+                "project",
+                "updated",
+                [project_id] if project else None,
+                fields={"active": bool(project)},
+            )
+        )
 
-    db.session.commit()
     return redirect("/")
 
 
 @routes.route("/rename_project/<int:id>", methods=["POST"])
+@query_budget(2)
 def rename_project(id):
     data = request.get_json()
     new_name = data.get("new_name", "").strip()
     if new_name:
-        project = db.session.get(Projects, id)
+        project = _live_project(id)
         if not project:
             return "Project not found", 404
         project.project_name = new_name
-        db.session.commit()
-        return "", 204
+        fields = {"name": new_name, "url_slug": project.url_slug}
+        commit_changes(Change("project", "updated", [id], fields=fields))
+        # the script needs the new slug to fix the tab's link
+        return (jsonify(fields), 200) if _wants_fragment() else ("", 204)
     return "Invalid name", 400
 
 
 @routes.route("/rename_task_desc/<int:id>", methods=["POST"])
+@query_budget(2)
 def rename_task_desc(id):
     data = request.get_json()
     new_desc = data.get("new_desc", "").strip()
     if new_desc:
-        task = db.session.get(Tasks, id)
+        task = _live_task(id)
         if not task:
             return "Task not found", 404
         task.task = new_desc
-        db.session.commit()
+        commit_changes(
+            Change("task", "updated", [id], task.project_id, {"task": new_desc})
+        )
         return "", 204
     return "Invalid description", 400
 
@@ -194,15 +295,90 @@ def rename_task_desc(id):
 # REST API
 
 
+def _etag_by_version(view):
+    """Serves a read endpoint with an ETag derived from the data version
+
+    When the client already holds the current tag the view is skipped and a
+    304 is returned without touching the database.
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        etag = data_version().etag
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = make_response(view(*args, **kwargs))
+        if response.status_code in (200, 304):
+            response.set_etag(etag)
+        return response
+
+    return wrapper
+
+
+def _json_response(payload, status=200):
+    """Response of JSON data, records included, encoded by the serializers"""
+    return Response(
+        serializers.dumps(payload), status=status, mimetype="application/json"
+    )
+
+
+def _paginate(record, key, limit, after, *criteria):
+    """Returns one keyset page of records and the cursor of the next page
+
+    Only the record's columns are selected. One extra row is fetched to tell
+    whether another page exists, so the cursor is None on the last page.
+    """
+    rows = db.session.execute(
+        select(*record.columns)
+        .where(key > after, *criteria)
+        .order_by(key)
+        .limit(limit + 1)
+    ).all()
+    next_after = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_after = getattr(rows[-1], key.key)
+    return serializers.records(record, rows), next_after
+
+
+def _page_response(payload, next_after, limit):
+    """Wraps a page in a response carrying the Link header of the next one"""
+    response = _json_response(payload)
+    if next_after is not None:
+        response.headers["Link"] = api.next_link(
+            request.path, request.args.to_dict(), next_after, limit
+        )
+    return response, 200
+
+
 @routes.route("/api/projects", methods=["GET"])
+@query_budget(1)
+@_etag_by_version
+@cached("projects")
 def api_get_projects():
     """
-    Get all projects
+    Get projects, one keyset page at a time
     ---
     tags: [Projects]
+    parameters:
+      - name: limit
+        in: query
+        type: integer
+        description: Maximum number of projects to return
+      - name: after
+        in: query
+        type: integer
+        description: Only return projects with an id greater than this one
+      - name: counts
+        in: query
+        type: boolean
+        description: Include the open, closed and total task counts
     responses:
       200:
-        description: List of all projects
+        description: >
+          One page of projects. A Link header with rel="next" points to the
+          following page when there is one.
         schema:
           type: array
           items:
@@ -213,20 +389,29 @@ def api_get_projects():
                 type: string
               active:
                 type: boolean
+      400:
+        description: Invalid pagination arguments
     """
-    projects = Projects.query.all()
-    return (
-        jsonify(
-            [
-                {"id": p.project_id, "name": p.project_name, "active": p.active}
-                for p in projects
-            ]
-        ),
-        200,
+    try:
+        limit, after = api.page_args(request.args)
+        counts = api.parse_flag(request.args, "counts")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    record = serializers.ProjectCountsRecord if counts else serializers.ProjectRecord
+    projects, next_after = _paginate(
+        record, Projects.project_id, limit, after, api.live_projects
     )
+    if counts:
+        # the counters move with every task write
+        cache_tag("task-counts")
+    return _page_response(projects, next_after, limit)
 
 
 @routes.route("/api/projects/<int:id>", methods=["GET"])
+@query_budget(1)
+@_etag_by_version
+@cached("project:{id}")
 def api_get_project(id):
     """
     Get project by ID
@@ -243,49 +428,290 @@ def api_get_project(id):
       404:
         description: Project not found
     """
-    project = db.session.get(Projects, id)
-    if not project:
+    row = db.session.execute(
+        select(*serializers.ProjectRecord.columns).where(
+            Projects.project_id == id, api.live_projects
+        )
+    ).first()
+    if not row:
+        return jsonify({"error": "Project not found"}), 404
+    return _json_response(serializers.ProjectRecord(*row))
+
+
+@routes.route("/api/projects/<int:id>/stats", methods=["GET"])
+@query_budget(1)
+@_etag_by_version
+@cached("project:{id}", "tasks:{id}")
+def api_get_project_stats(id):
+    """
+    Get the task counts of a project
+    ---
+    tags: [Projects]
+    parameters:
+      - name: id
+        in: path
+        type: integer
+        required: true
+    responses:
+      200:
+        description: Open, closed and total number of tasks
+      404:
+        description: Project not found
+    """
+    row = db.session.execute(
+        select(Projects.open_tasks, Projects.closed_tasks).where(
+            Projects.project_id == id, api.live_projects
+        )
+    ).first()
+    if not row:
         return jsonify({"error": "Project not found"}), 404
-    return (
-        jsonify(
-            {
-                "id": project.project_id,
-                "name": project.project_name,
-                "active": project.active,
-            }
+    return jsonify({"id": id, **api.task_counts(*row)}), 200
+
+
+@routes.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """
+    Metrics in the Prometheus text format
+    ---
+    tags: [Admin]
+    produces: [text/plain]
+    responses:
+      200:
+        description: >
+          Request counts and latency per endpoint, SQL statements and time per
+          request, commit and template rendering latency
+    """
+    return Response(metrics.registry().render(), mimetype="text/plain; version=0.0.4")
+
+
+@routes.route("/api/cache", methods=["GET"])
+def api_cache_stats():
+    """
+    Response cache statistics
+    ---
+    tags: [Admin]
+    responses:
+      200:
+        description: Size and hit, miss, eviction and invalidation counters
+    """
+    stats = response_cache().stats()
+    stats["maxsize"] = current_app.config["RESPONSE_CACHE_SIZE"]
+    stats["enabled"] = bool(stats["maxsize"])
+    return jsonify(stats), 200
+
+
+@routes.route("/api/events", methods=["GET"])
+def api_events():
+    """
+    Change feed as Server-Sent Events
+    ---
+    tags: [Events]
+    parameters:
+      - name: Last-Event-ID
+        in: header
+        type: string
+        description: Resume after this event, also accepted as last_event_id
+    produces: [text/event-stream]
+    responses:
+      200:
+        description: >
+          One event per committed change, with its entity, action, ids,
+          project_id and changed fields as JSON. A "reset" event means events
+          were missed and the client should reload its data.
+    """
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get(
+        "last_event_id"
+    )
+    source = events.broadcaster()
+    subscription, complete = source.subscribe(last_event_id)
+    # plain generator: the stream holds no request context or database session
+    return Response(
+        events.stream(
+            source, subscription, complete, current_app.config["EVENTS_HEARTBEAT"]
         ),
-        200,
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
 @routes.route("/api/tasks", methods=["GET"])
+@query_budget(1)
+@_etag_by_version
 def api_get_tasks():
     """
-    Get all tasks
+    Get tasks, one keyset page at a time
     ---
     tags: [Tasks]
+    parameters:
+      - name: limit
+        in: query
+        type: integer
+        description: Maximum number of tasks to return
+      - name: after
+        in: query
+        type: integer
+        description: Only return tasks with an id greater than this one
+      - name: project_id
+        in: query
+        type: integer
+        description: Only return tasks of this project
+      - name: status
+        in: query
+        type: string
+        enum: [open, closed]
+        description: Only return open or closed tasks
     responses:
       200:
-        description: List of all tasks
-    """
-    tasks = Tasks.query.all()
-    return (
-        jsonify(
-            [
-                {
-                    "id": t.task_id,
-                    "project_id": t.project_id,
-                    "task": t.task,
-                    "status": t.status,
-                }
-                for t in tasks
-            ]
-        ),
-        200,
+        description: >
+          One page of tasks. A Link header with rel="next" points to the
+          following page when there is one.
+      400:
+        description: Invalid filter or pagination arguments
+    """
+    try:
+        limit, after = api.page_args(request.args)
+        criteria = api.task_filters(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    tasks, next_after = _paginate(
+        serializers.TaskRecord, Tasks.task_id, limit, after, *criteria
+    )
+    return _page_response(tasks, next_after, limit)
+
+
+@routes.route("/api/tasks/search", methods=["GET"])
+@query_budget(1)
+@_etag_by_version
+def api_search_tasks():
+    """
+    Full-text search over task descriptions
+    ---
+    tags: [Tasks]
+    parameters:
+      - name: q
+        in: query
+        type: string
+        required: true
+        description: >
+          Words that must all appear in the task, a trailing * matches any
+          word starting with it
+      - name: limit
+        in: query
+        type: integer
+        description: Maximum number of tasks to return
+      - name: project_id
+        in: query
+        type: integer
+        description: Only return tasks of this project
+      - name: status
+        in: query
+        type: string
+        enum: [open, closed]
+        description: Only return open or closed tasks
+    responses:
+      200:
+        description: Matching tasks, best match first
+      400:
+        description: Missing query or invalid arguments
+    """
+    try:
+        text, limit = api.search_args(request.args)
+        criteria = api.task_filters(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    rows = db.session.execute(
+        api.search_tasks(text, criteria, limit, serializers.TaskRecord.columns)
+    )
+    return _json_response(serializers.records(serializers.TaskRecord, rows))
+
+
+def _iter_task_rows(criteria):
+    """Yields task rows as plain tuples, fetched in keyset batches
+
+    Only one batch is held in memory at a time and no ORM objects are built.
+    """
+    after = 0
+    while True:
+        rows = db.session.execute(
+            select(*serializers.TaskRecord.columns)
+            .where(Tasks.task_id > after, *criteria)
+            .order_by(Tasks.task_id)
+            .limit(api.EXPORT_BATCH_SIZE)
+        ).all()
+        if not rows:
+            return
+        yield rows
+        after = rows[-1].task_id
+
+
+def _ndjson_lines(criteria):
+    for rows in _iter_task_rows(criteria):
+        yield api.encode_ndjson(rows)
+
+
+def _csv_lines(criteria):
+    encoder = api.CsvEncoder()
+    yield encoder.header()
+    for rows in _iter_task_rows(criteria):
+        yield encoder.encode(rows)
+
+
+EXPORT_FORMATS = {
+    "ndjson": (_ndjson_lines, "application/x-ndjson"),
+    "csv": (_csv_lines, "text/csv"),
+}
+
+
+@routes.route("/api/tasks/export", methods=["GET"])
+@_etag_by_version
+def api_export_tasks():
+    """
+    Stream every task as NDJSON or CSV
+    ---
+    tags: [Tasks]
+    parameters:
+      - name: format
+        in: query
+        type: string
+        enum: [ndjson, csv]
+        default: ndjson
+      - name: project_id
+        in: query
+        type: integer
+        description: Only export tasks of this project
+      - name: status
+        in: query
+        type: string
+        enum: [open, closed]
+        description: Only export open or closed tasks
+    responses:
+      200:
+        description: >
+          One task per line, streamed while the table is read in batches
+      400:
+        description: Unknown format or invalid filter
+    """
+    export_format = request.args.get("format", "ndjson")
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"error": f"Unknown format: {export_format}"}), 400
+    try:
+        criteria = api.task_filters(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    generate, mimetype = EXPORT_FORMATS[export_format]
+    return Response(
+        stream_with_context(generate(criteria)),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=tasks.{export_format}"},
     )
 
 
 @routes.route("/api/tasks/<int:id>", methods=["GET"])
+@query_budget(1)
+@_etag_by_version
 def api_get_task(id):
     """
     Get task by ID
@@ -302,23 +728,18 @@ def api_get_task(id):
       404:
         description: Task not found
     """
-    task = db.session.get(Tasks, id)
-    if not task:
+    row = db.session.execute(
+        select(*serializers.TaskRecord.columns).where(
+            Tasks.task_id == id, api.live_tasks
+        )
+    ).first()
+    if not row:
         return jsonify({"error": "Task not found"}), 404
-    return (
-        jsonify(
-            {
-                "id": task.task_id,
-                "project_id": task.project_id,
-                "task": task.task,
-                "status": task.status,
-            }
-        ),
-        200,
-    )
+    return _json_response(serializers.TaskRecord(*row))
 
 
 @routes.route("/api/projects", methods=["POST"])
+@query_budget(2)
 def api_create_project():
     """
     Create a new project
@@ -342,13 +763,27 @@ def api_create_project():
     data = request.get_json()
     if not data or "name" not in data:
         return jsonify({"error": "Project name is required"}), 400
-    project = Projects(data["name"], data.get("active", False))
+    project = Projects(data["name"], False)
     db.session.add(project)
-    db.session.commit()
-    return jsonify({"message": "Project created", "id": project.project_id}), 201
+    db.session.flush()
+    active = bool(data.get("active", False))
+    if active:
+        _activate_project(project.project_id)
+    project_id = project.project_id
+    commit_changes(
+        Change(
+            "project",
+            "created",
+            [project_id],
+            fields={"name": project.project_name, "active": active},
+        )
+    )
+    return jsonify({"message": "Project created", "id": project_id}), 201
 
 
 @routes.route("/api/tasks", methods=["POST"])
+# the project lookup, then the INSERT
+@query_budget(2)
 def api_create_task():
     """
     Create a new task
@@ -370,17 +805,191 @@ def api_create_task():
     responses:
       201:
         description: Task created
+      400:
+        description: Missing task, or project_id is not an integer
+      404:
+        description: Project not found, or deleted
     """
     data = request.get_json()
     if not data or "task" not in data or "project_id" not in data:
         return jsonify({"error": "Missing task or project_id"}), 400
-    task = Tasks(data["project_id"], data["task"], data.get("status", True))
+    if not isinstance(data["project_id"], int) or isinstance(data["project_id"], bool):
+        return jsonify({"error": "project_id must be an integer"}), 400
+    # a task of a deleted project would never be listed, then purged with it
+    project_id = db.session.scalar(
+        select(Projects.project_id).where(
+            Projects.project_id == data["project_id"], api.live_projects
+        )
+    )
+    if project_id is None:
+        return jsonify({"error": "Project not found"}), 404
+    task = Tasks(project_id, data["task"], data.get("status", True))
     db.session.add(task)
-    db.session.commit()
-    return jsonify({"message": "Task created", "id": task.task_id}), 201
+    db.session.flush()
+    task_id = task.task_id
+    commit_changes(
+        Change(
+            "task",
+            "created",
+            [task_id],
+            task.project_id,
+            {"task": task.task, "status": task.status},
+        )
+    )
+    return jsonify({"message": "Task created", "id": task_id}), 201
+
+
+def _validate_bulk_tasks(items):
+    """Splits bulk task payloads into insertable rows and per-item errors
+
+    All referenced projects are checked with a single query.
+    """
+    rows, errors = api.parse_bulk_tasks(items)
+    wanted = {row["project_id"] for _, row in rows}
+    existing = set(
+        db.session.scalars(
+            select(Projects.project_id).where(
+                Projects.project_id.in_(wanted), api.live_projects
+            )
+        )
+    )
+    return api.drop_missing_projects(rows, errors, existing)
+
+
+@routes.route("/api/tasks/bulk", methods=["POST"])
+# one SELECT, then an INSERT per 1000 rows
+@query_budget(1 + api.MAX_BULK_TASKS // 1000)
+def api_create_tasks_bulk():
+    """
+    Create many tasks in a single transaction
+    ---
+    tags: [Tasks]
+    parameters:
+      - in: body
+        name: tasks
+        required: true
+        schema:
+          type: object
+          properties:
+            tasks:
+              type: array
+              items:
+                properties:
+                  project_id:
+                    type: integer
+                  task:
+                    type: string
+                  status:
+                    type: boolean
+            atomic:
+              type: boolean
+              default: true
+              description: >
+                Reject the whole batch if any task is invalid. When false,
+                valid tasks are created and invalid ones reported.
+    responses:
+      201:
+        description: >
+          Tasks created. ids follows the order of the request, with null for
+          tasks that were rejected.
+      400:
+        description: Invalid payload, or invalid tasks in atomic mode
+    """
+    data = request.get_json(silent=True)
+    items = data.get("tasks") if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "A non-empty list of tasks is required"}), 400
+    if len(items) > api.MAX_BULK_TASKS:
+        return (
+            jsonify({"error": f"At most {api.MAX_BULK_TASKS} tasks per request"}),
+            400,
+        )
+    atomic = data.get("atomic", True)
+    if not isinstance(atomic, bool):
+        return jsonify({"error": "atomic must be a boolean"}), 400
+
+    rows, errors = _validate_bulk_tasks(items)
+    if not rows or (errors and atomic):
+        return jsonify({"error": "Invalid tasks", "errors": errors}), 400
+
+    # executemany-style insert, batched by SQLAlchemy's insertmanyvalues.
+    # SQLite hands out increasing rowids in VALUES order within the write
+    # transaction, so sorting the returned ids restores the request order.
+    new_ids = sorted(
+        db.session.scalars(
+            insert(Tasks).returning(Tasks.task_id), [row for _, row in rows]
+        )
+    )
+
+    ids = [None] * len(items)
+    created = {}
+    for (index, row), task_id in zip(rows, new_ids):
+        ids[index] = task_id
+        created.setdefault(row["project_id"], []).append(task_id)
+    commit_changes(
+        *(
+            Change("task", "created", task_ids, project_id)
+            for project_id, task_ids in created.items()
+        )
+    )
+    return jsonify({"message": "Tasks created", "ids": ids, "errors": errors}), 201
+
+
+@routes.route("/api/tasks/bulk", methods=["PUT"])
+@query_budget(1)
+def api_update_tasks_bulk():
+    """
+    Update many tasks with a single statement
+    ---
+    tags: [Tasks]
+    parameters:
+      - in: body
+        name: update
+        required: true
+        schema:
+          type: object
+          properties:
+            ids:
+              type: array
+              items:
+                type: integer
+              description: Tasks to update, unless filter is given
+            filter:
+              type: object
+              description: Update the tasks matching project_id and/or status
+              properties:
+                project_id:
+                  type: integer
+                status:
+                  type: boolean
+            task:
+              type: string
+            status:
+              type: boolean
+    responses:
+      200:
+        description: Number of tasks updated
+      400:
+        description: Invalid payload
+    """
+    try:
+        criteria, values, ids, project_id = api.parse_bulk_update(
+            request.get_json(silent=True)
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # one set-based UPDATE, the matched rows are never loaded
+    updated = db.session.execute(
+        api.update_tasks(criteria, values),
+        execution_options={"synchronize_session": False},
+    ).rowcount
+    commit_changes(Change("task", "updated", ids, project_id, values))
+    return jsonify({"message": "Tasks updated", "updated": updated}), 200
 
 
 @routes.route("/api/projects/<int:id>", methods=["PUT"])
+@query_budget(3)
 def api_update_project(id):
     """
     Update a project
@@ -406,16 +1015,27 @@ def api_update_project(id):
         description: Project updated
     """
     data = request.get_json()
-    project = db.session.get(Projects, id)
+    project = _live_project(id)
     if not project:
         return jsonify({"error": "Project not found"}), 404
     project.project_name = data.get("name", project.project_name)
-    project.active = data.get("active", project.active)
-    db.session.commit()
+    if data.get("active"):
+        _activate_project(project.project_id)
+    elif "active" in data:
+        project.active = data["active"]
+    commit_changes(
+        Change(
+            "project",
+            "updated",
+            [id],
+            fields={"name": project.project_name, "active": bool(project.active)},
+        )
+    )
     return jsonify({"message": "Project updated"}), 200
 
 
 @routes.route("/api/tasks/<int:id>", methods=["PUT"])
+@query_budget(2)
 def api_update_task(id):
     """
     Update a task
@@ -441,16 +1061,25 @@ def api_update_task(id):
         description: Task updated
     """
     data = request.get_json()
-    task = db.session.get(Tasks, id)
+    task = _live_task(id)
     if not task:
         return jsonify({"error": "Task not found"}), 404
     task.task = data.get("task", task.task)
     task.status = data.get("status", task.status)
-    db.session.commit()
+    commit_changes(
+        Change(
+            "task",
+            "updated",
+            [id],
+            task.project_id,
+            {"task": task.task, "status": task.status},
+        )
+    )
     return jsonify({"message": "Task updated"}), 200
 
 
 @routes.route("/api/projects/<int:id>", methods=["DELETE"])
+@query_budget(1)
 def api_delete_project(id):
     """
     Delete a project
@@ -467,15 +1096,18 @@ def api_delete_project(id):
       404:
         description: Project not found
     """
-    project = db.session.get(Projects, id)
-    if not project:
+    # its tasks are purged in chunks, see purge.Purger
+    result = _tombstone(
+        api.delete_projects(Projects.project_id == id, api.live_projects)
+    )
+    if not result.rowcount:
         return jsonify({"error": "Project not found"}), 404
-    db.session.delete(project)
-    db.session.commit()
+    commit_changes(Change("project", "deleted", [id]))
     return jsonify({"message": "Project deleted"}), 200
 
 
 @routes.route("/api/tasks/<int:id>", methods=["DELETE"])
+@query_budget(2)
 def api_delete_task(id):
     """
     Delete a task
@@ -492,15 +1124,16 @@ def api_delete_task(id):
       404:
         description: Task not found
     """
-    task = db.session.get(Tasks, id)
+    task = _live_task(id)
     if not task:
         return jsonify({"error": "Task not found"}), 404
     db.session.delete(task)
-    db.session.commit()
+    commit_changes(Change("task", "deleted", [id], task.project_id))
     return jsonify({"message": "Task deleted"}), 200
 
 
 @routes.route("/api/delete_all", methods=["DELETE"])
+@query_budget(1)
 def api_delete_all():
     """
     Delete all tasks and projects
@@ -513,9 +1146,9 @@ def api_delete_all():
         description: Deletion failed
     """
     try:
-        Tasks.query.delete()
-        Projects.query.delete()
-        db.session.commit()
+        # marks every project deleted, the purger removes the rows
+        _tombstone(api.delete_projects(api.live_projects))
+        commit_changes(Change("task", "deleted"), Change("project", "deleted"))
         return jsonify({"message": "All projects and tasks deleted"}), 200
     except Exception as e:
         db.session.rollback()
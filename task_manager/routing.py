@@ -0,0 +1,104 @@
+"""Routing of read-only requests to a separate database
+
+Set ``SQLALCHEMY_READ_URI`` to a read-only database, for example the same
+SQLite file opened as ``sqlite:///file:ctm.db?mode=ro&uri=true`` or a
+replica of it, and ``SQLALCHEMY_READ_ENGINE_OPTIONS`` to size its pool apart
+from the primary's. The SELECT statements of GET and HEAD requests then run
+on it, while every write, and every statement of a view marked with
+``writes``, stays on the primary. Without a read URI everything runs on the
+primary, as before.
+
+A replica may lag behind the primary. With ``READ_YOUR_WRITES`` a client
+that changed data gets a cookie keeping its GET requests on the primary for
+``READ_YOUR_WRITES_SECONDS``.
+"""
+
+from flask import g, has_request_context, request
+from flask_sqlalchemy.session import Session
+
+# bind key of the read-only engine in SQLALCHEMY_BINDS
+READ_BIND = "read_only"
+READ_COOKIE = "read_primary"
+
+
+class RoutingSession(Session):
+    """Session sending the SELECTs of read-only requests to the read bind"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and not self._flushing
+            and getattr(clause, "is_select", False)
+            and has_request_context()
+            and g.get("read_only")
+        ):
+            return self._db.engines[READ_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def writes(view):
+    """Keeps every statement of a GET view on the primary
+
+    For the views that change data on GET, so what they read is what they
+    write over.
+    """
+    view.writes = True
+    return view
+
+
+def configure(app):
+    """Adds the read bind to SQLALCHEMY_BINDS, before the engines are made"""
+    app.config.setdefault("SQLALCHEMY_READ_URI", None)
+    app.config.setdefault("SQLALCHEMY_READ_ENGINE_OPTIONS", {})
+    app.config.setdefault("READ_YOUR_WRITES", False)
+    app.config.setdefault("READ_YOUR_WRITES_SECONDS", 5)
+    uri = app.config["SQLALCHEMY_READ_URI"]
+    if uri:
+        binds = dict(app.config.get("SQLALCHEMY_BINDS") or {})
+        binds[READ_BIND] = {"url": uri, **app.config["SQLALCHEMY_READ_ENGINE_OPTIONS"]}
+        app.config["SQLALCHEMY_BINDS"] = binds
+
+
+def init_app(app):
+    # imported here, the session class is needed before db is created
+    from task_manager import db
+    from task_manager.changes import data_changed
+
+    if not app.config["SQLALCHEMY_READ_URI"]:
+        return
+    # the read bind serves the tables of the primary, it has no metadata of
+    # its own for create_all and drop_all to go through
+    db.metadatas.pop(READ_BIND, None)
+    data_changed.connect(_note_write)
+
+    @app.before_request
+    def _route_reads():
+        if request.method not in ("GET", "HEAD"):
+            return
+        if getattr(app.view_functions.get(request.endpoint), "writes", False):
+            return
+        if app.config["READ_YOUR_WRITES"] and READ_COOKIE in request.cookies:
+            return
+        g.read_only = True
+
+    @app.after_request
+    def _pin_to_primary(response):
+        if app.config["READ_YOUR_WRITES"] and g.get("wrote"):
+            response.set_cookie(
+                READ_COOKIE,
+                "1",
+                max_age=app.config["READ_YOUR_WRITES_SECONDS"],
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+    @app.teardown_request
+    def _reset(_):
+        g.pop("read_only", None)
+        g.pop("wrote", None)
+
+
+def _note_write(app, change):
+    if has_request_context():
+        g.wrote = True
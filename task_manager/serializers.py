@@ -0,0 +1,82 @@
+"""Serialization of the API's projects and tasks
+
+Read endpoints select only the columns of a record as plain rows, skipping
+the ORM's identity map and change tracking, map each row into a slotted
+record and encode the result with orjson. Both the Flask routes and the
+asyncio variant build their JSON from these records.
+"""
+
+import orjson
+
+from task_manager import api
+from task_manager.models import Projects, Tasks
+
+
+class ProjectRecord:
+    """A project as the API returns it"""
+
+    __slots__ = ("id", "name", "active")
+    columns = (Projects.project_id, Projects.project_name, Projects.active)
+
+    def __init__(self, id, name, active):
+        self.id = id
+        self.name = name
+        self.active = active
+
+    def to_dict(self):
+        return {"id": self.id, "name": self.name, "active": self.active}
+
+
+class ProjectCountsRecord(ProjectRecord):
+    """A project with its open, closed and total task counts"""
+
+    __slots__ = ("open_tasks", "closed_tasks")
+    columns = ProjectRecord.columns + (Projects.open_tasks, Projects.closed_tasks)
+
+    def __init__(self, id, name, active, open_tasks, closed_tasks):
+        super().__init__(id, name, active)
+        self.open_tasks = open_tasks
+        self.closed_tasks = closed_tasks
+
+    def to_dict(self):
+        item = super().to_dict()
+        item.update(api.task_counts(self.open_tasks, self.closed_tasks))
+        return item
+
+
+class TaskRecord:
+    """A task as the API returns it"""
+
+    __slots__ = ("id", "project_id", "task", "status")
+    columns = (Tasks.task_id, Tasks.project_id, Tasks.task, Tasks.status)
+
+    def __init__(self, id, project_id, task, status):
+        self.id = id
+        self.project_id = project_id
+        self.task = task
+        self.status = status
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "project_id": self.project_id,
+            "task": self.task,
+            "status": self.status,
+        }
+
+
+def records(record, rows):
+    """Maps rows selected with ``record.columns`` into records"""
+    return [record(*row) for row in rows]
+
+
+def _default(value):
+    try:
+        return value.to_dict()
+    except AttributeError:
+        raise TypeError(f"{type(value).__name__} is not JSON serializable") from None
+
+
+def dumps(value):
+    """Encodes JSON data, records included, as bytes"""
+    return orjson.dumps(value, default=_default)
@@ -0,0 +1,316 @@
+"""Pre-forking HTTP server with a single writer process
+
+    python -m task_manager.server app:app --workers 4 --bind 0.0.0.0:8000
+
+The app is created once, then the workers are forked from it. They share the
+listening socket and serve the reads themselves, so reads use every core.
+SQLite allows one writer at a time, so the requests that may write, any
+method but GET, HEAD and OPTIONS or a view marked with ``routing.writes``,
+are put on a queue instead. One writer process runs them one after another
+and sends each response back, and writes never wait on each other's locks.
+
+Before each response the writer sends the changes it committed to every
+worker, which bumps its data version and sends ``data_changed`` again, so
+ETags, the response cache and the change feed stay right in every process.
+Use the production profile, whose WAL journal lets the workers read while
+the writer writes.
+"""
+
+import argparse
+import asyncio
+import importlib
+import io
+import itertools
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from hypercorn.asyncio import serve as hypercorn_serve
+from hypercorn.config import Config as HypercornConfig
+from werkzeug.exceptions import HTTPException
+from werkzeug.test import run_wsgi_app
+
+from task_manager import db
+from task_manager.changes import data_changed, data_version
+
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+# seconds between a child exiting and the restart, against crash loops
+RESTART_DELAY = 1
+UNAVAILABLE = (
+    "503 SERVICE UNAVAILABLE",
+    [("Content-Type", "application/json")],
+    b'{"error": "The writer did not answer in time"}',
+)
+
+
+def is_write(app, environ):
+    """Tells whether a request may write, and so goes through the writer"""
+    if environ["REQUEST_METHOD"] not in READ_METHODS:
+        return True
+    try:
+        endpoint, _ = app.url_map.bind_to_environ(environ).match()
+    except HTTPException:
+        return False
+    return getattr(app.view_functions.get(endpoint), "writes", False)
+
+
+def _pack_request(environ):
+    """The picklable part of a request: its CGI variables and its body"""
+    variables = {k: v for k, v in environ.items() if isinstance(v, str)}
+    stream = environ["wsgi.input"]
+    if environ.get("wsgi.input_terminated"):
+        body = stream.read()
+    else:
+        length = int(environ.get("CONTENT_LENGTH") or 0)
+        body = stream.read(length) if length else b""
+    return variables, body
+
+
+def _run_request(app, variables, body):
+    """Runs a packed request through the app, returns the whole response"""
+    environ = dict(variables)
+    environ.update(
+        {
+            "wsgi.version": (1, 0),
+            "wsgi.input": io.BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": False,
+            "wsgi.multiprocess": True,
+            "wsgi.run_once": False,
+        }
+    )
+    app_iter, status, headers = run_wsgi_app(app, environ, buffered=True)
+    return status, headers.to_wsgi_list(), b"".join(app_iter)
+
+
+def serve_writes(app, jobs, outboxes):
+    """Runs the forwarded requests one at a time, until it gets None
+
+    A job is ``(worker, job_id, variables, body)``. The changes committed by
+    a request go to every worker's outbox, then the response to its own.
+    """
+    committed = []
+
+    def _collect(sender, change):
+        committed.append(change)
+
+    data_changed.connect(_collect, sender=app)
+    try:
+        while (job := jobs.get()) is not None:
+            worker, job_id, variables, body = job
+            try:
+                response = _run_request(app, variables, body)
+            except Exception:
+                app.logger.exception("Forwarded request failed")
+                response = (
+                    "500 INTERNAL SERVER ERROR",
+                    [("Content-Type", "application/json")],
+                    b'{"error": "Internal server error"}',
+                )
+            for change in committed:
+                for outbox in outboxes:
+                    outbox.put(("change", change))
+            committed.clear()
+            outboxes[worker].put(("response", job_id, response))
+    finally:
+        data_changed.disconnect(_collect, sender=app)
+
+
+class WriteForwarder:
+    """WSGI middleware of a worker, sending the requests that write away
+
+    A thread reads the worker's inbox: the changes committed by the writer,
+    replayed on this process's app, and the responses to its requests.
+    """
+
+    def __init__(self, app, worker, jobs, inbox, timeout=30):
+        self.app = app
+        self.worker = worker
+        self.jobs = jobs
+        self.inbox = inbox
+        self.timeout = timeout
+        self._pending = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(
+            target=self._receive, name="writer-inbox", daemon=True
+        )
+        self._thread.start()
+
+    def __call__(self, environ, start_response):
+        if not is_write(self.app, environ):
+            return self.app(environ, start_response)
+
+        future = Future()
+        with self._lock:
+            job_id = next(self._ids)
+            self._pending[job_id] = future
+        self.jobs.put((self.worker, job_id, *_pack_request(environ)))
+        try:
+            status, headers, body = future.result(self.timeout)
+        except FutureTimeout:
+            with self._lock:
+                self._pending.pop(job_id, None)
+            status, headers, body = UNAVAILABLE
+        start_response(status, headers)
+        return [body]
+
+    def close(self):
+        """Stops reading the inbox"""
+        self.inbox.put(None)
+        self._thread.join()
+
+    def _receive(self):
+        while (message := self.inbox.get()) is not None:
+            if message[0] == "change":
+                with self.app.app_context():
+                    data_version().bump()
+                    data_changed.send(self.app, change=message[1])
+                continue
+            _, job_id, response = message
+            with self._lock:
+                future = self._pending.pop(job_id, None)
+            # None when the request already timed out
+            if future is not None:
+                future.set_result(response)
+
+
+def _child_signals():
+    # the parent stops the children, with SIGTERM
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+
+def _writer_main(app, jobs, outboxes):
+    _child_signals()
+    serve_writes(app, jobs, outboxes)
+
+
+def _worker_main(app, fd, worker, jobs, inbox, timeout, access_log):
+    _child_signals()
+    # tombstoned rows are purged by the writer, which deleted them
+    app.config["PURGE_IN_BACKGROUND"] = False
+    forwarder = WriteForwarder(app, worker, jobs, inbox, timeout)
+    # Hypercorn runs the WSGI app in threads and keeps connections alive
+    config = HypercornConfig()
+    config.bind = [f"fd://{fd}"]
+    config.accesslog = "-" if access_log else None
+    asyncio.run(hypercorn_serve(forwarder, config, mode="wsgi"))
+
+
+def _start_children(app, fd, workers, timeout, access_log):
+    """Forks the writer and the workers, joined by fresh queues"""
+    context = multiprocessing.get_context("fork")
+    jobs = context.Queue()
+    outboxes = [context.Queue() for _ in range(workers)]
+    targets = [("writer", _writer_main, (app, jobs, outboxes))]
+    for n, inbox in enumerate(outboxes):
+        args = (app, fd, n, jobs, inbox, timeout, access_log)
+        targets.append((f"worker-{n}", _worker_main, args))
+
+    children = []
+    for name, target, args in targets:
+        process = context.Process(target=target, args=args, name=name, daemon=True)
+        process.start()
+        children.append(process)
+    return children
+
+
+def _stop_children(children):
+    for process in children:
+        process.terminate()
+    for process in children:
+        process.join()
+
+
+def serve(app, host="127.0.0.1", port=8000, workers=None, timeout=30, access_log=False):
+    """Forks the writer and ``workers`` workers, until SIGINT or SIGTERM
+
+    When a child exits the others are restarted with it: it may have died
+    holding the lock of a queue it shares with them.
+    """
+    workers = workers or os.cpu_count() or 1
+    listener = socket.create_server((host, port), backlog=2048)
+    address = listener.getsockname()
+    # the children open their own connections
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+    def stop(signum, frame):
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    print(
+        f"Serving on http://{address[0]}:{address[1]} "
+        f"with {workers} workers and one writer",
+        file=sys.stderr,
+    )
+    children = []
+    try:
+        while True:
+            children = _start_children(
+                app, listener.fileno(), workers, timeout, access_log
+            )
+            sentinels = {process.sentinel: process for process in children}
+            ready = multiprocessing.connection.wait(list(sentinels))
+            exited = sentinels[ready[0]]
+            exited.join()
+            app.logger.error(
+                "%s exited with code %s, restarting the workers",
+                exited.name,
+                exited.exitcode,
+            )
+            _stop_children(children)
+            time.sleep(RESTART_DELAY)
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        _stop_children(children)
+        listener.close()
+
+
+def load_app(target):
+    """Imports ``module:name``, or calls ``module:factory()``"""
+    module_name, _, name = target.partition(":")
+    module = importlib.import_module(module_name)
+    if name.endswith("()"):
+        return getattr(module, name[:-2])()
+    return getattr(module, name or "app")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("app", nargs="?", default="app:app")
+    parser.add_argument("--bind", default="127.0.0.1:8000", help="host:port")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument(
+        "--write-timeout",
+        type=float,
+        default=30,
+        help="Seconds a worker waits for the writer before answering 503.",
+    )
+    parser.add_argument("--access-log", action="store_true")
+    args = parser.parse_args()
+
+    host, _, port = args.bind.rpartition(":")
+    sys.path.insert(0, os.getcwd())
+    serve(
+        load_app(args.app),
+        host,
+        int(port),
+        args.workers,
+        args.write_timeout,
+        args.access_log,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,75 +1,121 @@
+// Every edit is sent with fetch and only the affected row or tab is patched,
+// the server answers these requests with a fragment instead of a redirect.
+function send(url, options = {}) {
+  options.method = options.method || 'POST';
+  options.headers = Object.assign({ 'X-Requested-With': 'fetch' }, options.headers);
+  return fetch(url, options);
+}
+
+function sendJSON(url, data) {
+  return send(url, {
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(data)
+  });
+}
+
+function rowFromHTML(html) {
+  const tbody = document.createElement('tbody');
+  tbody.innerHTML = html.trim();
+  return tbody.firstElementChild;
+}
+
+function editInPlace(span, onSave) {
+  const currentText = span.textContent.trim();
+  const input = document.createElement('input');
+  input.type = 'text';
+  input.value = currentText;
+  input.className = 'edit-input';
+  span.replaceWith(input);
+  input.focus();
+
+  input.addEventListener('keydown', function (event) {
+    if (event.key === 'Enter') {
+      const newText = input.value.trim();
+      if (newText && newText !== currentText) {
+        onSave(newText).then(saved => {
+          if (saved) span.textContent = newText;
+          input.replaceWith(span);
+        });
+      } else {
+        input.replaceWith(span); // Cancel if unchanged
+      }
+    }
+  });
+
+  input.addEventListener('blur', () => input.replaceWith(span)); // Cancel on blur
+}
+
 document.addEventListener('DOMContentLoaded', function () {
+  const rows = document.getElementById('taskRows');
+  const form = document.getElementById('addTask');
+
   document.querySelectorAll('.edit-inline').forEach(icon => {
     icon.addEventListener('click', function (e) {
       e.preventDefault();
       e.stopPropagation();
 
       const tabLink = this.closest('.tab-link');
-      const nameSpan = tabLink.querySelector('.project-name');
-      const currentName = nameSpan.textContent.trim();
       const projectId = tabLink.dataset.projectId;
 
-      // Create input field
-      const input = document.createElement('input');
-      input.type = 'text';
-      input.value = currentName;
-      input.className = 'edit-input';
-      nameSpan.replaceWith(input);
-      input.focus();
-
-      input.addEventListener('keydown', function (event) {
-        if (event.key === 'Enter') {
-          const newName = input.value.trim();
-          if (newName && newName !== currentName) {
-            fetch(`/rename_project/${projectId}`, {
-              method: 'POST',
-              headers: { 'Content-Type': 'application/json' },
-              body: JSON.stringify({ new_name: newName })
-            })
-              .then(response => response.ok ? location.reload() : alert('Rename failed'));
-          } else {
-            input.replaceWith(nameSpan); // Cancel if unchanged
-          }
-        }
-      });
-
-      input.addEventListener('blur', () => input.replaceWith(nameSpan)); // Cancel on blur
+      editInPlace(tabLink.querySelector('.project-name'), newName =>
+        sendJSON(`/rename_project/${projectId}`, { new_name: newName })
+          .then(response => response.ok ? response.json() : Promise.reject())
+          .then(project => {
+            tabLink.href = `/project/${project.url_slug}`;
+            form.elements.project.value = project.name;
+            return true;
+          })
+          .catch(() => alert('Rename failed'))
+      );
     });
   });
-  document.querySelectorAll('.edit-desc').forEach(icon => {
-    icon.addEventListener('click', function (e) {
+
+  if (rows) {
+    rows.addEventListener('click', function (e) {
+      const target = e.target.closest('.edit-desc, .toggle-task, .delete-task');
+      if (!target) return;
       e.preventDefault();
-      e.stopPropagation();
 
-      const td = this.closest('td');
-      const span = td.querySelector('.desc-text');
-      const currentText = span.textContent.trim();
-      const taskId = span.dataset.taskId;
+      const row = target.closest('tr');
+      const taskId = row.dataset.taskId;
 
-      const input = document.createElement('input');
-      input.type = 'text';
-      input.value = currentText;
-      input.className = 'edit-input';
-      span.replaceWith(input);
-      input.focus();
+      if (target.classList.contains('edit-desc')) {
+        editInPlace(row.querySelector('.desc-text'), newText =>
+          sendJSON(`/rename_task_desc/${taskId}`, { new_desc: newText })
+            .then(res => res.ok || alert('Update failed'))
+        );
+      } else if (target.classList.contains('toggle-task')) {
+        send(`/close/${taskId}`)
+          .then(res => res.ok ? res.text() : Promise.reject())
+          .then(html => row.replaceWith(rowFromHTML(html)))
+          .catch(() => alert('Update failed'));
+      } else {
+        send(`/delete/${taskId}`)
+          .then(res => res.ok ? row.remove() : alert('Delete failed'));
+      }
+    });
 
-      input.addEventListener('keydown', function (event) {
-        if (event.key === 'Enter') {
-          const newText = input.value.trim();
-          if (newText && newText !== currentText) {
-            fetch(`/rename_task_desc/${taskId}`, {
-              method: 'POST',
-              headers: { 'Content-Type': 'application/json' },
-              body: JSON.stringify({ new_desc: newText })
-            })
-              .then(res => res.ok ? location.reload() : alert('Update failed'));
-          } else {
-            input.replaceWith(span);
-          }
-        }
+    document.querySelectorAll('.remove-tasks').forEach(link => {
+      link.addEventListener('click', function (e) {
+        e.preventDefault();
+        send(this.getAttribute('href'))
+          .then(res => res.ok ? rows.replaceChildren() : alert('Delete failed'));
       });
-
-      input.addEventListener('blur', () => input.replaceWith(span));
     });
+  }
+
+  form.addEventListener('submit', function (e) {
+    e.preventDefault();
+    // a task for another tab switches tabs, so the whole page is needed then
+    send('/add', { body: new FormData(form), redirect: 'manual' })
+      .then(res => {
+        if (res.status === 201 && rows) {
+          return res.text().then(html => {
+            rows.appendChild(rowFromHTML(html));
+            form.elements.task.value = '';
+          });
+        }
+        location.assign('/');
+      });
   });
-});
\ No newline at end of file
+});
@@ -0,0 +1,246 @@
+import asyncio
+import json
+import os
+import tempfile
+
+import pytest
+
+pytest.importorskip("quart")
+pytest.importorskip("aiosqlite")
+
+from task_manager.aio import async_database_url, create_asgi_app  # noqa: E402
+
+
+@pytest.fixture
+def asgi_app():
+    db_fd, db_path = tempfile.mkstemp(suffix=".sqlite3")
+    yield create_asgi_app(
+        {"TESTING": True, "SQLALCHEMY_DATABASE_URI": f"sqlite:///{db_path}"}
+    )
+    os.close(db_fd)
+    os.unlink(db_path)
+
+
+def serve(app, scenario):
+    """Runs ``scenario(client)`` between the app's startup and shutdown"""
+
+    async def _run():
+        async with app.test_app() as test_app:
+            return await scenario(test_app.test_client())
+
+    return asyncio.run(_run())
+
+
+def test_async_database_url(asgi_app):
+    url = async_database_url(asgi_app)
+    assert url.drivername == "sqlite+aiosqlite"
+
+    asgi_app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///ctm.db"
+    url = async_database_url(asgi_app)
+    assert url.database == os.path.join(asgi_app.instance_path, "ctm.db")
+
+
+def test_project_and_task_crud(asgi_app):
+    async def scenario(client):
+        response = await client.post("/api/projects", json={"name": "Alpha"})
+        assert response.status_code == 201
+        project_id = (await response.get_json())["id"]
+
+        response = await client.post(
+            "/api/tasks", json={"project_id": project_id, "task": "Write"}
+        )
+        assert response.status_code == 201
+        task_id = (await response.get_json())["id"]
+
+        response = await client.put(f"/api/tasks/{task_id}", json={"status": False})
+        assert response.status_code == 200
+
+        response = await client.get(f"/api/projects/{project_id}/stats")
+        assert await response.get_json() == {
+            "id": project_id,
+            "open_tasks": 0,
+            "closed_tasks": 1,
+            "total_tasks": 1,
+        }
+        response = await client.get("/api/projects?counts=1")
+        assert (await response.get_json())[0]["closed_tasks"] == 1
+
+        response = await client.get(f"/api/tasks/{task_id}")
+        assert await response.get_json() == {
+            "id": task_id,
+            "project_id": project_id,
+            "task": "Write",
+            "status": False,
+        }
+
+        response = await client.delete(f"/api/tasks/{task_id}")
+        assert response.status_code == 200
+        response = await client.get(f"/api/tasks/{task_id}")
+        assert response.status_code == 404
+
+        # enforced foreign keys would make this a 500
+        response = await client.post(
+            "/api/tasks", json={"project_id": 9999, "task": "Lost"}
+        )
+        assert response.status_code == 404
+
+        await client.delete(f"/api/projects/{project_id}")
+        response = await client.post(
+            "/api/tasks", json={"project_id": project_id, "task": "Late"}
+        )
+        assert response.status_code == 404
+
+    serve(asgi_app, scenario)
+
+
+def test_single_active_project(asgi_app):
+    async def scenario(client):
+        ids = []
+        for name in ("Alpha", "Beta"):
+            response = await client.post(
+                "/api/projects", json={"name": name, "active": True}
+            )
+            ids.append((await response.get_json())["id"])
+
+        response = await client.get("/api/projects")
+        projects = await response.get_json()
+        assert [p["active"] for p in projects] == [False, True]
+
+        await client.put(f"/api/projects/{ids[0]}", json={"active": True})
+        response = await client.get("/api/projects")
+        projects = await response.get_json()
+        assert [p["active"] for p in projects] == [True, False]
+
+        response = await client.put("/api/projects/9999", json={"name": "Nope"})
+        assert response.status_code == 404
+
+    serve(asgi_app, scenario)
+
+
+def test_pagination_and_filters(asgi_app):
+    async def scenario(client):
+        response = await client.post("/api/projects", json={"name": "Alpha"})
+        project_id = (await response.get_json())["id"]
+        tasks = [
+            {"project_id": project_id, "task": f"Task {i}", "status": i % 2 == 0}
+            for i in range(5)
+        ]
+        response = await client.post("/api/tasks/bulk", json={"tasks": tasks})
+        ids = (await response.get_json())["ids"]
+
+        response = await client.get("/api/tasks?limit=2")
+        assert [t["id"] for t in await response.get_json()] == ids[:2]
+        assert f"after={ids[1]}" in response.headers["Link"]
+
+        response = await client.get(f"/api/tasks?limit=2&after={ids[3]}")
+        assert [t["id"] for t in await response.get_json()] == ids[4:]
+        assert "Link" not in response.headers
+
+        response = await client.get("/api/tasks?status=closed")
+        assert [t["id"] for t in await response.get_json()] == [ids[1], ids[3]]
+
+        response = await client.get("/api/tasks?limit=0")
+        assert response.status_code == 400
+
+    serve(asgi_app, scenario)
+
+
+def test_bulk_update(asgi_app):
+    async def scenario(client):
+        response = await client.post("/api/projects", json={"name": "Alpha"})
+        project_id = (await response.get_json())["id"]
+        tasks = [{"project_id": project_id, "task": f"T{i}"} for i in range(3)]
+        await client.post("/api/tasks/bulk", json={"tasks": tasks})
+
+        response = await client.put(
+            "/api/tasks/bulk",
+            json={"filter": {"project_id": project_id}, "status": False},
+        )
+        assert (await response.get_json())["updated"] == 3
+        response = await client.get("/api/tasks?status=closed")
+        assert len(await response.get_json()) == 3
+
+        response = await client.put("/api/tasks/bulk", json={"ids": [1]})
+        assert response.status_code == 400
+
+    serve(asgi_app, scenario)
+
+
+def test_bulk_partial(asgi_app):
+    async def scenario(client):
+        response = await client.post("/api/projects", json={"name": "Alpha"})
+        project_id = (await response.get_json())["id"]
+        tasks = [
+            {"project_id": project_id, "task": "Valid"},
+            {"project_id": 9999, "task": "Orphan"},
+        ]
+
+        response = await client.post("/api/tasks/bulk", json={"tasks": tasks})
+        assert response.status_code == 400
+
+        response = await client.post(
+            "/api/tasks/bulk", json={"tasks": tasks, "atomic": False}
+        )
+        assert response.status_code == 201
+        data = await response.get_json()
+        assert data["ids"][1] is None
+        assert data["errors"] == [{"index": 1, "error": "Project not found"}]
+
+        response = await client.post(
+            "/api/tasks/bulk", json={"tasks": tasks, "atomic": "false"}
+        )
+        assert response.status_code == 400
+
+    serve(asgi_app, scenario)
+
+
+def test_search(asgi_app):
+    async def scenario(client):
+        response = await client.post("/api/projects", json={"name": "Alpha"})
+        project_id = (await response.get_json())["id"]
+        tasks = [
+            {"project_id": project_id, "task": "Write docs"},
+            {"project_id": project_id, "task": "Read mail"},
+        ]
+        await client.post("/api/tasks/bulk", json={"tasks": tasks})
+
+        response = await client.get("/api/tasks/search?q=wri*")
+        assert [t["task"] for t in await response.get_json()] == ["Write docs"]
+
+        response = await client.get("/api/tasks/search")
+        assert response.status_code == 400
+
+    serve(asgi_app, scenario)
+
+
+def test_export_ndjson(asgi_app, monkeypatch):
+    monkeypatch.setattr("task_manager.api.EXPORT_BATCH_SIZE", 2)
+
+    async def scenario(client):
+        response = await client.post("/api/projects", json={"name": "Alpha"})
+        project_id = (await response.get_json())["id"]
+        tasks = [{"project_id": project_id, "task": f"Task {i}"} for i in range(5)]
+        await client.post("/api/tasks/bulk", json={"tasks": tasks})
+
+        response = await client.get("/api/tasks/export")
+        assert response.mimetype == "application/x-ndjson"
+        lines = (await response.get_data(as_text=True)).splitlines()
+        assert [json.loads(line)["task"] for line in lines] == [
+            f"Task {i}" for i in range(5)
+        ]
+
+        response = await client.get("/api/tasks/export?format=xml")
+        assert response.status_code == 400
+
+    serve(asgi_app, scenario)
+
+
+def test_delete_all(asgi_app):
+    async def scenario(client):
+        await client.post("/api/projects", json={"name": "Alpha"})
+        response = await client.delete("/api/delete_all")
+        assert response.status_code == 200
+        response = await client.get("/api/projects")
+        assert await response.get_json() == []
+
+    serve(asgi_app, scenario)
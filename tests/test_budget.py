@@ -0,0 +1,67 @@
+import logging
+
+import pytest
+
+from task_manager import db
+from task_manager.budget import QueryBudgetExceeded, query_budget
+from task_manager.models import Projects, Tasks
+from task_manager.routes import routes
+
+
+@pytest.fixture
+def n_plus_one(app):
+    """Registers a view loading each project's tasks with its own query"""
+
+    @query_budget(2)
+    def tasks_per_project():
+        projects = Projects.query.all()
+        counts = [
+            Tasks.query.filter_by(project_id=p.project_id).count() for p in projects
+        ]
+        return {"counts": counts}
+
+    app.add_url_rule("/n_plus_one", view_func=tasks_per_project)
+    for name in ("One", "Two", "Three"):
+        db.session.add(Projects(name, False))
+    db.session.commit()
+    db.session.expunge_all()
+    return "/n_plus_one"
+
+
+def test_overrun_raises_with_statements(client, n_plus_one):
+    with pytest.raises(QueryBudgetExceeded) as error:
+        client.get(n_plus_one)
+
+    message = str(error.value)
+    assert message.startswith("tasks_per_project ran 4 SQL statements, budget is 2")
+    assert "  1. SELECT projects.project_id" in message
+    assert message.count("FROM tasks") == 3
+
+
+def test_overrun_logs_warning(app, client, n_plus_one, caplog):
+    app.config["QUERY_BUDGET"] = "warn"
+    with caplog.at_level(logging.WARNING):
+        response = client.get(n_plus_one)
+
+    assert response.status_code == 200
+    assert "tasks_per_project ran 4 SQL statements" in caplog.text
+
+
+def test_budget_check_disabled(app, client, n_plus_one, caplog):
+    app.config["QUERY_BUDGET"] = None
+    response = client.get(n_plus_one)
+
+    assert response.status_code == 200
+    assert caplog.text == ""
+
+
+def test_routes_declare_budgets(app):
+    unchecked = {
+        "api_events",
+        "api_export_tasks",
+        "api_cache_stats",
+        "metrics_endpoint",
+    }
+    for name, view in app.view_functions.items():
+        if name.startswith(routes.name + ".") and name.split(".")[1] not in unchecked:
+            assert hasattr(view, "query_budget"), name
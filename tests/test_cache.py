@@ -0,0 +1,124 @@
+import json
+
+import pytest
+
+from task_manager import db
+from task_manager.cache import response_cache
+from task_manager.models import Tasks
+
+
+@pytest.fixture
+def enable_cache(app):
+    app.config["RESPONSE_CACHE_SIZE"] = 16
+    yield response_cache()
+    app.config["RESPONSE_CACHE_SIZE"] = 0
+
+
+def test_cache_disabled_by_default(client, create_project):
+    create_project("Plain", True)
+    client.get("/api/projects")
+    client.get("/api/projects")
+
+    stats = json.loads(client.get("/api/cache").data)
+    assert stats["enabled"] is False
+    assert stats["size"] == 0
+    assert stats["hits"] == 0
+
+
+def test_cached_read_skips_database(
+    client, create_project, enable_cache, capture_queries
+):
+    create_project("Cached", True)
+    first = client.get("/api/projects?limit=5")
+
+    with capture_queries() as statements:
+        second = client.get("/api/projects?limit=5")
+
+    assert statements == []
+    assert second.data == first.data
+    assert second.headers["ETag"] == first.headers["ETag"]
+    stats = json.loads(client.get("/api/cache").data)
+    assert stats["enabled"] is True
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_index_invalidated_only_by_its_project(
+    client, create_project, enable_cache, capture_queries
+):
+    active = create_project("Active", True)
+    other = create_project("Other", False)
+    client.get("/")
+
+    client.post("/api/tasks", json={"project_id": other.project_id, "task": "Far"})
+    with capture_queries() as statements:
+        client.get("/")
+    assert statements == []
+
+    client.post("/api/tasks", json={"project_id": active.project_id, "task": "Near"})
+    response = client.get("/")
+    assert b"Near" in response.data
+
+
+def test_project_rename_invalidates_detail(client, create_project, enable_cache):
+    project = create_project("Before", True)
+    url = f"/api/projects/{project.project_id}"
+    client.get(url)
+
+    client.post(f"/rename_project/{project.project_id}", json={"new_name": "After"})
+
+    assert json.loads(client.get(url).data)["name"] == "After"
+
+
+def test_tab_switch_invalidates_previous_active_project(
+    client, create_project, enable_cache
+):
+    current = create_project("Current", True)
+    other = create_project("Other", False)
+    url = f"/api/projects/{current.project_id}"
+    assert json.loads(client.get(url).data)["active"] is True
+
+    client.get(f"/project/{other.url_slug}")
+
+    assert json.loads(client.get(url).data)["active"] is False
+
+
+def test_task_delete_invalidates_index(client, create_task, enable_cache):
+    task = create_task("Going away", True)
+    assert b"Going away" in client.get("/").data
+
+    client.delete(f"/api/tasks/{task.task_id}")
+
+    assert b"Going away" not in client.get("/").data
+
+
+def test_lru_eviction(app, client, create_project, enable_cache):
+    app.config["RESPONSE_CACHE_SIZE"] = 2
+    projects = [create_project(f"P{i}", False) for i in range(3)]
+    for project in projects:
+        client.get(f"/api/projects/{project.project_id}")
+
+    assert len(enable_cache) == 2
+    assert enable_cache.evictions == 1
+
+
+def test_missing_task_keeps_cache(client, create_project, enable_cache):
+    project = create_project("Stable", True)
+    db.session.add(Tasks(project.project_id, "Seen", True))
+    db.session.commit()
+    client.get("/")
+
+    client.get("/close/9999")
+
+    assert enable_cache.invalidations == 0
+    assert json.loads(client.get("/api/cache").data)["size"] == 1
+
+
+def test_task_write_invalidates_project_counts(client, create_project, enable_cache):
+    project_id = create_project("Counted", True).project_id
+    assert client.get("/api/projects?counts=true").json[0]["open_tasks"] == 0
+
+    for name in ("One", "Two"):
+        client.post("/api/tasks", json={"project_id": project_id, "task": name})
+
+    assert client.get("/api/projects?counts=true").json[0]["open_tasks"] == 2
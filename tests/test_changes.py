@@ -0,0 +1,104 @@
+import pytest
+
+from task_manager.changes import data_changed, data_version
+
+
+@pytest.fixture
+def received(app):
+    changes = []
+
+    def _on_change(sender, change):
+        changes.append(change)
+
+    data_changed.connect(_on_change, app)
+    yield changes
+    data_changed.disconnect(_on_change, app)
+
+
+def test_get_endpoints_send_etag(client, create_project):
+    create_project("Tagged", True)
+    response = client.get("/api/projects")
+    assert response.headers["ETag"] == f'"{data_version().etag}"'
+
+
+def test_if_none_match_returns_304_without_queries(
+    client, create_project, capture_queries
+):
+    project = create_project("Tagged", True)
+    url = f"/api/projects/{project.project_id}"
+    etag = client.get(url).headers["ETag"]
+
+    with capture_queries() as statements:
+        response = client.get(url, headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert statements == []
+
+
+def test_write_changes_etag(client, create_project):
+    project = create_project("Tagged", True)
+    etag = client.get("/api/tasks").headers["ETag"]
+
+    client.post("/api/tasks", json={"project_id": project.project_id, "task": "New"})
+    response = client.get("/api/tasks", headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_not_found_has_no_etag(client):
+    response = client.get("/api/tasks/9999")
+    assert response.status_code == 404
+    assert "ETag" not in response.headers
+
+
+@pytest.mark.parametrize(
+    "method, url, kwargs",
+    [
+        ("get", "/close/{task}", {}),
+        ("get", "/delete/{task}", {}),
+        ("get", "/remove/{project}", {}),
+        ("get", "/clear/{project}", {}),
+        ("get", "/project/other", {}),
+        ("post", "/rename_project/{project}", {"json": {"new_name": "Renamed"}}),
+        ("post", "/rename_task_desc/{task}", {"json": {"new_desc": "Renamed"}}),
+        ("post", "/add", {"data": {"task": "T", "project": "P", "status": "1"}}),
+        ("put", "/api/tasks/{task}", {"json": {"status": False}}),
+        (
+            "put",
+            "/api/tasks/bulk",
+            {"json": {"filter": {"status": 1}, "status": False}},
+        ),
+        ("put", "/api/projects/{project}", {"json": {"name": "Renamed"}}),
+        ("delete", "/api/tasks/{task}", {}),
+        ("delete", "/api/projects/{project}", {}),
+        ("delete", "/api/delete_all", {}),
+    ],
+)
+def test_write_routes_bump_version_and_notify(
+    client, create_project, create_task, received, method, url, kwargs
+):
+    project = create_project("Main", True)
+    create_project("Other", False)
+    task = create_task("Task", True, project)
+    url = url.format(task=task.task_id, project=project.project_id)
+    before = data_version().value
+
+    getattr(client, method)(url, **kwargs)
+
+    assert data_version().value == before + 1
+    assert received
+    assert all(c.entity in ("project", "task") for c in received)
+
+
+def test_change_describes_write(client, create_project, received):
+    project = create_project("Main", True)
+
+    client.post("/api/tasks", json={"project_id": project.project_id, "task": "New"})
+
+    (change,) = received
+    assert change.entity == "task"
+    assert change.action == "created"
+    assert change.project_id == project.project_id
+    assert change.fields == {"task": "New", "status": True}
@@ -0,0 +1,94 @@
+import json
+
+from sqlalchemy import update
+
+from task_manager import db
+from task_manager.commands import RESTART_NOTE
+from task_manager.models import Projects, Tasks
+
+
+def test_import_csv_creates_projects_and_tasks(app, create_project, tmp_path):
+    existing = create_project("Existing", True)
+    path = tmp_path / "tasks.csv"
+    path.write_text(
+        "project,task,status\n"
+        "Existing,First,open\n"
+        "New One,Second,closed\n"
+        "New One,Third,\n"
+        ",Default project,1\n"
+        "Existing,,open\n"
+    )
+
+    result = app.test_cli_runner().invoke(
+        args=["tasks", "import", str(path), "--chunk-size", "2"]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "Imported 4 tasks (1 skipped, 2 new projects)" in result.output
+    assert "rows/s" in result.output
+    new_one = Projects.query.filter_by(project_name="New One").one()
+    assert new_one.active is False
+    assert new_one.url_slug == "new_one"
+    assert Tasks.query.filter_by(project_id=existing.project_id).count() == 1
+    statuses = [t.status for t in Tasks.query.filter_by(project_id=new_one.project_id)]
+    assert statuses == [False, True]
+    assert Projects.query.filter_by(project_name="Tasks").count() == 1
+
+
+def test_import_ndjson_with_fast_pragmas_restores_them(app, tmp_path):
+    path = tmp_path / "tasks.ndjson"
+    path.write_text(
+        "\n".join(
+            json.dumps({"project": "Bulk", "task": f"Task {i}", "status": i % 2 == 0})
+            for i in range(10)
+        )
+    )
+    with db.engine.connect() as conn:
+        before = conn.exec_driver_sql("PRAGMA synchronous").scalar()
+
+    result = app.test_cli_runner().invoke(args=["tasks", "import", str(path), "--fast"])
+
+    assert result.exit_code == 0, result.output
+    assert Tasks.query.count() == 10
+    with db.engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA synchronous").scalar() == before
+
+
+def test_import_invalid_status_fails(app, tmp_path):
+    path = tmp_path / "tasks.csv"
+    path.write_text("project,task,status\nP,Broken,maybe\n")
+
+    result = app.test_cli_runner().invoke(args=["tasks", "import", str(path)])
+
+    assert result.exit_code != 0
+    assert "Invalid status" in result.output
+    assert Tasks.query.count() == 0
+
+
+def test_import_unknown_extension_needs_format(app, tmp_path):
+    path = tmp_path / "tasks.txt"
+    path.write_text('{"task": "x"}\n')
+
+    runner = app.test_cli_runner()
+    assert runner.invoke(args=["tasks", "import", str(path)]).exit_code != 0
+    result = runner.invoke(args=["tasks", "import", str(path), "--format", "ndjson"])
+    assert result.exit_code == 0, result.output
+
+
+def test_rebuild_counts_repairs_drifted_counters(app, create_project, create_task):
+    project = create_project("One", True)
+    create_task("Open", True, project)
+    create_task("Closed", False, project)
+    create_project("Empty", False)
+    db.session.execute(update(Projects).values(open_tasks=42, closed_tasks=-1))
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=["tasks", "rebuild-counts"])
+
+    assert result.exit_code == 0, result.output
+    assert "Rebuilt task counts of 2 projects" in result.output
+    assert RESTART_NOTE in result.output
+    counts = [
+        (p.open_tasks, p.closed_tasks) for p in Projects.query.order_by("project_id")
+    ]
+    assert counts == [(1, 1), (0, 0)]
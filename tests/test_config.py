@@ -0,0 +1,67 @@
+import pytest
+
+from task_manager import create_app, db
+from task_manager.config import ProductionConfig
+
+
+def _pragma(app, name):
+    with app.app_context():
+        with db.engine.connect() as conn:
+            return conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+
+def _dispose(app):
+    with app.app_context():
+        db.engine.dispose()
+
+
+def test_default_profile(tmp_path):
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path}/d.db"})
+    assert app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] is False
+    assert _pragma(app, "journal_mode") == "delete"
+    assert _pragma(app, "foreign_keys") == 1
+    _dispose(app)
+
+
+def test_production_profile_applies_pragmas(tmp_path, monkeypatch):
+    monkeypatch.setenv("TASK_MANAGER_CONFIG", "production")
+    monkeypatch.setenv(
+        "TASK_MANAGER_SQLALCHEMY_DATABASE_URI", f"sqlite:///{tmp_path}/p.db"
+    )
+
+    app = create_app()
+
+    assert app.config["SQLITE_PRAGMAS"] == ProductionConfig.SQLITE_PRAGMAS
+    assert _pragma(app, "journal_mode") == "wal"
+    assert _pragma(app, "synchronous") == 1
+    assert _pragma(app, "busy_timeout") == 5000
+    with app.app_context():
+        assert db.engine.pool.size() == 10
+    _dispose(app)
+
+
+def test_environment_overrides_profile(tmp_path, monkeypatch):
+    monkeypatch.setenv("TASK_MANAGER_RESPONSE_CACHE_SIZE", "64")
+    app = create_app({"SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path}/e.db"})
+    assert app.config["RESPONSE_CACHE_SIZE"] == 64
+    _dispose(app)
+
+
+def test_explicit_settings_override_environment(tmp_path, monkeypatch):
+    monkeypatch.setenv(
+        "TASK_MANAGER_SQLALCHEMY_DATABASE_URI", f"sqlite:///{tmp_path}/prod.db"
+    )
+    monkeypatch.setenv("TASK_MANAGER_RESPONSE_CACHE_SIZE", "64")
+    uri = f"sqlite:///{tmp_path}/test.db"
+
+    app = create_app({"SQLALCHEMY_DATABASE_URI": uri})
+
+    assert app.config["SQLALCHEMY_DATABASE_URI"] == uri
+    assert app.config["RESPONSE_CACHE_SIZE"] == 64
+    _dispose(app)
+    assert not (tmp_path / "prod.db").exists()
+
+
+def test_unknown_profile():
+    with pytest.raises(ValueError):
+        create_app("staging")
@@ -0,0 +1,118 @@
+import json
+
+from task_manager.events import Broadcaster, broadcaster, stream
+
+
+def _read_events(response, count):
+    """Reads ``count`` data events from an SSE response, skipping the rest"""
+    chunks = iter(response.response)
+    found = []
+    while len(found) < count:
+        chunk = next(chunks)
+        chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+        if chunk.startswith("id:"):
+            event_id, data = chunk.strip().split("\n")
+            found.append((event_id[4:], json.loads(data[6:])))
+    return found
+
+
+def test_publish_reaches_every_subscriber():
+    source = Broadcaster()
+    first, _ = source.subscribe()
+    second, _ = source.subscribe()
+
+    event_id = source.publish('{"n":1}')
+
+    assert first.get(0) == (event_id, '{"n":1}')
+    assert second.get(0) == (event_id, '{"n":1}')
+
+
+def test_slow_subscriber_is_dropped_without_blocking():
+    source = Broadcaster(queue_size=2)
+    slow, _ = source.subscribe()
+    fast, _ = source.subscribe()
+
+    for n in range(3):
+        source.publish(str(n))
+        fast.get(0)
+
+    assert source.dropped == 1
+    assert len(source) == 1
+    assert slow.get(0) is None
+    assert slow.dropped
+
+
+def test_resume_replays_missed_events():
+    source = Broadcaster()
+    seen = source.publish("a")
+    source.publish("b")
+    source.publish("c")
+
+    subscription, complete = source.subscribe(seen)
+
+    assert complete
+    assert [subscription.get(0)[1] for _ in range(2)] == ["b", "c"]
+    assert subscription.get(0) is None
+
+
+def test_resume_past_history_is_incomplete():
+    source = Broadcaster(history=2)
+    seen = source.publish("a")
+    for payload in "bcd":
+        source.publish(payload)
+
+    _, complete = source.subscribe(seen)
+    assert not complete
+    _, complete = source.subscribe("otherepoch-1")
+    assert not complete
+
+
+def test_stream_ends_when_dropped_and_unsubscribes():
+    source = Broadcaster(queue_size=1)
+    subscription, complete = source.subscribe()
+    lines = stream(source, subscription, complete, heartbeat=0)
+
+    assert next(lines).startswith("retry:")
+    assert next(lines) == ": keep-alive\n\n"
+    source.publish("a")
+    source.publish("b")
+
+    assert list(lines) == []
+    assert len(source) == 0
+
+
+def test_events_endpoint_streams_changes(client, create_project):
+    project_id = create_project("Feed", True).project_id
+    source = broadcaster()
+    since = source.publish("{}")
+
+    client.post("/api/tasks", json={"project_id": project_id, "task": "Pushed"})
+    response = client.get("/api/events", headers={"Last-Event-ID": since})
+
+    assert response.mimetype == "text/event-stream"
+    ((event_id, event),) = _read_events(response, 1)
+    assert event == {
+        "entity": "task",
+        "action": "created",
+        "ids": [1],
+        "project_id": project_id,
+        "fields": {"task": "Pushed", "status": True},
+    }
+    assert len(source) == 1
+    response.close()
+    assert len(source) == 0
+
+    # resuming from that event replays nothing older
+    client.delete("/api/tasks/1")
+    response = client.get(f"/api/events?last_event_id={event_id}")
+    ((_, event),) = _read_events(response, 1)
+    assert event["action"] == "deleted"
+    response.close()
+
+
+def test_events_endpoint_signals_reset(client):
+    response = client.get("/api/events", headers={"Last-Event-ID": "stale-1"})
+    chunks = iter(response.response)
+    next(chunks)
+    assert next(chunks).startswith(b"event: reset")
+    response.close()
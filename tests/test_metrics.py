@@ -0,0 +1,81 @@
+from task_manager import create_app
+from task_manager.metrics import Histogram, registry
+
+
+def _sample(text, prefix):
+    """Value of the first sample line of the scrape starting with prefix"""
+    for line in text.splitlines():
+        if line.startswith(prefix):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency", "help", ("endpoint",), buckets=(1, 5))
+    for value in (0.5, 2, 2, 10):
+        histogram.observe(value, "a")
+
+    assert list(histogram.samples()) == [
+        'latency_bucket{endpoint="a",le="1"} 1',
+        'latency_bucket{endpoint="a",le="5"} 3',
+        'latency_bucket{endpoint="a",le="+Inf"} 4',
+        'latency_sum{endpoint="a"} 14.5',
+        'latency_count{endpoint="a"} 4',
+    ]
+
+
+def test_requests_counted_by_endpoint_and_status(client):
+    client.get("/api/tasks")
+    client.get("/api/tasks")
+    client.get("/api/tasks/999")
+
+    text = client.get("/metrics").get_data(as_text=True)
+    assert "# TYPE task_manager_requests_total counter" in text
+    assert (
+        'task_manager_requests_total{endpoint="routes.api_get_tasks",'
+        'method="GET",status="200"} 2' in text
+    )
+    assert (
+        'task_manager_requests_total{endpoint="routes.api_get_task",'
+        'method="GET",status="404"} 1' in text
+    )
+    count = "task_manager_request_duration_seconds_count"
+    assert _sample(text, count + '{endpoint="routes.api_get_tasks"}') == 2
+
+
+def test_sql_statements_recorded_per_request(app, client, create_task, capture_queries):
+    create_task()
+
+    with capture_queries() as statements:
+        client.get("/api/tasks")
+
+    metrics = registry()
+    assert statements
+    assert metrics.statements.value("routes.api_get_tasks") == len(statements)
+    assert metrics.request_statements.count("routes.api_get_tasks") == 1
+    assert metrics.request_sql_duration.count("routes.api_get_tasks") == 1
+
+
+def test_commits_and_templates_timed(client):
+    client.post("/add", data={"task": "Timed", "project": "Metrics", "status": "1"})
+    client.get("/")
+
+    metrics = registry()
+    assert metrics.commit_duration.count() >= 1
+    assert metrics.render_duration.count("index.html") == 1
+
+
+def test_metrics_disabled(tmp_path):
+    app = create_app(
+        {
+            "TESTING": True,
+            "METRICS_ENABLED": False,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path}/m.db",
+        }
+    )
+    client = app.test_client()
+    client.get("/api/tasks")
+
+    text = client.get("/metrics").get_data(as_text=True)
+    assert "task_manager_requests_total" in text
+    assert "endpoint=" not in text
@@ -0,0 +1,186 @@
+import pytest
+from sqlalchemy import create_engine, event, inspect
+
+from task_manager import db, migrations
+from task_manager.models import slugify
+
+LEGACY_SCHEMA = [
+    """CREATE TABLE projects (
+        project_id INTEGER NOT NULL PRIMARY KEY,
+        project_name VARCHAR(20),
+        active BOOLEAN,
+        url_slug VARCHAR UNIQUE
+    )""",
+    """CREATE TABLE tasks (
+        task_id INTEGER NOT NULL PRIMARY KEY,
+        project_id INTEGER REFERENCES projects (project_id),
+        task TEXT,
+        status BOOLEAN
+    )""",
+]
+
+
+def _legacy_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as conn:
+        for statement in LEGACY_SCHEMA:
+            conn.exec_driver_sql(statement)
+    return engine
+
+
+def _index_names(engine, table):
+    return {index["name"] for index in inspect(engine).get_indexes(table)}
+
+
+def test_upgrade_adds_indexes_to_legacy_database(tmp_path):
+    engine = _legacy_engine(tmp_path)
+    assert "ix_tasks_project_id_status" not in _index_names(engine, "tasks")
+
+    version = migrations.upgrade(engine)
+
+    assert version == len(migrations.MIGRATIONS)
+    assert "ix_tasks_project_id_status" in _index_names(engine, "tasks")
+    assert "ix_projects_project_name" in _index_names(engine, "projects")
+    engine.dispose()
+
+
+def test_upgrade_indexes_existing_tasks_for_search(tmp_path):
+    engine = _legacy_engine(tmp_path)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO tasks (task, status) VALUES ('Old task', 1)")
+
+    migrations.upgrade(engine)
+
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(
+            "SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH 'old'"
+        ).all()
+    assert rows == [(1,)]
+    engine.dispose()
+
+
+def test_upgrade_counts_existing_tasks(tmp_path):
+    engine = _legacy_engine(tmp_path)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO projects (project_name) VALUES ('One')")
+        conn.exec_driver_sql(
+            "INSERT INTO tasks (project_id, task, status) "
+            "VALUES (1, 'a', 1), (1, 'b', 1), (1, 'c', 0)"
+        )
+
+    migrations.upgrade(engine)
+
+    with engine.connect() as conn:
+        counts = conn.exec_driver_sql(
+            "SELECT open_tasks, closed_tasks FROM projects"
+        ).one()
+    assert tuple(counts) == (2, 1)
+    engine.dispose()
+
+
+def test_upgrade_is_idempotent(tmp_path):
+    engine = _legacy_engine(tmp_path)
+
+    first = migrations.upgrade(engine)
+    second = migrations.upgrade(engine)
+
+    assert first == second
+    with engine.connect() as conn:
+        assert migrations.schema_version(conn) == first
+    engine.dispose()
+
+
+def test_create_app_database_is_up_to_date(app):
+    with db.engine.connect() as conn:
+        assert migrations.schema_version(conn) == len(migrations.MIGRATIONS)
+    assert "ix_tasks_project_id_status" in _index_names(db.engine, "tasks")
+
+
+def test_upgrade_stops_reusing_task_ids(tmp_path):
+    engine = _legacy_engine(tmp_path)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO projects (project_name) VALUES ('One')")
+        conn.exec_driver_sql(
+            "INSERT INTO tasks (project_id, task, status) "
+            "VALUES (1, 'a', 1), (1, 'b', 1)"
+        )
+
+    migrations.upgrade(engine)
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM tasks WHERE task_id = 2")
+        conn.exec_driver_sql(
+            "INSERT INTO tasks (project_id, task, status) VALUES (1, 'c', 1)"
+        )
+        ids = conn.exec_driver_sql("SELECT task_id FROM tasks").scalars().all()
+        matches = conn.exec_driver_sql(
+            "SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH 'a'"
+        ).all()
+        columns = {column["name"] for column in inspect(conn).get_columns("projects")}
+    assert sorted(ids) == [1, 3]
+    assert matches == [(1,)]
+    assert {"deleted", "cleared_through"} <= columns
+    engine.dispose()
+
+
+def test_upgrade_cascades_project_deletes(tmp_path):
+    engine = _legacy_engine(tmp_path)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("INSERT INTO projects (project_name) VALUES ('One')")
+        # task 2 was orphaned by a project deleted before the cascade
+        conn.exec_driver_sql(
+            "INSERT INTO tasks (project_id, task, status) VALUES (1, 'a', 1), (7, 'b', 1)"
+        )
+    # foreign keys enforced, as on the engine of create_app
+    event.listen(
+        engine, "connect", lambda dbapi, _: dbapi.execute("PRAGMA foreign_keys = ON")
+    )
+    engine.dispose()
+
+    migrations.upgrade(engine)
+
+    with engine.begin() as conn:
+        assert conn.exec_driver_sql("PRAGMA foreign_keys").scalar() == 1
+        conn.exec_driver_sql("DELETE FROM projects WHERE project_id = 1")
+        ids = conn.exec_driver_sql("SELECT task_id FROM tasks").scalars().all()
+    assert ids == [2]
+    engine.dispose()
+
+
+def test_failed_upgrade_rolls_back_rebuilt_tables(tmp_path, monkeypatch):
+    engine = _legacy_engine(tmp_path)
+    pending = migrations.MIGRATIONS
+    monkeypatch.setattr(migrations, "MIGRATIONS", pending[:4])
+    migrations.upgrade(engine)
+
+    def _fail(conn):
+        raise RuntimeError("failed after the tasks table was rebuilt")
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", pending + [_fail])
+    with pytest.raises(RuntimeError):
+        migrations.upgrade(engine)
+
+    with engine.connect() as conn:
+        assert migrations.schema_version(conn) == 4
+        assert not inspect(conn).has_table("tasks_rebuilt")
+        assert "AUTOINCREMENT" not in migrations._tasks_sql(conn)
+    monkeypatch.setattr(migrations, "MIGRATIONS", pending)
+    assert migrations.upgrade(engine) == len(pending)
+    engine.dispose()
+
+
+def test_upgrade_gives_non_ascii_names_their_own_slug(tmp_path):
+    engine = _legacy_engine(tmp_path)
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "INSERT INTO projects (project_name, url_slug) "
+            "VALUES ('Работа', ''), ('Home', 'home')"
+        )
+
+    migrations.upgrade(engine)
+
+    with engine.connect() as conn:
+        slugs = conn.exec_driver_sql("SELECT url_slug FROM projects").scalars().all()
+    assert slugs == [slugify("Работа"), "home"]
+    assert slugs[0]
+    engine.dispose()
@@ -0,0 +1,211 @@
+from sqlalchemy import delete, insert, select, text
+
+from task_manager import db
+from task_manager.models import Projects, Tasks
+from task_manager.purge import purger
+
+
+def _add_tasks(project, count, status=True):
+    db.session.execute(
+        insert(Tasks),
+        [
+            {"project_id": project.project_id, "task": f"Task {n}", "status": status}
+            for n in range(count)
+        ],
+    )
+    db.session.commit()
+
+
+def _task_ids():
+    return list(db.session.scalars(select(Tasks.task_id).order_by(Tasks.task_id)))
+
+
+def test_clear_hides_project_before_purge(client, create_project, capture_queries):
+    project = create_project("Doomed", True)
+    project_id = project.project_id
+    _add_tasks(project, 5)
+
+    with capture_queries() as statements:
+        client.get(f"/clear/{project_id}")
+
+    # a single UPDATE of the project row, however many tasks it has
+    assert [s.split()[0] for s in statements] == ["UPDATE"]
+    assert len(_task_ids()) == 5
+    assert client.get(f"/api/projects/{project_id}").status_code == 404
+    assert client.get("/api/tasks").json == []
+    assert client.get("/api/tasks/search?q=task").json == []
+    assert client.get("/api/projects").json == []
+
+
+def test_purge_deletes_in_chunks(app, client, create_project):
+    project = create_project("Doomed", True)
+    project_id = project.project_id
+    _add_tasks(project, 5)
+    client.get(f"/clear/{project_id}")
+
+    source = purger()
+    assert source.run(chunk_size=2, pause=0) == 5
+
+    assert source.chunks == 3
+    assert source.projects == 1
+    assert _task_ids() == []
+    assert db.session.get(Projects, project_id) is None
+    text = client.get("/metrics").get_data(as_text=True)
+    assert "task_manager_purged_tasks_total 5" in text
+    assert "task_manager_purged_projects_total 1" in text
+
+
+def test_remove_keeps_later_tasks(client, create_project):
+    project = create_project("Kept", True)
+    project_id = project.project_id
+    _add_tasks(project, 3)
+    client.get(f"/remove/{project_id}")
+    client.post("/add", data={"task": "After", "project": "Kept", "status": "0"})
+
+    assert [t["task"] for t in client.get("/api/tasks").json] == ["After"]
+    assert client.get(f"/api/projects/{project_id}/stats").json["closed_tasks"] == 1
+
+    purger().run(chunk_size=2, pause=0)
+
+    assert len(_task_ids()) == 1
+    project = db.session.get(Projects, project_id)
+    db.session.refresh(project)
+    assert project.cleared_through == 0
+    assert (project.open_tasks, project.closed_tasks) == (0, 1)
+
+
+def test_cleared_task_ids_are_not_reused(client, create_project):
+    project = create_project("Reuse", True)
+    project_id = project.project_id
+    _add_tasks(project, 3)
+    newest = _task_ids()[-1]
+    client.get(f"/remove/{project_id}")
+    purger().run(pause=0)
+
+    client.post("/add", data={"task": "Fresh", "project": "Reuse", "status": "1"})
+
+    assert _task_ids()[0] > newest
+    assert [t["task"] for t in client.get("/api/tasks").json] == ["Fresh"]
+
+
+def test_tombstoned_tasks_cannot_be_changed(client, create_task):
+    task = create_task("Hidden")
+    task_id, project_id = task.task_id, task.project_id
+    client.get(f"/remove/{project_id}")
+
+    assert client.get(f"/api/tasks/{task_id}").status_code == 404
+    assert client.put(f"/api/tasks/{task_id}", json={"task": "x"}).status_code == 404
+    assert client.delete(f"/api/tasks/{task_id}").status_code == 404
+    response = client.put("/api/tasks/bulk", json={"ids": [task_id], "status": False})
+    assert response.json["updated"] == 0
+
+
+def test_no_tasks_added_to_deleted_project(client, create_project):
+    project_id = create_project("Deleted", True).project_id
+    client.delete(f"/api/projects/{project_id}")
+
+    response = client.post("/api/tasks", json={"project_id": project_id, "task": "x"})
+
+    assert response.status_code == 404
+    assert response.json == {"error": "Project not found"}
+    assert _task_ids() == []
+
+
+def test_deleted_project_name_can_be_reused(client, create_project):
+    create_project("Again", True)
+    client.delete("/api/delete_all")
+
+    response = client.post("/api/projects", json={"name": "Again"})
+
+    assert response.status_code == 201
+    assert [p["name"] for p in client.get("/api/projects").json] == ["Again"]
+
+
+def test_background_purge(app, client, create_project):
+    project = create_project("Background", True)
+    _add_tasks(project, 3)
+    app.config["PURGE_IN_BACKGROUND"] = True
+
+    client.delete("/api/delete_all")
+    purger().join(timeout=10)
+
+    assert _task_ids() == []
+    assert Projects.query.count() == 0
+
+
+def test_purge_command(app, client, create_project):
+    project = create_project("Command", True)
+    _add_tasks(project, 4)
+    client.get(f"/clear/{project.project_id}")
+
+    result = app.test_cli_runner().invoke(
+        args=["tasks", "purge", "--chunk-size", "3", "--pause", "0"]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "Purged 4 tasks and 1 projects" in result.output
+    assert _task_ids() == []
+
+
+def test_delete_project_purges_its_tasks(client, create_project):
+    project = create_project("Gone", True)
+    project_id = project.project_id
+    _add_tasks(project, 5)
+    other = create_project("Stays", False)
+    _add_tasks(other, 1)
+
+    response = client.delete(f"/api/projects/{project_id}")
+
+    assert response.status_code == 200
+    assert len(client.get("/api/tasks").json) == 1
+    source = purger()
+    assert source.run(chunk_size=2, pause=0) == 5
+    assert (source.chunks, source.projects) == (3, 1)
+    assert len(_task_ids()) == 1
+    assert client.delete(f"/api/projects/{project_id}").status_code == 404
+
+
+def test_deleting_a_project_row_cascades(app, create_project):
+    project = create_project("Cascade", True)
+    project_id = project.project_id
+    _add_tasks(project, 3)
+
+    db.session.execute(delete(Projects).where(Projects.project_id == project_id))
+    db.session.commit()
+
+    assert _task_ids() == []
+    matches = db.session.execute(
+        text("SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH 'task'")
+    ).all()
+    assert matches == []
+
+
+def _add_orphans(count):
+    with db.engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA foreign_keys = OFF")
+        conn.execute(
+            insert(Tasks),
+            [{"project_id": 99, "task": f"Orphan {n}"} for n in range(count)],
+        )
+        conn.commit()
+        conn.exec_driver_sql("PRAGMA foreign_keys = ON")
+
+
+def test_purge_orphans_command(app, create_project):
+    project = create_project("Parent", True)
+    _add_tasks(project, 2)
+    _add_orphans(5)
+    runner = app.test_cli_runner()
+
+    result = runner.invoke(args=["tasks", "purge-orphans", "--dry-run"])
+    assert "Found 5 orphaned tasks" in result.output
+    assert len(_task_ids()) == 7
+
+    result = runner.invoke(
+        args=["tasks", "purge-orphans", "--chunk-size", "2", "--pause", "0"]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "Purged 5 orphaned tasks" in result.output
+    assert purger().chunks == 3
+    assert len(_task_ids()) == 2
@@ -1,9 +1,11 @@
 import json
 
 import pytest
+from sqlalchemy import insert
 
 from task_manager import db
 from task_manager.models import Projects, Tasks
+from task_manager.purge import purger
 
 
 def test_get_projects_empty(client):
@@ -101,6 +103,16 @@ def test_create_task_fail(client):
     assert "error" in data
 
 
+@pytest.mark.parametrize(
+    "project_id, status_code", [(999, 404), ("1", 400), (True, 400)]
+)
+def test_create_task_unknown_project(client, create_project, project_id, status_code):
+    create_project("P", True)
+    response = client.post("/api/tasks", json={"project_id": project_id, "task": "x"})
+    assert response.status_code == status_code
+    assert "error" in response.json
+
+
 def test_update_project_success(client, create_project, app):
     project = create_project("OldName", False)
     payload = {"name": "UpdatedName", "active": True}
@@ -115,6 +127,28 @@ def test_update_project_success(client, create_project, app):
         assert updated.active is True
 
 
+def test_update_project_active_deactivates_others(client, create_project):
+    current = create_project("Current", True)
+    other = create_project("Other", False)
+
+    client.put(f"/api/projects/{other.project_id}", json={"active": True})
+
+    db.session.expire_all()
+    assert db.session.get(Projects, current.project_id).active is False
+    assert db.session.get(Projects, other.project_id).active is True
+
+
+def test_create_active_project_deactivates_others(client, create_project):
+    current = create_project("Current", True)
+
+    response = client.post("/api/projects", json={"name": "Newer", "active": True})
+
+    db.session.expire_all()
+    assert db.session.get(Projects, current.project_id).active is False
+    new = db.session.get(Projects, json.loads(response.data)["id"])
+    assert new.active is True
+
+
 def test_update_project_fail(client):
     response = client.put("/api/projects/9999", json={"name": "Name"})
     data = json.loads(response.data)
@@ -144,14 +178,15 @@ def test_update_task_fail(client):
 
 
 def test_delete_project_success(client, create_project, app):
-    project = create_project("ToDelete", True)
-    response = client.delete(f"/api/projects/{project.project_id}")
+    project_id = create_project("ToDelete", True).project_id
+    response = client.delete(f"/api/projects/{project_id}")
     data = json.loads(response.data)
     assert response.status_code == 200
     assert data["message"] == "Project deleted"
 
+    purger().run(pause=0)
     with app.app_context():
-        assert db.session.get(Projects, project.project_id) is None
+        assert db.session.get(Projects, project_id) is None
 
 
 def test_delete_project_fail(client):
@@ -185,11 +220,449 @@ def test_delete_all_success(client, app):
     assert response.status_code == 200
     assert data["message"] == "All projects and tasks deleted"
 
+    purger().run(pause=0)
     with app.app_context():
         assert Projects.query.count() == 0
         assert Tasks.query.count() == 0
 
 
+def test_get_tasks_keyset_pagination(client, create_project):
+    project = create_project("Paged", True)
+    for i in range(5):
+        db.session.add(Tasks(project.project_id, f"Task {i}", True))
+    db.session.commit()
+
+    seen = []
+    url = "/api/tasks?limit=2"
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        page = json.loads(response.data)
+        assert len(page) <= 2
+        seen.extend(t["task"] for t in page)
+        link = response.headers.get("Link")
+        url = link[1 : link.index(">")] if link else None
+
+    assert seen == [f"Task {i}" for i in range(5)]
+
+
+def test_get_tasks_after_cursor(client, create_project, create_task):
+    project = create_project()
+    first = create_task("First", True, project)
+    create_task("Second", True, project)
+    response = client.get(f"/api/tasks?after={first.task_id}")
+    data = json.loads(response.data)
+    assert [t["task"] for t in data] == ["Second"]
+    assert "Link" not in response.headers
+
+
+def test_get_tasks_filters(client, create_project):
+    p1 = create_project("One", True)
+    p2 = create_project("Two", False)
+    db.session.add_all(
+        [
+            Tasks(p1.project_id, "open one", True),
+            Tasks(p1.project_id, "closed one", False),
+            Tasks(p2.project_id, "open two", True),
+        ]
+    )
+    db.session.commit()
+
+    response = client.get(f"/api/tasks?project_id={p1.project_id}&status=open")
+    assert [t["task"] for t in json.loads(response.data)] == ["open one"]
+
+    response = client.get("/api/tasks?status=closed")
+    assert [t["task"] for t in json.loads(response.data)] == ["closed one"]
+
+
+@pytest.mark.parametrize(
+    "query", ["limit=0", "limit=abc", "after=-1", "status=maybe", "project_id=x"]
+)
+def test_get_tasks_invalid_arguments(client, query):
+    response = client.get(f"/api/tasks?{query}")
+    assert response.status_code == 400
+    assert "error" in json.loads(response.data)
+
+
+def test_get_projects_pagination(client, create_project):
+    for i in range(3):
+        create_project(f"Project {i}", False)
+
+    response = client.get("/api/projects?limit=2")
+    data = json.loads(response.data)
+    assert [p["name"] for p in data] == ["Project 0", "Project 1"]
+    assert 'rel="next"' in response.headers["Link"]
+    assert f"after={data[-1]['id']}" in response.headers["Link"]
+
+
+def test_export_tasks_ndjson_streams_in_batches(
+    client, create_project, capture_queries, monkeypatch
+):
+    monkeypatch.setattr("task_manager.api.EXPORT_BATCH_SIZE", 2)
+    project = create_project("Export", True)
+    for i in range(5):
+        db.session.add(Tasks(project.project_id, f"Task {i}", i % 2 == 0))
+    db.session.commit()
+
+    with capture_queries() as statements:
+        response = client.get("/api/tasks/export")
+        assert response.is_streamed
+        lines = response.get_data(as_text=True).splitlines()
+
+    assert response.mimetype == "application/x-ndjson"
+    rows = [json.loads(line) for line in lines]
+    assert [r["task"] for r in rows] == [f"Task {i}" for i in range(5)]
+    assert rows[0] == {
+        "id": rows[0]["id"],
+        "project_id": project.project_id,
+        "task": "Task 0",
+        "status": True,
+    }
+    # three full or partial batches plus the empty one that ends the stream
+    assert len([s for s in statements if s.startswith("SELECT")]) == 4
+
+
+def test_export_tasks_csv(client, create_project):
+    project = create_project("Export", True)
+    db.session.add(Tasks(project.project_id, "Comma, inside", False))
+    db.session.commit()
+
+    response = client.get("/api/tasks/export?format=csv&status=closed")
+    assert response.mimetype == "text/csv"
+    lines = response.get_data(as_text=True).splitlines()
+    assert lines[0] == "id,project_id,task,status"
+    assert lines[1].endswith(',"Comma, inside",False')
+    assert len(lines) == 2
+
+
+def test_export_tasks_unknown_format(client):
+    response = client.get("/api/tasks/export?format=xml")
+    assert response.status_code == 400
+    assert "error" in json.loads(response.data)
+
+
+def test_bulk_create_tasks_single_transaction(
+    client, create_project, capture_queries, app
+):
+    p1 = create_project("Bulk One", True)
+    p2 = create_project("Bulk Two", False)
+    payload = {
+        "tasks": [
+            {"project_id": p1.project_id, "task": f"Task {i}", "status": i % 2 == 0}
+            for i in range(50)
+        ]
+        + [{"project_id": p2.project_id, "task": "Other project"}]
+    }
+
+    with capture_queries() as statements:
+        response = client.post("/api/tasks/bulk", json=payload)
+    data = json.loads(response.data)
+
+    assert response.status_code == 201
+    assert len(data["ids"]) == 51
+    assert data["ids"] == sorted(data["ids"])
+    assert data["errors"] == []
+    assert len([s for s in statements if s.startswith("INSERT")]) == 1
+    with app.app_context():
+        assert db.session.get(Tasks, data["ids"][0]).task == "Task 0"
+        assert db.session.get(Tasks, data["ids"][-1]).project_id == p2.project_id
+
+
+def test_bulk_create_tasks_atomic_rejects_batch(client, create_project):
+    project = create_project("Atomic", True)
+    payload = {
+        "tasks": [
+            {"project_id": project.project_id, "task": "Good"},
+            {"project_id": 9999, "task": "Unknown project"},
+            {"project_id": project.project_id},
+        ]
+    }
+
+    response = client.post("/api/tasks/bulk", json=payload)
+    data = json.loads(response.data)
+
+    assert response.status_code == 400
+    assert [e["index"] for e in data["errors"]] == [1, 2]
+    assert Tasks.query.count() == 0
+
+
+def test_bulk_create_tasks_partial(client, create_project):
+    project = create_project("Partial", True)
+    payload = {
+        "atomic": False,
+        "tasks": [
+            {"project_id": 9999, "task": "Unknown project"},
+            {"project_id": project.project_id, "task": "Good"},
+            "not a task",
+        ],
+    }
+
+    response = client.post("/api/tasks/bulk", json=payload)
+    data = json.loads(response.data)
+
+    assert response.status_code == 201
+    assert data["ids"][0] is None and data["ids"][2] is None
+    assert db.session.get(Tasks, data["ids"][1]).task == "Good"
+    assert [e["index"] for e in data["errors"]] == [0, 2]
+
+
+def test_bulk_create_tasks_rejects_wrong_types(client, create_project):
+    project_id = create_project("Types", True).project_id
+    payload = {
+        "atomic": False,
+        "tasks": [
+            {"project_id": project_id, "task": "Good", "status": False},
+            {"project_id": project_id, "task": "x", "status": "false"},
+            {"project_id": project_id, "task": 5},
+            {"project_id": project_id, "task": "  "},
+            {"project_id": True, "task": "x"},
+        ],
+    }
+
+    response = client.post("/api/tasks/bulk", json=payload)
+    data = json.loads(response.data)
+
+    assert response.status_code == 201
+    assert data["ids"][1:] == [None] * 4
+    assert [e["error"] for e in data["errors"]] == [
+        "status must be a boolean",
+        "task must be a non-empty string",
+        "task must be a non-empty string",
+        "project_id must be an integer",
+    ]
+    assert db.session.get(Tasks, data["ids"][0]).status is False
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        None,
+        {},
+        {"tasks": []},
+        [{"task": "x"}],
+        {"tasks": [{"project_id": 1, "task": "x"}], "atomic": "false"},
+        {"tasks": [{"project_id": 1, "task": "x"}], "atomic": 0},
+    ],
+)
+def test_bulk_create_tasks_invalid_payload(client, payload):
+    response = client.post("/api/tasks/bulk", json=payload)
+    assert response.status_code == 400
+    assert "error" in json.loads(response.data)
+
+
+def test_bulk_update_tasks_by_ids(client, create_project, capture_queries):
+    project = create_project("One", True)
+    tasks = [{"project_id": project.project_id, "task": f"T{i}"} for i in range(5)]
+    response = client.post("/api/tasks/bulk", json={"tasks": tasks})
+    ids = json.loads(response.data)["ids"]
+
+    with capture_queries() as statements:
+        response = client.put(
+            "/api/tasks/bulk", json={"ids": ids[:3] + [9999], "status": False}
+        )
+    assert response.status_code == 200
+    assert json.loads(response.data)["updated"] == 3
+    assert sum(s.startswith("UPDATE tasks") for s in statements) == 1
+    assert not any(s.startswith("SELECT") for s in statements)
+
+    statuses = [t.status for t in Tasks.query.order_by(Tasks.task_id)]
+    assert statuses == [False, False, False, True, True]
+
+
+def test_bulk_update_tasks_by_filter(client, create_project):
+    p1 = create_project("One", True)
+    p2 = create_project("Two", False)
+    db.session.add_all(
+        [
+            Tasks(p1.project_id, "open one", True),
+            Tasks(p1.project_id, "closed one", False),
+            Tasks(p2.project_id, "open two", True),
+        ]
+    )
+    db.session.commit()
+    p1_id = p1.project_id
+
+    response = client.put(
+        "/api/tasks/bulk",
+        json={"filter": {"project_id": p1_id, "status": True}, "status": False},
+    )
+    assert json.loads(response.data)["updated"] == 1
+    assert Tasks.query.filter_by(status=True).count() == 1
+
+    response = client.put(
+        "/api/tasks/bulk",
+        json={"filter": {"project_id": p1_id}, "task": "Renamed"},
+    )
+    assert json.loads(response.data)["updated"] == 2
+    assert {t.task for t in Tasks.query.filter_by(project_id=p1_id)} == {"Renamed"}
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        None,
+        {"status": False},
+        {"ids": [], "status": False},
+        {"ids": ["1"], "status": False},
+        {"ids": [1]},
+        {"ids": [1], "status": "no"},
+        {"ids": [1], "task": " "},
+        {"filter": {}, "status": False},
+        {"filter": {"task": "x"}, "status": False},
+        {"filter": {"status": "maybe"}, "status": False},
+        {"filter": {"project_id": "x"}, "status": False},
+        {"ids": [1], "filter": [1], "status": False},
+        {"ids": [1], "filter": {"project_id": "x"}, "status": False},
+    ],
+)
+def test_bulk_update_tasks_invalid_payload(client, create_task, payload):
+    create_task("Keep", True)
+    response = client.put("/api/tasks/bulk", json=payload)
+    assert response.status_code == 400
+    assert "error" in json.loads(response.data)
+    assert Tasks.query.one().status is True
+
+
+def _stats(client, project_id):
+    response = client.get(f"/api/projects/{project_id}/stats")
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    return data["open_tasks"], data["closed_tasks"], data["total_tasks"]
+
+
+def test_project_stats_follow_task_writes(client, create_project):
+    project = create_project("One", True)
+    other = create_project("Two", False)
+    project_id, other_id = project.project_id, other.project_id
+    assert _stats(client, project_id) == (0, 0, 0)
+
+    tasks = [{"project_id": project_id, "task": f"T{i}"} for i in range(3)]
+    response = client.post("/api/tasks/bulk", json={"tasks": tasks})
+    ids = json.loads(response.data)["ids"]
+    client.post("/api/tasks", json={"project_id": other_id, "task": "Other"})
+    assert _stats(client, project_id) == (3, 0, 3)
+    assert _stats(client, other_id) == (1, 0, 1)
+
+    client.put(f"/api/tasks/{ids[0]}", json={"status": False})
+    client.get(f"/close/{ids[1]}")
+    assert _stats(client, project_id) == (1, 2, 3)
+
+    client.get(f"/close/{ids[1]}")
+    client.delete(f"/api/tasks/{ids[2]}")
+    assert _stats(client, project_id) == (1, 1, 2)
+
+    client.get(f"/remove/{project_id}")
+    assert _stats(client, project_id) == (0, 0, 0)
+    assert _stats(client, other_id) == (1, 0, 1)
+
+    client.delete("/api/delete_all")
+    assert client.get(f"/api/projects/{project_id}/stats").status_code == 404
+
+
+def test_get_projects_with_counts(client, create_project, create_task):
+    project = create_project("One", True)
+    create_task("Open", True, project)
+    create_task("Closed", False, project)
+
+    response = client.get("/api/projects")
+    assert "open_tasks" not in json.loads(response.data)[0]
+
+    response = client.get("/api/projects?counts=true")
+    data = json.loads(response.data)
+    assert data[0]["open_tasks"] == 1
+    assert data[0]["closed_tasks"] == 1
+    assert data[0]["total_tasks"] == 2
+
+    assert client.get("/api/projects?counts=maybe").status_code == 400
+
+
+def test_project_stats_cost_does_not_grow_with_tasks(
+    client, create_project, capture_queries
+):
+    project_id = create_project("One", True).project_id
+    db.session.execute(
+        insert(Tasks), [{"project_id": project_id, "task": "T", "status": True}] * 500
+    )
+    db.session.commit()
+
+    with capture_queries() as statements:
+        assert _stats(client, project_id) == (500, 0, 500)
+    assert len(statements) == 1
+    assert "from tasks" not in statements[0].lower()
+
+
+def test_project_stats_missing(client):
+    response = client.get("/api/projects/9999/stats")
+    assert response.status_code == 404
+
+
+def _search(client, query):
+    response = client.get(f"/api/tasks/search?{query}")
+    assert response.status_code == 200
+    return [t["task"] for t in json.loads(response.data)]
+
+
+def test_search_tasks_ranks_and_prefix(client, create_project):
+    project = create_project("One", True)
+    db.session.add_all(
+        [
+            Tasks(project.project_id, "Write the release notes", True),
+            Tasks(project.project_id, "Release, release, release", True),
+            Tasks(project.project_id, "Water the plants", True),
+        ]
+    )
+    db.session.commit()
+
+    assert _search(client, "q=release") == [
+        "Release, release, release",
+        "Write the release notes",
+    ]
+    assert _search(client, "q=wr*") == ["Write the release notes"]
+    assert _search(client, "q=release+notes") == ["Write the release notes"]
+    assert _search(client, "q=release&limit=1") == ["Release, release, release"]
+    assert _search(client, 'q=NOT+"plants') == []
+
+
+def test_search_tasks_filters(client, create_project):
+    p1 = create_project("One", True)
+    p2 = create_project("Two", False)
+    db.session.add_all(
+        [
+            Tasks(p1.project_id, "open one", True),
+            Tasks(p1.project_id, "closed one", False),
+            Tasks(p2.project_id, "open two", True),
+        ]
+    )
+    db.session.commit()
+
+    assert _search(client, f"q=open&project_id={p2.project_id}") == ["open two"]
+    assert _search(client, "q=one&status=closed") == ["closed one"]
+
+
+def test_search_index_follows_writes(client, create_task):
+    task = create_task("Buy milk")
+    task_id = task.task_id
+    assert _search(client, "q=milk") == ["Buy milk"]
+
+    client.post(f"/rename_task_desc/{task_id}", json={"new_desc": "Buy bread"})
+    assert _search(client, "q=milk") == []
+    assert _search(client, "q=bread") == ["Buy bread"]
+
+    client.put(f"/api/tasks/{task_id}", json={"task": "Bake bread"})
+    assert _search(client, "q=buy") == []
+    assert _search(client, "q=bake") == ["Bake bread"]
+
+    client.delete(f"/api/tasks/{task_id}")
+    assert _search(client, "q=bread") == []
+
+
+@pytest.mark.parametrize("query", ["", "q=", "q=*+%22", "q=x&limit=0", "q=x&status=y"])
+def test_search_tasks_invalid_arguments(client, query):
+    response = client.get(f"/api/tasks/search?{query}")
+    assert response.status_code == 400
+    assert "error" in json.loads(response.data)
+
+
 # @pytest.mark.parametrize(
 #     "payload, status_code, expected_key",
 #     [
@@ -216,6 +689,7 @@ def test_api_delete_all_success(client, create_task, app):
     data = response.get_json()
     assert data["message"] == "All projects and tasks deleted"
 
+    purger().run(pause=0)
     with app.app_context():
         assert Projects.query.count() == 0
         assert Tasks.query.count() == 0
@@ -225,7 +699,7 @@ def test_api_delete_all_failure(client, monkeypatch):
     def boom(*args, **kwargs):
         raise Exception("Simulated DB failure")
 
-    monkeypatch.setattr("sqlalchemy.orm.query.Query.delete", boom)
+    monkeypatch.setattr("task_manager.api.delete_projects", boom)
 
     response = client.delete("/api/delete_all")
     assert response.status_code == 500
@@ -1,5 +1,10 @@
+import threading
+
+from sqlalchemy import event
+
 from task_manager import db
 from task_manager.models import Projects, Tasks
+from task_manager.purge import purger
 
 
 # Test /
@@ -111,6 +116,69 @@ def test_add_task_existing_project_used(client, app):
         assert task.task == "Task X"
 
 
+def test_add_task_statement_count(client, create_project, capture_queries):
+    for i in range(20):
+        create_project(f"Project {i}", active=i == 0)
+
+    with capture_queries() as statements:
+        client.post("/add", data={"task": "T", "project": "Project 7", "status": "1"})
+
+    assert [s.split()[0] for s in statements] == ["INSERT", "UPDATE", "INSERT"]
+    assert Projects.query.count() == 20
+
+
+def test_add_task_same_slug_reuses_project(client, create_project):
+    project = create_project("Mixed Case", active=False)
+
+    client.post("/add", data={"task": "T", "project": "mixed case", "status": "1"})
+
+    assert Projects.query.count() == 1
+    assert Tasks.query.one().project_id == project.project_id
+
+
+def test_add_task_non_ascii_projects_stay_apart(client):
+    for name in ("Работа", "仕事", "Работа"):
+        client.post("/add", data={"task": name, "project": name, "status": "1"})
+
+    projects = Projects.query.order_by(Projects.project_id).all()
+    assert [p.project_name for p in projects] == ["Работа", "仕事"]
+    assert all(p.url_slug for p in projects)
+    assert [t.project_id for t in Tasks.query.order_by(Tasks.task_id)] == [
+        projects[0].project_id,
+        projects[1].project_id,
+        projects[0].project_id,
+    ]
+
+
+def test_add_task_concurrent_new_project_no_duplicates(app):
+    workers, per_worker = 8, 5
+    barrier = threading.Barrier(workers)
+    errors = []
+
+    def post_tasks(worker):
+        client = app.test_client()
+        barrier.wait()
+        for i in range(per_worker):
+            response = client.post(
+                "/add",
+                data={"task": f"{worker}-{i}", "project": "Race", "status": "1"},
+            )
+            if response.status_code != 302:
+                errors.append(response.status_code)
+
+    threads = [threading.Thread(target=post_tasks, args=(w,)) for w in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    project = Projects.query.filter_by(url_slug="race").one()
+    assert Tasks.query.filter_by(project_id=project.project_id).count() == (
+        workers * per_worker
+    )
+
+
 # Test /close
 
 
@@ -161,6 +229,7 @@ def test_clear_all_removes_tasks_and_project(client, create_task, app):
     assert response.status_code == 302
     assert response.location.endswith("/")
 
+    purger().run(pause=0)
     with app.app_context():
         assert Tasks.query.filter_by(project_id=project_id).count() == 0
         assert db.session.get(Projects, project_id) is None
@@ -187,6 +256,7 @@ def test_remove_all_deletes_tasks(client, create_task, app):
     assert response.status_code == 302
     assert response.location.endswith("/")
 
+    purger().run(pause=0)
     with app.app_context():
         remaining = Tasks.query.filter_by(project_id=project_id).all()
         assert len(remaining) == 0
@@ -234,6 +304,39 @@ def test_tab_nav_with_nonexistent_tab(client, create_project, app):
         assert active_count == 0
 
 
+def test_tab_nav_is_constant_cost(client, create_project, capture_queries):
+    projects = [create_project(f"Project {i}", active=i == 0) for i in range(30)]
+    target_id, slug = projects[-1].project_id, projects[-1].url_slug
+
+    with capture_queries() as statements:
+        client.get(f"/project/{slug}")
+
+    assert len(statements) == 2
+    assert statements[0].startswith("SELECT")
+    assert statements[1].startswith("UPDATE")
+    assert [p.project_id for p in Projects.query.filter_by(active=True)] == [target_id]
+
+
+def test_tab_nav_to_active_tab_does_not_write(client, create_project, capture_queries):
+    slug = create_project("Current", active=True).url_slug
+
+    with capture_queries() as statements:
+        client.get(f"/project/{slug}")
+
+    assert len(statements) == 1
+
+
+def test_activate_project_uses_indexes(app):
+    with db.engine.connect() as conn:
+        plan = conn.exec_driver_sql(
+            "EXPLAIN QUERY PLAN UPDATE projects SET active = (project_id = 1) "
+            "WHERE active = 1 OR project_id = 1"
+        ).all()
+    details = " ".join(row[-1] for row in plan)
+    assert "ix_projects_active" in details
+    assert "SCAN" not in details
+
+
 # Test /rename_project
 
 
@@ -290,3 +393,150 @@ def test_rename_task_desc_invalid_desc(client, create_task):
     response = client.post(f"/rename_task_desc/{task.task_id}", json={"new_desc": ""})
     assert response.status_code == 400
     assert b"Invalid description" in response.data
+
+
+def _render_index(client, capture_queries):
+    loaded = []
+
+    def _on_load(target, context):
+        loaded.append(target)
+
+    event.listen(Tasks, "load", _on_load)
+    try:
+        with capture_queries() as statements:
+            response = client.get("/")
+    finally:
+        event.remove(Tasks, "load", _on_load)
+    return response, statements, loaded
+
+
+def test_index_loads_only_active_project_tasks(client, create_project, capture_queries):
+    active = create_project("Active", active=True)
+    other = create_project("Other", active=False)
+    for i in range(3):
+        db.session.add(Tasks(active.project_id, f"mine {i}", True))
+    for i in range(20):
+        db.session.add(Tasks(other.project_id, f"theirs {i}", True))
+    db.session.commit()
+    active_id = active.project_id
+    db.session.expunge_all()
+
+    response, statements, loaded = _render_index(client, capture_queries)
+    assert response.status_code == 200
+    assert b"mine 0" in response.data
+    assert b"theirs 0" not in response.data
+    assert len(statements) == 2
+    assert len(loaded) == 3
+    assert all(task.project_id == active_id for task in loaded)
+
+
+def test_index_auto_activate_query_count(client, create_project, capture_queries):
+    first = create_project("First", active=False)
+    create_project("Second", active=False)
+    db.session.add(Tasks(first.project_id, "only task", True))
+    db.session.commit()
+    db.session.expunge_all()
+
+    response, statements, loaded = _render_index(client, capture_queries)
+    assert response.status_code == 200
+    assert b"only task" in response.data
+    assert len(statements) <= 4
+    assert len(loaded) == 1
+
+
+def test_index_shows_tabs_when_active_project_is_empty(client, create_project):
+    create_project("Empty", active=True)
+    create_project("Busy", active=False)
+
+    response = client.get("/")
+    assert b"/project/busy" in response.data
+
+
+# Test fragment responses to the page's script
+
+FRAGMENT = {"X-Requested-With": "fetch"}
+
+
+def test_close_task_fragment_returns_row(client, create_task, capture_queries):
+    task_id = create_task("Toggle me", status=True).task_id
+
+    with capture_queries() as statements:
+        response = client.post(f"/close/{task_id}", headers=FRAGMENT)
+
+    assert response.status_code == 200
+    html = response.get_data(as_text=True)
+    assert html.lstrip().startswith(
+        f'<tr class="task-row active" data-task-id="{task_id}"'
+    )
+    assert "<strike>" in html
+    # the toggled task only, the home page is not rendered
+    assert not any(s.startswith("SELECT projects.") for s in statements)
+    assert db.session.get(Tasks, task_id).status is False
+
+
+def test_close_task_fragment_missing(client):
+    response = client.post("/close/9999", headers=FRAGMENT)
+    assert response.status_code == 404
+
+
+def test_delete_task_fragment(client, create_task):
+    task_id = create_task("Delete me").task_id
+
+    response = client.post(f"/delete/{task_id}", headers=FRAGMENT)
+
+    assert response.status_code == 204
+    assert db.session.get(Tasks, task_id) is None
+    assert client.post(f"/delete/{task_id}", headers=FRAGMENT).status_code == 404
+
+
+def test_remove_all_fragment(client, create_task):
+    project_id = create_task("Remove me").project_id
+
+    response = client.post(f"/remove/{project_id}", headers=FRAGMENT)
+
+    assert response.status_code == 204
+    purger().run(pause=0)
+    assert Tasks.query.count() == 0
+
+
+def test_add_task_fragment_to_active_tab(client, create_project, capture_queries):
+    create_project("Current", active=True)
+
+    with capture_queries() as statements:
+        response = client.post(
+            "/add",
+            data={"task": "New row", "project": "Current", "status": "1"},
+            headers=FRAGMENT,
+        )
+
+    assert response.status_code == 201
+    assert "New row" in response.get_data(as_text=True)
+    # the project was already active, so it is not switched again
+    assert [s.split()[0] for s in statements] == ["INSERT", "INSERT"]
+
+
+def test_add_task_fragment_to_other_tab_redirects(client, create_project):
+    create_project("Current", active=True)
+    other = create_project("Other", active=False)
+
+    response = client.post(
+        "/add",
+        data={"task": "Elsewhere", "project": "Other", "status": "1"},
+        headers=FRAGMENT,
+    )
+
+    assert response.status_code == 302
+    assert db.session.get(Projects, other.project_id).active is True
+
+
+def test_rename_project_fragment_returns_slug(client, create_project):
+    project = create_project("Old Name", active=True)
+
+    response = client.post(
+        f"/rename_project/{project.project_id}",
+        json={"new_name": "New Name"},
+        headers=FRAGMENT,
+    )
+
+    assert response.status_code == 200
+    assert response.get_json() == {"name": "New Name", "url_slug": "new_name"}
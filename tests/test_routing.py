@@ -0,0 +1,101 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+
+from task_manager import create_app, db
+from task_manager.routing import READ_BIND, READ_COOKIE
+
+
+@pytest.fixture
+def replica_app(tmp_path):
+    path = tmp_path / "primary.db"
+    app = create_app(
+        {
+            "TESTING": True,
+            "QUERY_BUDGET": "raise",
+            "PURGE_IN_BACKGROUND": False,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{path}",
+            "SQLALCHEMY_READ_URI": f"sqlite:///file:{path}?mode=ro&uri=true",
+            "SQLALCHEMY_READ_ENGINE_OPTIONS": {"pool_size": 3},
+        }
+    )
+    with app.app_context():
+        yield app
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@contextmanager
+def statements_by_engine():
+    """Records the statements run on the primary and on the read bind"""
+    statements = {}
+    listeners = []
+    for key, engine in db.engines.items():
+
+        def _record(conn, cursor, statement, *args, log=statements.setdefault(key, [])):
+            log.append(statement)
+
+        event.listen(engine, "before_cursor_execute", _record)
+        listeners.append((engine, _record))
+    try:
+        yield statements
+    finally:
+        for engine, listener in listeners:
+            event.remove(engine, "before_cursor_execute", listener)
+
+
+def test_get_requests_read_from_read_bind(replica_app):
+    client = replica_app.test_client()
+    client.post("/api/projects", json={"name": "Home"})
+
+    with statements_by_engine() as statements:
+        response = client.get("/api/projects")
+
+    assert [p["name"] for p in response.json] == ["Home"]
+    assert statements[None] == []
+    assert len(statements[READ_BIND]) == 1
+
+
+def test_writes_stay_on_primary(replica_app):
+    client = replica_app.test_client()
+    project_id = client.post("/api/projects", json={"name": "Home"}).json["id"]
+
+    with statements_by_engine() as statements:
+        client.post("/api/tasks", json={"project_id": project_id, "task": "Write"})
+        # a GET view that changes data reads from the primary as well
+        client.get("/project/home")
+
+    assert statements[None]
+    assert statements[READ_BIND] == []
+
+
+def test_read_bind_is_read_only(replica_app):
+    engine = db.engines[READ_BIND]
+
+    assert engine.pool.size() == 3
+    with engine.connect() as conn:
+        assert conn.exec_driver_sql("PRAGMA foreign_keys").scalar() == 1
+        with pytest.raises(OperationalError):
+            conn.exec_driver_sql("DELETE FROM tasks")
+
+
+def test_read_your_writes(replica_app):
+    client = replica_app.test_client()
+    client.post("/api/projects", json={"name": "Before"})
+    assert client.get_cookie(READ_COOKIE) is None
+
+    replica_app.config["READ_YOUR_WRITES"] = True
+    client.post("/api/projects", json={"name": "After"})
+    with statements_by_engine() as statements:
+        client.get("/api/projects")
+
+    assert client.get_cookie(READ_COOKIE) is not None
+    assert statements[READ_BIND] == []
+    assert len(statements[None]) == 1
+
+
+def test_single_engine_without_read_uri(app):
+    assert list(db.engines) == [None]
@@ -0,0 +1,74 @@
+import json
+
+import pytest
+
+from task_manager.serializers import (
+    ProjectCountsRecord,
+    ProjectRecord,
+    TaskRecord,
+    dumps,
+    records,
+)
+
+
+def test_records_are_slotted():
+    task = TaskRecord(1, 2, "Write", True)
+
+    assert not hasattr(task, "__dict__")
+    with pytest.raises(AttributeError):
+        task.extra = 1
+
+
+def test_records_from_rows():
+    rows = [(1, "Home", True, 2, 1), (2, "Work", False, 0, 0)]
+
+    projects = records(ProjectCountsRecord, rows)
+
+    assert json.loads(dumps(projects)) == [
+        {
+            "id": 1,
+            "name": "Home",
+            "active": True,
+            "open_tasks": 2,
+            "closed_tasks": 1,
+            "total_tasks": 3,
+        },
+        {
+            "id": 2,
+            "name": "Work",
+            "active": False,
+            "open_tasks": 0,
+            "closed_tasks": 0,
+            "total_tasks": 0,
+        },
+    ]
+
+
+def test_dumps_nested_records_and_plain_data():
+    payload = {"project": ProjectRecord(1, "Home", True), "ids": [1, 2]}
+
+    assert json.loads(dumps(payload)) == {
+        "project": {"id": 1, "name": "Home", "active": True},
+        "ids": [1, 2],
+    }
+    with pytest.raises(TypeError):
+        dumps(object())
+
+
+def test_read_routes_skip_orm_objects(client, create_task, capture_queries):
+    task = create_task("Lean")
+    task_id, project_id = task.task_id, task.project_id
+
+    with capture_queries() as statements:
+        response = client.get(f"/api/tasks/{task_id}")
+
+    assert response.json == {
+        "id": task_id,
+        "project_id": project_id,
+        "task": "Lean",
+        "status": True,
+    }
+    assert len(statements) == 1
+    assert statements[0].startswith(
+        "SELECT tasks.task_id, tasks.project_id, tasks.task, tasks.status"
+    )
@@ -0,0 +1,136 @@
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+import pytest
+from werkzeug.test import Client, EnvironBuilder
+
+from task_manager import create_app, db
+from task_manager.changes import data_version
+from task_manager.server import WriteForwarder, is_write, serve_writes
+
+
+@pytest.mark.parametrize(
+    "method, path, expected",
+    [
+        ("GET", "/", True),
+        ("GET", "/api/tasks", False),
+        ("HEAD", "/api/projects/1", False),
+        ("POST", "/api/tasks", True),
+        ("DELETE", "/api/delete_all", True),
+        ("GET", "/clear/1", True),
+        ("GET", "/missing", False),
+    ],
+)
+def test_is_write(app, method, path, expected):
+    environ = EnvironBuilder(path=path, method=method).get_environ()
+
+    assert is_write(app, environ) is expected
+
+
+@pytest.fixture
+def worker_app(app):
+    """A second app on the same database, as a forked worker has"""
+    worker = create_app(
+        {
+            "TESTING": True,
+            "PURGE_IN_BACKGROUND": False,
+            "SQLALCHEMY_DATABASE_URI": app.config["SQLALCHEMY_DATABASE_URI"],
+        }
+    )
+    yield worker
+    with worker.app_context():
+        db.engine.dispose()
+
+
+def test_writes_go_through_the_writer(app, worker_app):
+    jobs, inbox = multiprocessing.Queue(), multiprocessing.Queue()
+    writer = threading.Thread(target=serve_writes, args=(app, jobs, [inbox]))
+    writer.start()
+    forwarder = WriteForwarder(worker_app, 0, jobs, inbox)
+    client = Client(forwarder)
+    try:
+        response = client.post("/api/projects", json={"name": "Queued"})
+        listed = client.get("/api/projects")
+    finally:
+        jobs.put(None)
+        writer.join()
+        forwarder.close()
+
+    assert response.status_code == 201
+    assert [p["name"] for p in listed.json] == ["Queued"]
+    # the worker replayed the change before it got the response
+    with worker_app.app_context():
+        assert data_version().value == 1
+
+
+def test_writer_timeout(worker_app):
+    jobs, inbox = multiprocessing.Queue(), multiprocessing.Queue()
+    forwarder = WriteForwarder(worker_app, 0, jobs, inbox, timeout=0.1)
+
+    response = Client(forwarder).post("/api/projects", json={"name": "Lost"})
+    forwarder.close()
+
+    assert response.status_code == 503
+    assert "error" in response.json
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _request(url, payload=None):
+    data = json.dumps(payload).encode() if payload is not None else None
+    request = urllib.request.Request(
+        url, data=data, headers={"Content-Type": "application/json"}
+    )
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.loads(response.read())
+
+
+def _wait_until_up(url, deadline):
+    while time.monotonic() < deadline:
+        try:
+            return _request(url)
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+def test_server_forks_workers(tmp_path):
+    port = _free_port()
+    env = dict(
+        os.environ,
+        TASK_MANAGER_CONFIG="production",
+        TASK_MANAGER_SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'server.db'}",
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-m", "task_manager.server", "task_manager:create_app()"]
+        + ["--workers", "2", "--bind", f"127.0.0.1:{port}"],
+        env=env,
+        stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        _wait_until_up(f"{base}/api/projects", time.monotonic() + 30)
+        created = _request(f"{base}/api/projects", {"name": "Forked"})
+
+        # every worker sees the write
+        for _ in range(4):
+            assert [p["id"] for p in _request(f"{base}/api/projects")] == [
+                created["id"]
+            ]
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=10)
+
+    assert process.returncode == 0